@@ -1,13 +1,18 @@
 import requests
+import argparse
 import os
+import sys
 from datetime import datetime
 import warnings
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.http_cache import ResponseCache
+
 # Suppress the SSL warning
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 
-def download_brvm_to_current_folder():
-    """Download BRVM HTML to the current folder"""
+def download_brvm_to_current_folder(cache=None):
+    """Download BRVM HTML to the current folder, through the response cache when one is given"""
     
     url = "https://www.brvm.org/en/cours-actions/0"
     
@@ -23,19 +28,34 @@ def download_brvm_to_current_folder():
     print("-" * 50)
     
     try:
-        print("🔄 Downloading page...")
-        
-        response = requests.get(
-            url,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            },
-            verify=False,  # Bypass SSL certificate verification
-            timeout=30
-        )
+        cached = cache.get(url) if cache is not None else None
+        if cached is not None:
+            print("📦 Already downloaded today, using the cached page")
+            html = cached.decode('utf-8')
+        else:
+            print("🔄 Downloading page...")
+            
+            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+            if cache is not None:
+                headers.update(cache.conditional_headers(url))
+            response = requests.get(
+                url,
+                headers=headers,
+                verify=False,  # Bypass SSL certificate verification
+                timeout=30
+            )
+            
+            print(f"✅ HTTP Status: {response.status_code}")
+            cached = cache.not_modified(url) if cache is not None and response.status_code == 304 else None
+            if cached is not None:
+                print("📦 Page not modified, using the cached copy")
+                html = cached.decode('utf-8')
+            else:
+                html = response.text
+                if cache is not None and response.status_code == 200:
+                    cache.put(url, html.encode('utf-8'), response.headers)
         
-        print(f"✅ HTTP Status: {response.status_code}")
-        print(f"📄 File size: {len(response.text):,} characters")
+        print(f"📄 File size: {len(html):,} characters")
         
         # Create filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -43,7 +63,7 @@ def download_brvm_to_current_folder():
         
         # Save in current directory
         with open(filename, 'w', encoding='utf-8') as file:
-            file.write(response.text)
+            file.write(html)
         
         # Get full path
         full_path = os.path.join(current_dir, filename)
@@ -55,17 +75,17 @@ def download_brvm_to_current_folder():
         
         # Quick content check
         print("\n🔍 Content check:")
-        if "<table" in response.text:
+        if "<table" in html:
             print("   ✓ Table tags found")
-        if "SONATEL" in response.text:
+        if "SONATEL" in html:
             print("   ✓ SONATEL data found")
-        if "Closing price" in response.text:
+        if "Closing price" in html:
             print("   ✓ Stock price data found")
         
         # Show first few lines to verify
         print("\n📋 First 3 lines of HTML:")
         print("-" * 40)
-        lines = response.text.split('\n')[:3]
+        lines = html.split('\n')[:3]
         for i, line in enumerate(lines, 1):
             print(f"{i}: {line[:80]}..." if len(line) > 80 else f"{i}: {line}")
         print("-" * 40)
@@ -81,9 +101,27 @@ def download_brvm_to_current_folder():
     
     return None
 
+def run(use_cache=True):
+    """Entry point for main_update_pipeline.py: download the page, raise if it could not be saved"""
+    cache = ResponseCache() if use_cache else None
+    downloaded_file = download_brvm_to_current_folder(cache)
+    if cache is not None:
+        cache.print_report()
+    if not downloaded_file:
+        raise RuntimeError("BRVM download failed")
+    return downloaded_file
+
+
 # Run the download
 if __name__ == "__main__":
-    downloaded_file = download_brvm_to_current_folder()
+    parser = argparse.ArgumentParser(description="Download the BRVM page to the current folder")
+    parser.add_argument("--no-cache", action="store_true", help="always download, even if the page was fetched today")
+    args = parser.parse_args()
+    
+    cache = None if args.no_cache else ResponseCache()
+    downloaded_file = download_brvm_to_current_folder(cache)
+    if cache is not None:
+        cache.print_report()
     
     if downloaded_file:
         print("\n" + "=" * 50)
@@ -96,5 +134,8 @@ if __name__ == "__main__":
     else:
         print("\n❌ Download failed. Please try again.")
     
-    # Keep window open
-    input("\nPress Enter to exit...")
\ No newline at end of file
+    # Keep window open when started by hand, not when the pipeline runs it
+    if sys.stdin.isatty():
+        input("\nPress Enter to exit...")
+    if not downloaded_file:
+        sys.exit(1)
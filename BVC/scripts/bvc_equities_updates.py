@@ -0,0 +1,352 @@
+import pandas as pd
+from datetime import datetime, timedelta
+import time
+import json
+import asyncio
+import argparse
+import functools
+import os
+import sys
+import threading
+import aiohttp
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any
+from urllib.parse import quote, urljoin
+from sqlalchemy import inspect
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.async_fetch import HostRateLimiter, fetch_many
+from common.http_cache import CACHE_DIR, ResponseCache
+from common.retry import RetryBudget, RetryPolicy, parse_retry_after
+from db.connection import get_engine
+from db.schema import check_schema
+from db.securities import security_batch
+from db.writer import upsert_batch
+
+
+DATAPOINTS_PATH = 'BVC/data/bvc_datapoints.csv'
+FIXTURES_DIR = 'BVC/data/fixtures'
+# Next to the pipeline's stage logs (main_update_pipeline.py LOG_DIR), which git ignores
+FAILED_LINKS_PATH = 'logs/bvc_failed_links.csv'
+OHLCV_TABLE = "bvc_ma_daily_ohlcv"
+EXCHANGE = "BVC"
+
+# Price history of one instrument from {start} to {end}, one JSON page at a time (the next page is in
+# links.next). A url filled in bvc_datapoints.csv replaces it for that ticker; --url-template or
+# BVC_URL_TEMPLATE replace it for all of them
+URL_TEMPLATE = os.environ.get(
+    "BVC_URL_TEMPLATE",
+    "https://www.casablanca-bourse.com/api/proxy/fr/api/bourse_data/instrument_history"
+    "?filter[symbol]={ticker}&filter[start]={start}&filter[end]={end}&page[limit]=250&sort=created",
+)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/vnd.api+json, application/json',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+# OHLCV column -> names the field goes by in the history pages, first one present wins
+FIELDS = {
+    "trade_date": ["created", "seance", "date", "trade_date"],
+    "opening_price": ["openingPrice", "ouverture", "opening_price"],
+    "high": ["highPrice", "plusHaut", "high"],
+    "low": ["lowPrice", "plusBas", "low"],
+    "closing_price": ["closingPrice", "coursCourant", "cloture", "closing_price"],
+    "volume": ["cumulTitresEchanges", "quantiteEchangee", "volume"],
+}
+
+
+def read_datapoints(path: str = DATAPOINTS_PATH) -> pd.DataFrame:
+    """ticker, company_name, industry, url (may be empty) for every listed security"""
+    print(f"📂 Reading {os.path.basename(path)}...")
+    datapoints = pd.read_csv(path, dtype=str).dropna(subset=["ticker"])
+    datapoints["ticker"] = datapoints["ticker"].str.strip()
+    if "url" not in datapoints.columns:
+        datapoints["url"] = None
+    print(f"✅ Found {len(datapoints)} tickers")
+    return datapoints.drop_duplicates("ticker")
+
+
+def history_url(ticker: str, start, end, url_template: str = URL_TEMPLATE, url: Optional[str] = None) -> str:
+    return (url if isinstance(url, str) and url.strip() else url_template).format(
+        ticker=quote(ticker), start=start.isoformat(), end=end.isoformat())
+
+
+def parse_history_page(body: bytes):
+    """(rows as dicts, absolute-or-relative URL of the next page or None) from one history page.
+
+    Takes JSON:API pages ({"data": [{"attributes": {...}}], "links": {"next": ...}}) as well as a bare list of rows.
+    """
+    payload = json.loads(body)
+    if isinstance(payload, list):
+        return payload, None
+    records = payload.get("data") or []
+    rows = [record.get("attributes", record) for record in records]
+    next_link = (payload.get("links") or {}).get("next")
+    if isinstance(next_link, dict):
+        next_link = next_link.get("href")
+    return rows, next_link or None
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    # French formatting: "1 234,50", grouped with regular, non-breaking or narrow no-break spaces.
+    # Arrow-backed strings match with RE2, whose \s is ASCII only
+    text = values.astype("string").str.replace("[\\s\u00a0\u202f]", "", regex=True).str.replace(",", ".")
+    return pd.to_numeric(text, errors="coerce")
+
+
+def rows_to_ohlcv(rows, ticker: str) -> pd.DataFrame:
+    """History rows of one ticker in the common OHLCV layout (trade_date, ticker, prices, volume)"""
+    raw = pd.DataFrame(rows)
+    df = pd.DataFrame(index=raw.index)
+    for column, names in FIELDS.items():
+        present = next((name for name in names if name in raw.columns), None)
+        df[column] = raw[present] if present else None
+    df["trade_date"] = pd.to_datetime(df["trade_date"], errors="coerce", utc=True).dt.date
+    num_cols = ["opening_price", "high", "low", "closing_price", "volume"]
+    df[num_cols] = df[num_cols].apply(_to_number)
+    df.insert(1, "ticker", ticker)
+    return df.dropna(subset=["trade_date", "closing_price"])
+
+
+async def fetch_history_async(session: aiohttp.ClientSession, url: str, limiter: Optional[HostRateLimiter] = None,
+                              policy: Optional[RetryPolicy] = None,
+                              cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
+    """Every page of one ticker's history, following links.next over the shared session.
+
+    Returns {'rows': [...], 'pages': n, 'from_cache': pages served from disk} or {'rows': None, 'error': ...}
+    """
+    if policy is None:
+        policy = RetryPolicy()
+    rows, pages, from_cache = [], 0, 0
+    page_url = url
+    while page_url:
+        body = cache.get(page_url) if cache is not None else None
+        if body is not None:
+            from_cache += 1
+        else:
+            body, error = await _fetch_page(session, page_url, limiter, policy, cache)
+            if body is None:
+                return {'rows': None, 'error': error, 'pages': pages}
+        page_rows, next_link = parse_history_page(body)
+        rows.extend(page_rows)
+        pages += 1
+        page_url = urljoin(page_url, next_link) if next_link and page_rows else None
+    return {'rows': rows, 'pages': pages, 'from_cache': from_cache}
+
+
+async def _fetch_page(session, url, limiter, policy, cache):
+    """(body, None) once a page decodes, or (None, last error) when the retry policy gives up"""
+    state = policy.start(url)
+    while True:
+        state.begin_attempt()
+        status_code = None
+        server_delay = None
+        content_error = False
+        try:
+            if limiter is not None:
+                await limiter.wait(url)
+            async with session.get(url, headers=cache.conditional_headers(url) if cache is not None else None) as response:
+                body = await response.read()
+            status_code = response.status
+            server_delay = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status == 304 and cache is not None:
+                body = cache.not_modified(url)
+
+            if body is None or response.status not in (200, 304):
+                error = f"HTTP {response.status}"
+            else:
+                content_error = True
+                try:
+                    parse_history_page(body)
+                    if cache is not None and response.status == 200:
+                        cache.put(url, body, response.headers)
+                    state.finish(True)
+                    return body, None
+                except (ValueError, AttributeError) as e:
+                    error = f"Unreadable page: {str(e)[:50]}"
+
+        except asyncio.TimeoutError:
+            error = "Request timeout"
+        except aiohttp.ClientConnectionError as e:
+            error = f"Connection error: {str(e)[:50]}"
+        except aiohttp.ClientError as e:
+            error = f"Request error: {str(e)[:50]}"
+
+        delay = state.retry_after(error, status_code, content_error, server_delay)
+        if delay is None:
+            break
+        print(f"   ⚠️  {url[:80]}: {error} - Waiting {delay:.1f}s before retry...")
+        await asyncio.sleep(delay)
+
+    state.finish(False)
+    return None, f"{state.last_error} ({state.stop_reason})"
+
+
+def fetch_all_concurrently(urls, max_concurrency: int = 8, per_host_rate: float = 4.0,
+                           policy: Optional[RetryPolicy] = None, cache: Optional[ResponseCache] = None):
+    """Every ticker's history over one keep-alive session, bounded by max_concurrency and per_host_rate"""
+
+    async def fetch_one(session, url, limiter):
+        return await fetch_history_async(session, url, limiter, policy=policy, cache=cache)
+
+    return fetch_many(urls, fetch_one, max_concurrency=max_concurrency,
+                      per_host_rate=per_host_rate, headers=HEADERS, timeout=30)
+
+
+def make_run_policy(n_urls: int, max_retries: int = 8, retries_per_url: float = 2.0) -> RetryPolicy:
+    """Each page may retry up to max_retries times, the whole run about retries_per_url retries per ticker"""
+    budget = RetryBudget(max(int(n_urls * retries_per_url), max_retries))
+    return RetryPolicy(max_retries=max_retries, base_delay=1.0, max_delay=30.0, budget=budget)
+
+
+def get_bvc_watermarks(engine) -> Dict[str, Any]:
+    """ticker -> last stored trade_date"""
+    if not inspect(engine).has_table(OHLCV_TABLE):
+        return {}
+    watermarks = pd.read_sql(f"SELECT ticker, MAX(trade_date) AS last_date FROM {OHLCV_TABLE} GROUP BY ticker", engine)
+    watermarks["last_date"] = pd.to_datetime(watermarks["last_date"]).dt.date
+    return dict(zip(watermarks["ticker"], watermarks["last_date"]))
+
+
+def fetch_and_store_incremental(datapoints: pd.DataFrame, engine, url_template: str = URL_TEMPLATE,
+                                max_concurrency: int = 8, per_host_rate: float = 4.0, max_days: int = 365,
+                                overlap_days: int = 3, cache: Optional[ResponseCache] = None):
+    """Watermark-driven load: request each ticker's history from a few days before its last stored
+    trade_date and store every newer row, so a missed night is backfilled on the next run"""
+    watermarks = get_bvc_watermarks(engine)
+    today = datetime.now().date()
+
+    # Step 1: One history URL per ticker, starting where its stored bars stop
+    requests_by_url = {}
+    for point in datapoints.itertuples(index=False):
+        last_date = watermarks.get(point.ticker)
+        start = today - timedelta(days=max_days) if last_date is None else last_date - timedelta(days=overlap_days)
+        url = history_url(point.ticker, start, today, url_template, point.url)
+        requests_by_url[url] = (point, last_date)
+    print(f"📅 {sum(1 for p in datapoints.ticker if p in watermarks)}/{len(datapoints)} tickers have a watermark")
+
+    # Step 2: Fetch
+    policy = make_run_policy(len(requests_by_url))
+    print(f"⚡ Fetching concurrently (max {max_concurrency} in flight, {per_host_rate} req/s per host)...")
+    fetch_start = time.time()
+    results = fetch_all_concurrently(list(requests_by_url), max_concurrency=max_concurrency,
+                                     per_host_rate=per_host_rate, policy=policy, cache=cache)
+    print(f"⚡ Fetched {len(results)} tickers in {time.time() - fetch_start:.2f}s "
+          f"({sum(r.get('pages', 0) for r in results.values())} pages)")
+
+    # Step 3: Keep every row newer than the watermark
+    new_frames = []
+    failed = []
+    for url, result in results.items():
+        point, last_date = requests_by_url[url]
+        if result['rows'] is None:
+            failed.append({'ticker': point.ticker, 'url': url, 'error': result['error'], 'timestamp': datetime.now()})
+            continue
+        df = rows_to_ohlcv(result['rows'], point.ticker)
+        if last_date is not None:
+            df = df[df["trade_date"] > last_date]
+        if not df.empty:
+            df["company_name"] = point.company_name
+            df["industry"] = point.industry
+            new_frames.append(df)
+
+    # Step 4: Bulk upsert as one record batch
+    stored = 0
+    if new_frames:
+        result_df = pd.concat(new_frames, ignore_index=True)
+        result_df = result_df.drop_duplicates(["ticker", "trade_date"], keep="last").sort_values(["trade_date", "ticker"])
+        upsert_batch(security_batch(result_df, engine, EXCHANGE, OHLCV_TABLE), OHLCV_TABLE, engine)
+        stored = len(result_df)
+        print(f"\n✅ Stored {stored} new rows for {result_df['ticker'].nunique()} tickers "
+              f"({result_df['trade_date'].min()} → {result_df['trade_date'].max()})")
+    else:
+        print(f"\n✅ Nothing new to store, every ticker is up to date")
+
+    if failed:
+        os.makedirs(os.path.dirname(FAILED_LINKS_PATH), exist_ok=True)
+        pd.DataFrame(failed).to_csv(FAILED_LINKS_PATH, index=False)
+        print(f"⚠️  {len(failed)}/{len(results)} tickers failed, saved to '{FAILED_LINKS_PATH}'")
+    policy.print_report()
+    if cache is not None:
+        cache.print_report()
+    return {'stored': stored, 'failed': len(failed)}
+
+
+class _QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve_fixtures(directory: str = FIXTURES_DIR):
+    """Serve saved history pages (<TICKER>.json, and the pages their links.next point to) on a local port.
+
+    Yields the URL template for them, so a fixture run goes through the same fetch, parse and store code.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietFileHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/{{ticker}}.json?start={{start}}&end={{end}}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run(url_template: str = URL_TEMPLATE, max_concurrency: int = 8, per_host_rate: float = 4.0,
+        max_days: int = 365, use_cache: bool = True, cache_dir: str = CACHE_DIR, fixtures: Optional[str] = None,
+        tickers=None, engine=None) -> bool:
+    """Entry point for the command line and for main_update_pipeline.py, returns False if the load failed"""
+    print("=" * 70)
+    print("🇲🇦 BVC (Casablanca) daily OHLCV loader")
+    print("=" * 70)
+    start_time = time.time()
+
+    engine = engine or get_engine()
+    check_schema(engine, OHLCV_TABLE)
+    datapoints = read_datapoints()
+    if tickers:
+        datapoints = datapoints[datapoints["ticker"].isin(tickers)]
+
+    if fixtures:
+        # Saved pages: only the tickers that have one, never cached
+        saved = {os.path.splitext(name)[0] for name in os.listdir(fixtures)}
+        datapoints = datapoints[datapoints["ticker"].isin(saved)].assign(url=None)
+        print(f"🧪 Loading {len(datapoints)} ticker(s) from the fixtures in {fixtures}")
+        with serve_fixtures(fixtures) as fixture_template:
+            outcome = fetch_and_store_incremental(datapoints, engine, fixture_template, max_concurrency,
+                                                  per_host_rate=0, max_days=max_days)
+    else:
+        cache = ResponseCache(cache_dir) if use_cache else None
+        outcome = fetch_and_store_incremental(datapoints, engine, url_template, max_concurrency, per_host_rate,
+                                              max_days=max_days, cache=cache)
+
+    print(f"\n{'=' * 70}")
+    print(f"✨ BVC load complete in {time.time() - start_time:.2f} seconds")
+    print("=" * 70)
+    # A night where every ticker failed is a failed load, a few dead tickers are not
+    return outcome['failed'] < len(datapoints) or len(datapoints) == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the daily BVC (Casablanca) bars into bvc_ma_daily_ohlcv")
+    parser.add_argument("--url-template", default=URL_TEMPLATE,
+                        help="history URL with {ticker}, {start} and {end} placeholders")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--per-host-rate", type=float, default=4.0, help="max requests per second per host")
+    parser.add_argument("--max-days", type=int, default=365, help="history requested for a ticker with no stored bars")
+    parser.add_argument("--ticker", action="append", help="only this ticker (repeatable)")
+    parser.add_argument("--fixtures", nargs="?", const=FIXTURES_DIR,
+                        help=f"load saved pages from this folder instead of the site (default {FIXTURES_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="always download, ignore the response cache")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where raw responses are cached")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    args = parser.parse_args()
+
+    success = run(url_template=args.url_template, max_concurrency=args.max_concurrency,
+                  per_host_rate=args.per_host_rate, max_days=args.max_days, use_cache=not args.no_cache,
+                  cache_dir=args.cache_dir, fixtures=args.fixtures, tickers=args.ticker,
+                  engine=get_engine(args.url) if args.url else None)
+    sys.exit(0 if success else 1)
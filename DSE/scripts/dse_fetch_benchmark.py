@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from DSE.scripts.dse_equities_updates import fetch_all_concurrently, fetch_with_persistent_retry
+
+
+def make_stub_handler(latency):
+    class StubStatisticsHandler(BaseHTTPRequestHandler):
+        """Pretends to be the DSE statistics endpoint: sleeps `latency` then returns a year of fake rows"""
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            company_id = query.get("companyId", ["0"])[0]
+            days = int(query.get("days", ["365"])[0])
+            time.sleep(latency)
+            rows = [{
+                "trade_date": f"2026-01-{(d % 28) + 1:02d}T00:00:00Z",
+                "company": f"CMP{company_id}",
+                "volume": 1000 + d,
+                "high": 101.0,
+                "low": 99.0,
+                "opening_price": 100.0,
+                "closing_price": 100.5,
+            } for d in range(days)]
+            body = json.dumps(rows).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubStatisticsHandler
+
+
+def run_benchmark(n_urls=30, latency=0.3, max_concurrency=8, per_host_rate=20.0, include_pause=False):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    urls = [f"http://127.0.0.1:{port}/api/market-data/statistics?companyId={i}&days=365" for i in range(n_urls)]
+
+    try:
+        start = time.time()
+        for url in urls:
+            fetch_with_persistent_retry(url, max_retries=0)
+            if include_pause:
+                time.sleep(0.5)  # the pause the serial loop takes between URLs
+        serial_time = time.time() - start
+
+        start = time.time()
+        results = fetch_all_concurrently(urls, max_concurrency=max_concurrency,
+                                         per_host_rate=per_host_rate, max_retries=0)
+        concurrent_time = time.time() - start
+    finally:
+        server.shutdown()
+
+    ok = sum(1 for r in results.values() if r['data'] is not None)
+    print(f"\n{'='*60}")
+    print(f"📊 {n_urls} URLs, {latency:.2f}s simulated latency per request")
+    print(f"   Serial loop:     {serial_time:.2f}s")
+    print(f"   Concurrent mode: {concurrent_time:.2f}s ({ok}/{n_urls} ok, "
+          f"max {max_concurrency} in flight, {per_host_rate} req/s per host)")
+    print(f"   Speedup:         {serial_time / concurrent_time:.1f}x")
+    return serial_time, concurrent_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serial vs concurrent DSE fetching against a local stub server")
+    parser.add_argument("--urls", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--per-host-rate", type=float, default=20.0)
+    parser.add_argument("--include-pause", action="store_true", help="add the serial loop's 0.5s pause between URLs")
+    args = parser.parse_args()
+    run_benchmark(args.urls, args.latency, args.max_concurrency, args.per_host_rate, args.include_pause)
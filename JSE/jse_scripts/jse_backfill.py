@@ -0,0 +1,132 @@
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from db.connection import get_engine
+from db.schema import check_schema
+from db.securities import security_batch
+from db.writer import upsert_batch
+from JSE.jse_scripts.jse_equities_updates import FixtureSource, download_batched, load_tickers
+from JSE.jse_scripts.jse_missing_queue import enqueue
+
+UNIVERSES = {
+    "equities": ("JSE/data/jse_list.csv", "jse_sa_daily_ohlcv"),
+    "indices": ("JSE/data/jse_indices.csv", "jse_indices_daily_ohlcv"),
+}
+
+
+def last_stored_dates(engine, table, tickers):
+    """ticker -> last stored trade_date for the tickers that already have rows"""
+    if not inspect(engine).has_table(table):
+        return {}
+    stored = pd.read_sql(f"SELECT ticker, MAX(trade_date) AS last_date FROM {table} GROUP BY ticker", engine)
+    stored = stored[stored["ticker"].isin(tickers)]
+    return dict(zip(stored["ticker"], pd.to_datetime(stored["last_date"]).dt.date))
+
+
+def existing_keys(engine, table, start, end):
+    """(ticker, trade_date) pairs already stored between start and end"""
+    if not inspect(engine).has_table(table):
+        return pd.DataFrame(columns=["ticker", "trade_date"])
+    keys = pd.read_sql(
+        text(f"SELECT ticker, trade_date FROM {table} WHERE trade_date >= :start AND trade_date <= :end"),
+        engine,
+        params={"start": str(start), "end": str(end)},
+    )
+    keys["trade_date"] = pd.to_datetime(keys["trade_date"]).dt.date
+    return keys
+
+
+def find_missing(long_df, tickers):
+    """(ticker, date) pairs with no row on a day where at least one other ticker traded"""
+    trading_days = sorted(long_df["trade_date"].unique())
+    full = pd.MultiIndex.from_product([tickers, trading_days], names=["ticker", "trade_date"])
+    have = pd.MultiIndex.from_frame(long_df[["ticker", "trade_date"]])
+    missing = full.difference(have).to_frame(index=False)
+    missing["missing_date"] = pd.to_datetime(missing["trade_date"]).dt.strftime("%Y-%m-%d")
+    return missing[["ticker", "missing_date"]]
+
+
+def backfill(universe="equities", start=None, end=None, since_last=False, source=None,
+             chunk_size=50, engine=None, write=True):
+    """Fetch every trading day between start and end (inclusive) in one batched request per ticker chunk.
+
+    With since_last=True the range starts the day after the oldest "last stored date" among the
+    tickers, so every ticker that fell behind is caught up. Rows already in the table are skipped.
+    Returns (new rows as an OHLCV record batch, missing ticker/date pairs).
+    """
+    tickers_path, table = UNIVERSES[universe]
+    tickers = load_tickers(tickers_path)
+    engine = engine or get_engine()
+    if write:
+        check_schema(engine, table)
+    end = pd.Timestamp(end).date() if end else pd.Timestamp.today().date()
+
+    if since_last:
+        last_dates = last_stored_dates(engine, table, tickers)
+        if last_dates:
+            start = min(last_dates.values()) + pd.Timedelta(days=1)
+        elif start is None:
+            raise ValueError(f"{table} is empty, pass a start date for the first backfill")
+    if start is None:
+        raise ValueError("pass a start date or since_last=True")
+    start = pd.Timestamp(start).date()
+    if start > end:
+        print(f"✅ {table} is already up to date (last stored {start - pd.Timedelta(days=1)})")
+        return pa.table({}), pd.DataFrame(columns=["ticker", "missing_date"])
+
+    print(f"📅 Backfilling {len(tickers)} JSE {universe} from {start} to {end}")
+    t0 = time.time()
+    # yfinance's end is exclusive
+    # The rows stay an Arrow record batch from the download to the COPY
+    batch, failed = download_batched(tickers, str(start), str(end + pd.Timedelta(days=1)),
+                                     source=source, chunk_size=chunk_size, as_batch=True)
+    dates = batch["trade_date"]
+    batch = batch.filter(pc.and_(pc.greater_equal(dates, pa.scalar(start, pa.date32())),
+                                 pc.less_equal(dates, pa.scalar(end, pa.date32()))))
+    print(f"⏱️  Downloaded {batch.num_rows} rows in {time.time() - t0:.2f}s")
+
+    missing = find_missing(batch.select(["ticker", "trade_date"]).to_pandas(), tickers)
+
+    # Skip rows we already have, then write the rest in one bulk upsert
+    stored = existing_keys(engine, table, start, end)
+    stored = pa.table({"ticker": pa.array(stored["ticker"], pa.string()),
+                       "trade_date": pa.array(stored["trade_date"], pa.date32())})
+    new_rows = batch.join(stored, keys=["ticker", "trade_date"], join_type="left anti")
+    print(f"🧹 {batch.num_rows - new_rows.num_rows} rows already stored, {new_rows.num_rows} new")
+
+    if write and new_rows.num_rows:
+        upsert_batch(security_batch(new_rows, engine, "JSE", table), table, engine, update=False)
+        print(f"✅ Stored {new_rows.num_rows} rows into {table}")
+
+    if not missing.empty:
+        path = f"missing_JSE_data_{start}_to_{end}.csv"
+        missing.to_csv(path, index=False)
+        print(f"⚠️  {len(missing)} missing ticker/day pairs saved to {path}")
+        if write and universe == "equities":
+            enqueue(engine, missing)
+    return new_rows, missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill a date range of JSE equities or indices in one run")
+    parser.add_argument("--start", help="first date to fetch (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to fetch (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--since-last", action="store_true", help="start after the last stored date")
+    parser.add_argument("--indices", action="store_true", help="backfill jse_indices_daily_ohlcv instead of equities")
+    parser.add_argument("--chunk-size", type=int, default=50, help="tickers per download request")
+    parser.add_argument("--fixture", help="replay a recorded download instead of calling Yahoo")
+    parser.add_argument("--dry-run", action="store_true", help="do not write to the database")
+    args = parser.parse_args()
+
+    if not args.start and not args.since_last:
+        parser.error("give --start or --since-last")
+    source = FixtureSource(args.fixture) if args.fixture else None
+    backfill("indices" if args.indices else "equities", start=args.start, end=args.end,
+             since_last=args.since_last, source=source, chunk_size=args.chunk_size, write=not args.dry_run)
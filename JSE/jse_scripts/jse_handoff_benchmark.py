@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from db.connection import get_engine
+from db.schema import create_table
+from db.securities import SECURITIES_TABLE, attach_security_id, ensure_securities, security_batch
+from db.writer import _ensure_table, _upsert_postgres, _upsert_sqlite, forget_table, upsert_batch
+from JSE.jse_scripts.jse_backfill import existing_keys
+from JSE.jse_scripts.jse_equities_updates import FixtureSource, download_batched
+
+TABLE = "_bench_handoff_ohlcv"
+EXCHANGE = "BENCH"
+
+
+def make_wide_fixture(path, n_tickers=320, n_days=5000, seed=0):
+    """A yfinance-shaped (ticker, field) download of n_tickers x n_days, with gaps, pickled for FixtureSource"""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2006-01-02", periods=n_days)
+    tickers = [f"B{i:03d}.JO" for i in range(n_tickers)]
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+    close = rng.uniform(1, 500, (n_days, n_tickers))
+    close[rng.random((n_days, n_tickers)) < 0.05] = np.nan  # missing bars
+    data = {}
+    for t, ticker in enumerate(tickers):
+        for field in fields:
+            if field == "Volume":
+                data[(ticker, field)] = np.where(np.isnan(close[:, t]), np.nan, rng.integers(0, 10**6, n_days))
+            else:
+                data[(ticker, field)] = close[:, t] * (1.01 if field == "High" else 0.99 if field == "Low" else 1)
+    wide = pd.DataFrame(data, index=days)
+    wide.columns = pd.MultiIndex.from_tuples(wide.columns)
+    wide.to_pickle(path)
+    return tickers, str(days[0].date()), str(days[-1].date())
+
+
+class StageMeter:
+    """Per stage wall time and peak extra memory: Python/numpy allocations through tracemalloc, Arrow
+    buffers through a proxy memory pool of their own"""
+
+    def __init__(self):
+        self.stages = {}
+        self.arrow_pool = pa.default_memory_pool()
+        # Buffers allocated in a stage are freed through its pool later on, so the pools must outlive them
+        self.pools = []
+        tracemalloc.start()
+
+    def run(self, name, fn, *args, **kwargs):
+        pool = pa.proxy_memory_pool(self.arrow_pool)
+        self.pools.append(pool)
+        pa.set_memory_pool(pool)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            pa.set_memory_pool(self.arrow_pool)
+        _, peak = tracemalloc.get_traced_memory()
+        self.stages[name] = {"seconds": time.perf_counter() - start,
+                             "peak_bytes": peak - before + pool.max_memory()}
+        return result
+
+
+def _reset(engine):
+    ensure_securities(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}" + (" CASCADE" if engine.dialect.name == "postgresql" else "")))
+        conn.execute(text(f"DELETE FROM {SECURITIES_TABLE} WHERE exchange = :e"), {"e": EXCHANGE})
+    forget_table(engine, TABLE)
+    create_table(engine, TABLE)
+
+
+def pandas_path(meter, engine, tickers, start, end, source):
+    """The handoff as it was: frames all the way, then to_csv into COPY"""
+    long_df, _ = meter.run("reshape", download_batched, tickers, start, end, source=source, chunk_size=50)
+
+    def skip_stored(df):
+        df = df[(df["trade_date"] >= pd.Timestamp(start).date()) & (df["trade_date"] <= pd.Timestamp(end).date())]
+        stored = existing_keys(engine, TABLE, start, end)
+        merged = df.merge(stored, on=["ticker", "trade_date"], how="left", indicator=True)
+        return merged[merged["_merge"] == "left_only"].drop(columns="_merge")
+
+    new_rows = meter.run("filter", skip_stored, long_df)
+    facts = meter.run("security_id", attach_security_id, new_rows, engine, EXCHANGE, TABLE)
+
+    def write(df):
+        df = df.drop_duplicates(subset=["ticker", "trade_date"], keep="last")
+        df = df.assign(trade_date=pd.to_datetime(df["trade_date"]).dt.date,
+                       volume=pd.to_numeric(df["volume"]).round().astype("Int64"))
+        has_unique, _ = _ensure_table(df, TABLE, engine, ["ticker", "trade_date"])
+        upsert = _upsert_postgres if engine.dialect.name == "postgresql" else _upsert_sqlite
+        return upsert(df, TABLE, engine, ["ticker", "trade_date"], has_unique, False)
+
+    return meter.run("write", write, facts), int(facts.memory_usage(deep=True).sum())
+
+
+def arrow_path(meter, engine, tickers, start, end, source):
+    """The record batch handoff: wide frame -> OHLCV batch -> COPY"""
+    batch, _ = meter.run("reshape", download_batched, tickers, start, end, source=source, chunk_size=50,
+                         as_batch=True)
+
+    def skip_stored(batch):
+        dates = batch["trade_date"]
+        batch = batch.filter(pc.and_(pc.greater_equal(dates, pa.scalar(pd.Timestamp(start).date(), pa.date32())),
+                                     pc.less_equal(dates, pa.scalar(pd.Timestamp(end).date(), pa.date32()))))
+        stored = existing_keys(engine, TABLE, start, end)
+        stored = pa.table({"ticker": pa.array(stored["ticker"], pa.string()),
+                           "trade_date": pa.array(stored["trade_date"], pa.date32())})
+        return batch.join(stored, keys=["ticker", "trade_date"], join_type="left anti")
+
+    new_rows = meter.run("filter", skip_stored, batch)
+    facts = meter.run("security_id", security_batch, new_rows, engine, EXCHANGE, TABLE)
+    written = meter.run("write", upsert_batch, facts, TABLE, engine, update=False)
+    return written, facts.nbytes
+
+
+def run_path(path, fixture, url):
+    """One path in this process; prints its measurements as JSON on the last line"""
+    engine = get_engine(url)
+    source = FixtureSource(fixture)
+    tickers = list(source.wide.columns.get_level_values(0).unique())
+    start, end = str(source.wide.index[0].date()), str(source.wide.index[-1].date())
+    _reset(engine)
+
+    meter = StageMeter()
+    start_time = time.perf_counter()
+    written, data_bytes = (pandas_path if path == "pandas" else arrow_path)(meter, engine, tickers, start, end, source)
+    result = {
+        "path": path,
+        "rows": written,
+        "data_bytes": data_bytes,
+        "seconds": time.perf_counter() - start_time,
+        # Linux reports ru_maxrss in KiB
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "stages": meter.stages,
+    }
+    _reset(engine)
+    print(json.dumps(result))
+
+
+def compare(fixture, url):
+    results = []
+    for path in ("pandas", "arrow"):
+        out = subprocess.run([sys.executable, __file__, "--fixture", fixture, "--path", path] +
+                             (["--url", url] if url else []), capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    # "copies" = peak extra memory of a stage in units of the final row data: how many full
+    # copies of the rows were alive at once
+    size = results[1]["data_bytes"]
+    print(f"\n📊 Backfill handoff, {results[1]['rows']:,} rows ({size / 1e6:.1f} MB as an OHLCV batch)")
+    print(f"   {'stage':<12}" + "".join(f"{r['path'] + ' s':>12}{r['path'] + ' copies':>16}" for r in results))
+    for stage in results[0]["stages"]:
+        print(f"   {stage:<12}" + "".join(
+            f"{r['stages'][stage]['seconds']:>12.2f}{r['stages'][stage]['peak_bytes'] / size:>16.1f}" for r in results))
+    print(f"   {'total':<12}" + "".join(f"{r['seconds']:>12.2f}{'':>16}" for r in results))
+    print("   peak RSS    " + "   ".join(f"{r['path']}: {r['peak_rss_bytes'] / 1e6:,.0f} MB" for r in results))
+    print("   (times include tracemalloc overhead)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory and copies per stage of a JSE backfill, frames vs record batches")
+    parser.add_argument("--fixture", default="jse_handoff_fixture.pkl", help="wide download to replay (created if missing)")
+    parser.add_argument("--tickers", type=int, default=320, help="tickers in a generated fixture")
+    parser.add_argument("--days", type=int, default=5000, help="trading days in a generated fixture")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    parser.add_argument("--path", choices=["pandas", "arrow"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.path:
+        run_path(args.path, args.fixture, args.url)
+    else:
+        if not os.path.exists(args.fixture):
+            make_wide_fixture(args.fixture, args.tickers, args.days)
+            print(f"💾 Generated {args.tickers} tickers x {args.days} days into {args.fixture}")
+        compare(args.fixture, args.url)
@@ -0,0 +1,180 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from db.connection import get_engine
+from db.schema import check_schema
+from db.securities import security_batch
+from db.writer import upsert_batch, upsert_dataframe
+
+QUEUE_TABLE = "jse_missing_queue"
+OHLCV_TABLE = "jse_sa_daily_ohlcv"
+INDICES_TABLE = "jse_indices_daily_ohlcv"
+CSV_PATTERN = "missing_jse_collection/missing_JSE_data_*.csv"
+
+# pending -> filled once the row is stored, or absent once we are sure Yahoo will never have it
+QUEUE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {QUEUE_TABLE} (
+    ticker TEXT NOT NULL,
+    missing_date DATE NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP,
+    next_attempt_at TIMESTAMP,
+    resolved_at TIMESTAMP,
+    PRIMARY KEY (ticker, missing_date)
+)
+"""
+
+
+def ensure_queue(engine):
+    with engine.begin() as conn:
+        conn.execute(text(QUEUE_DDL))
+
+
+def enqueue(engine, missing):
+    """Add ticker/missing_date pairs to the queue. Pairs already queued (from any earlier day) are left alone."""
+    if missing is None or len(missing) == 0:
+        return 0
+    ensure_queue(engine)
+    now = datetime.now().replace(microsecond=0)
+    rows = pd.DataFrame(missing)[["ticker", "missing_date"]].copy()
+    rows["missing_date"] = pd.to_datetime(rows["missing_date"]).dt.date
+    rows["status"] = "pending"
+    rows["attempts"] = 0
+    rows["first_seen"] = now
+    rows["next_attempt_at"] = now
+    added = upsert_dataframe(rows, QUEUE_TABLE, engine, key_columns=["ticker", "missing_date"], update=False)
+    print(f"📥 Queued {added} new missing ticker/day pairs ({len(rows) - added} already queued)")
+    return added
+
+
+def import_csvs(engine, pattern=CSV_PATTERN):
+    """One-off import of the per-day missing_JSE_data_<date>.csv files. Safe to repeat."""
+    files = sorted(glob.glob(pattern))
+    if not files:
+        print(f"No files match {pattern}")
+        return 0
+    missing = pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
+    print(f"📂 Read {len(missing)} rows from {len(files)} CSV files")
+    return enqueue(engine, missing)
+
+
+def queue_depth(engine):
+    if not inspect(engine).has_table(QUEUE_TABLE):
+        return {}
+    counts = pd.read_sql(f"SELECT status, COUNT(*) AS n FROM {QUEUE_TABLE} GROUP BY status", engine)
+    return dict(zip(counts["status"], counts["n"]))
+
+
+def target_table(ticker):
+    """Index tickers (^J200.JO ...) are queued by jse_indices_updates.py and stored with the indices"""
+    return INDICES_TABLE if ticker.startswith("^") else OHLCV_TABLE
+
+
+def _backoff(attempts, base_hours, max_hours):
+    return timedelta(hours=min(base_hours * 2 ** max(attempts - 1, 0), max_hours))
+
+
+def replay(engine, source=None, chunk_size=50, max_attempts=6, base_backoff_hours=12, max_backoff_hours=24 * 7):
+    """Retry every due queue entry with one batched download over the tickers involved.
+
+    Entries whose row comes back are stored and marked filled. A ticker that has bars after the
+    missing day but still none for it, on a second try, is marked absent (Yahoo has the series, not
+    that day). Everything else is pushed back with per-ticker exponential backoff, and marked absent
+    after max_attempts.
+    """
+    # Imported here because jse_equities_updates imports this module to queue its misses
+    from JSE.jse_scripts.jse_equities_updates import download_batched
+
+    ensure_queue(engine)
+    start_time = time.time()
+    now = datetime.now().replace(microsecond=0)
+    depth_before = queue_depth(engine).get("pending", 0)
+
+    due = pd.read_sql(
+        text(f"SELECT ticker, missing_date, attempts FROM {QUEUE_TABLE} "
+             f"WHERE status = 'pending' AND (next_attempt_at IS NULL OR next_attempt_at <= :now)"),
+        engine,
+        params={"now": now},
+    )
+    if due.empty:
+        print(f"✅ Nothing due in the queue ({depth_before} pending, waiting on backoff)")
+        return {"due": 0, "filled": 0, "absent": 0, "retry": 0}
+    due["missing_date"] = pd.to_datetime(due["missing_date"]).dt.date
+
+    tickers = sorted(due["ticker"].unique())
+    first, last = due["missing_date"].min(), due["missing_date"].max()
+    print(f"🔁 Replaying {len(due)} entries for {len(tickers)} tickers between {first} and {last}")
+
+    # A few extra days after the last gap show whether the ticker is still trading
+    end = last + timedelta(days=7)
+    long_df, failed = download_batched(tickers, str(first), str(end + timedelta(days=1)),
+                                       source=source, chunk_size=chunk_size)
+
+    found = due.merge(long_df, left_on=["ticker", "missing_date"], right_on=["ticker", "trade_date"], how="inner")
+    filled_rows = found[long_df.columns.tolist()]
+    filled_keys = set(zip(found["ticker"], found["missing_date"]))
+    last_bar = long_df.groupby("ticker")["trade_date"].max().to_dict() if not long_df.empty else {}
+
+    for table, rows in filled_rows.groupby(filled_rows["ticker"].map(target_table)):
+        check_schema(engine, table)
+        upsert_batch(security_batch(rows, engine, "JSE", table), table, engine)
+
+    filled, absent, retry = [], [], []
+    ticker_attempts = due.groupby("ticker")["attempts"].max().to_dict()
+    for row in due.itertuples(index=False):
+        key = {"ticker": row.ticker, "missing_date": row.missing_date, "now": now}
+        attempts = ticker_attempts[row.ticker] + 1
+        has_later_bars = row.ticker not in failed and last_bar.get(row.ticker, row.missing_date) > row.missing_date
+        if (row.ticker, row.missing_date) in filled_keys:
+            filled.append(key)
+        elif attempts >= max_attempts or (attempts >= 2 and has_later_bars):
+            absent.append(key)
+        else:
+            retry.append({"ticker": row.ticker, "missing_date": row.missing_date, "attempts": attempts,
+                          "next": now + _backoff(attempts, base_backoff_hours, max_backoff_hours)})
+
+    with engine.begin() as conn:
+        resolve = text(f"UPDATE {QUEUE_TABLE} SET status = :status, attempts = attempts + 1, resolved_at = :now "
+                       f"WHERE ticker = :ticker AND missing_date = :missing_date")
+        if filled:
+            conn.execute(resolve, [{**k, "status": "filled"} for k in filled])
+        if absent:
+            conn.execute(resolve, [{**k, "status": "absent"} for k in absent])
+        if retry:
+            conn.execute(text(f"UPDATE {QUEUE_TABLE} SET attempts = :attempts, next_attempt_at = :next "
+                              f"WHERE ticker = :ticker AND missing_date = :missing_date"), retry)
+
+    elapsed = time.time() - start_time
+    depth_after = queue_depth(engine).get("pending", 0)
+    drained = len(filled) + len(absent)
+    print(f"\n📊 Queue report")
+    print(f"   Depth: {depth_before} → {depth_after} pending")
+    print(f"   Filled: {len(filled)}, proven absent: {len(absent)}, backed off: {len(retry)}")
+    print(f"   Drain rate: {drained} entries in {elapsed:.1f}s ({drained / elapsed if elapsed else 0:.1f}/s)")
+    return {"due": len(due), "filled": len(filled), "absent": len(absent), "retry": len(retry)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent retry queue for missing JSE ticker/days")
+    parser.add_argument("--import-csvs", action="store_true", help=f"import {CSV_PATTERN} into the queue first")
+    parser.add_argument("--no-replay", action="store_true", help="only import / report, do not download")
+    parser.add_argument("--fixture", help="replay a recorded download instead of calling Yahoo")
+    parser.add_argument("--max-attempts", type=int, default=6)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.import_csvs:
+        import_csvs(engine)
+    if not args.no_replay:
+        from JSE.jse_scripts.jse_equities_updates import FixtureSource
+        source = FixtureSource(args.fixture) if args.fixture else None
+        replay(engine, source=source, max_attempts=args.max_attempts)
+    print(f"📋 Queue: {queue_depth(engine)}")
@@ -0,0 +1,105 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Column layout of the daily price list, left to right
+PRICE_LIST_COLUMNS = [
+    "code",
+    "name",
+    "low_12m",
+    "high_12m",
+    "low_day",
+    "high_day",
+    "price",
+    "previous",
+    "change_abs",
+    "change_pct",
+    "direction",
+    "volume",
+    "adjusted_price"]
+
+# Sector headings and ad slots show up as rows of the price table
+SECTOR_PATTERNS = (
+    "Agricultural|"
+    "Automobiles and Accessories|"
+    "Banking|"
+    "Commercial and Services|"
+    "Construction and Allied|"
+    "Energy and Petroleum|"
+    "Insurance|"
+    "Investment$|"
+    "Investment Services|"
+    "Manufacturing and Allied|"
+    "Telecommunication|"
+    "Real Estate Investment Trusts|"
+    "Exchange Traded Funds|"
+    "Indices")
+
+ADS_PATTERN = r"Discover more \(adsbygoogle=.*?\)"
+
+# Compiled once: sector names match case-insensitively, the ad marker exactly
+NON_SECURITY_RE = re.compile(f"(?i:{SECTOR_PATTERNS})|{ADS_PATTERN}")
+
+NULL_TOKENS = ["-", "", " ", "NA", "N/A"]
+NUMBER_NOISE_RE = re.compile(r"[,%\s]")
+
+# price list column -> (nse_ke_daily_ohlcv column, dtype), in output order
+OUTPUT_COLUMNS = {
+    "code": ("ticker", "string"),
+    "name": ("company_name", "string"),
+    "low_day": ("low", "float64"),
+    "high_day": ("high", "float64"),
+    "price": ("closing_price", "float64"),
+    "volume": ("volume", "float64"),
+}
+
+
+def _as_text(series):
+    series = series.astype("string").str.strip()
+    return series.mask(series.isin(NULL_TOKENS))
+
+
+def _as_number(series):
+    if series.dtype.kind in "fiu":
+        return series.astype("float64")
+    text = series.astype("string").str.replace(NUMBER_NOISE_RE, "", regex=True)
+    return pd.to_numeric(text.mask(text.isin(NULL_TOKENS)), errors="coerce").astype("float64")
+
+
+def _security_mask(code):
+    """True for rows whose code is a real security. The regex runs once per distinct code,
+    which over a multi-year archive is a few hundred values instead of every row."""
+    labels, uniques = pd.factorize(code)
+    is_security = np.fromiter((NON_SECURITY_RE.search(u) is None for u in uniques), dtype=bool, count=len(uniques))
+    # factorize labels missing codes -1, which are not securities either
+    return pd.Series(np.append(is_security, False)[labels], index=code.index)
+
+
+def clean_price_list(raw):
+    """Raw price list rows -> nse_ke_daily_ohlcv rows.
+
+    `raw` has the 13 price list columns followed by trade_date, by position (header text varies
+    between pages). Only the six columns that are stored are read; sector headings, ad rows and
+    rows without a price or name are dropped; each kept column is cast once to its final dtype.
+    """
+    if len(raw.columns) != len(PRICE_LIST_COLUMNS) + 1:
+        raise ValueError(f"expected {len(PRICE_LIST_COLUMNS) + 1} columns, got {len(raw.columns)}")
+    position = {name: i for i, name in enumerate(PRICE_LIST_COLUMNS + ["trade_date"])}
+
+    def column(name):
+        return raw.iloc[:, position[name]]
+
+    code = _as_text(column("code"))
+    is_security = _security_mask(code)
+
+    out = {"ticker": code[is_security]}
+    for source, (target, dtype) in OUTPUT_COLUMNS.items():
+        if source == "code":
+            continue
+        values = column(source)[is_security]
+        out[target] = _as_text(values) if dtype == "string" else _as_number(values)
+    out["trade_date"] = pd.to_datetime(column("trade_date")[is_security], errors="coerce")
+
+    clean = pd.DataFrame(out)
+    clean = clean[clean["closing_price"].notna() & clean["company_name"].notna()]
+    return clean.sort_values(["trade_date", "ticker"], ignore_index=True)
@@ -0,0 +1,100 @@
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from NSE.nse_equities_updates import extract_price_table, extract_price_table_bs4, parse_files_parallel
+
+HEADER = ["Code", "Name", "12m Low", "12m High", "Day Low", "Day High", "Price", "Previous",
+          "Change", "Change%", "", "Volume", "Adjusted Price"]
+SECTORS = ["Agricultural", "Banking", "Commercial and Services", "Insurance", "Manufacturing and Allied"]
+
+
+def make_sample_page(trade_date, n_securities=70, seed=0):
+    """A page shaped like the saved price lists: menus and side tables, sector heading rows and ads"""
+    rng = random.Random(seed)
+    parts = ["<html><head><title>NSE Price List</title></head><body>"]
+    parts.append("<div class='nav'>" + "".join(f"<a href='/p{i}'>Link {i}</a>" for i in range(200)) + "</div>")
+    for t in range(3):
+        parts.append("<table>" + "".join(f"<tr><td>Top mover {t}-{i}</td><td>{rng.random():.2f}</td></tr>"
+                                         for i in range(8)) + "</table>")
+    parts.append(f"<h2>Daily price list for {trade_date:%B %d, %Y}</h2><table class='prices'>")
+    parts.append("<tr>" + "".join(f"<th>{h}</th>" for h in HEADER) + "</tr>")
+    for i in range(n_securities):
+        if i % 14 == 0:
+            parts.append(f"<tr><td colspan='13'>{SECTORS[(i // 14) % len(SECTORS)]}</td></tr>")
+        if i % 25 == 24:
+            parts.append("<tr><td colspan='13'>Discover more (adsbygoogle=window.adsbygoogle||[]).push({})</td></tr>")
+        price = rng.uniform(1, 300)
+        prev = price * rng.uniform(0.95, 1.05)
+        cells = [f"SC{i:03d}", f"Security {i} Plc", f"{price * 0.7:.2f}", f"{price * 1.3:.2f}",
+                 f"{price * 0.99:.2f}", f"{price * 1.01:.2f}", f"{price:.2f}", f"{prev:.2f}",
+                 f"{price - prev:.2f}", f"{(price - prev) / prev * 100:.2f}%", "▲" if price > prev else "▼",
+                 f"{rng.randint(0, 5_000_000):,}", f"{price:.2f}" if i % 3 else "-"]
+        parts.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    parts.append("</table><footer>" + "<p>filler</p>" * 300 + "</footer></body></html>")
+    return "".join(parts)
+
+
+def generate_samples(directory, n_pages):
+    os.makedirs(directory, exist_ok=True)
+    day = date(2024, 1, 2)
+    for i in range(n_pages):
+        path = os.path.join(directory, f"NSE Price List {day:%B} {day.day}, {day.year}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_sample_page(day, seed=i))
+        day += timedelta(days=1)
+    print(f"📝 Wrote {n_pages} sample pages to {directory}")
+
+
+def benchmark(directory):
+    files = sorted(glob.glob(os.path.join(directory, "*.html")))
+    if not files:
+        raise RuntimeError(f"No HTML files in {directory}")
+
+    results = {}
+    for name, extractor in (("bs4 + read_html", extract_price_table_bs4), ("lxml single pass", extract_price_table)):
+        start = time.time()
+        rows = 0
+        errors = 0
+        for f in files:
+            try:
+                rows += len(extractor(f))
+            except Exception:
+                errors += 1
+        results[name] = time.time() - start
+        print(f"   {name:<18} {results[name]:7.2f}s  {len(files) / results[name]:7.1f} files/sec  "
+              f"{rows} rows, {errors} errors")
+    print(f"   Speedup: {results['bs4 + read_html'] / results['lxml single pass']:.1f}x on {len(files)} files")
+    return results
+
+
+def benchmark_workers(directory, worker_counts):
+    """files/sec of the process-pool ingest at each worker count"""
+    files = sorted(glob.glob(os.path.join(directory, "*.html")))
+    rates = {}
+    for workers in worker_counts:
+        start = time.time()
+        parse_files_parallel(files, extract_price_table, workers)
+        rates[workers] = len(files) / (time.time() - start)
+    print(f"\n📊 Process pool scaling over {len(files)} files")
+    for workers, rate in rates.items():
+        print(f"   {workers:>3} worker(s): {rate:7.1f} files/sec  ({rate / rates[worker_counts[0]]:.1f}x)")
+    return rates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the NSE price table extractors over a directory of saved pages")
+    parser.add_argument("directory", help="directory of saved price list pages")
+    parser.add_argument("--generate", type=int, default=0, help="first write this many synthetic sample pages")
+    parser.add_argument("--workers", help="comma separated worker counts to time the process pool with, e.g. 1,2,4,8")
+    args = parser.parse_args()
+    if args.generate:
+        generate_samples(args.directory, args.generate)
+    benchmark(args.directory)
+    if args.workers:
+        benchmark_workers(args.directory, [int(w) for w in args.workers.split(",")])
@@ -0,0 +1,259 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# OHLCV table -> the corporate-action tables that adjust it: (table, kind, ex-date column, value columns).
+# The action files carry no ex-date, so an action takes effect from its record / book closure date:
+# every bar before that date is adjusted.
+#   cash   value columns: amount per share
+#   bonus  num new shares for every den held
+#   split  num new shares replace den old ones
+#   rights num new shares for every den held, subscribed at price (left unadjusted while the price is unknown)
+# Only NSE has action tables so far, and only the tables listed here get a <table>_adjusted view. JSE is left
+# out on purpose: its bars are Yahoo closes with auto_adjust=False, which Yahoo has already split-adjusted as of
+# the download day, so its split actions applied on top would adjust some stored days twice
+ACTION_SOURCES = {
+    "nse_ke_daily_ohlcv": [
+        ("nse_corporate_actions_dividends", "cash", "record_date", ["amount_per_share"]),
+        ("nse_corporate_actions_distributions", "cash", "record_date", ["amount_per_share"]),
+        ("nse_corporate_actions_bonus", "bonus", "book_closure_date", ["bonus_ratio_num", "bonus_ratio_den"]),
+        ("nse_corporate_actions_rights", "rights", "book_closure_date",
+         ["rights_ratio_num", "rights_ratio_den", "rights_price"]),
+        ("nse_corporate_actions_splits", "split", "book_closure_date", ["split_ratio_num", "split_ratio_den"]),
+    ],
+}
+
+# One row per ticker and stretch of history between two ex-dates: bars with start_date <= trade_date < end_date
+# are multiplied by price_factor (prices) and volume_factor (volume). Bars after the last action have no row
+FACTOR_TABLE = "adjustment_factors"
+# Hash of the actions each ticker's factors were computed from, to find the tickers a new action touches
+FINGERPRINT_TABLE = "adjustment_fingerprints"
+FIRST_DATE = date(1900, 1, 1)
+
+
+def adjusted_view(table):
+    return f"{table}_adjusted"
+
+
+def ensure_tables(engine):
+    real = "DOUBLE PRECISION" if engine.dialect.name == "postgresql" else "REAL"
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {FACTOR_TABLE} (
+                source_table TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                price_factor {real} NOT NULL,
+                volume_factor {real} NOT NULL,
+                PRIMARY KEY (source_table, ticker, start_date)
+            )
+        """))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE} (
+                source_table TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (source_table, ticker)
+            )
+        """))
+
+
+def create_adjusted_view(engine, table):
+    """<table>_adjusted: the OHLCV columns with prices and volume adjusted, plus the raw close and the factor"""
+    view = adjusted_view(table)
+    price = "COALESCE(f.price_factor, 1)"
+    volume = "COALESCE(f.volume_factor, 1)"
+    select = f"""
+        SELECT o.trade_date, o.ticker, o.security_id,
+               o.opening_price * {price} AS opening_price,
+               o.high * {price} AS high,
+               o.low * {price} AS low,
+               o.closing_price * {price} AS closing_price,
+               CAST(ROUND(o.volume * {volume}) AS BIGINT) AS volume,
+               o.closing_price AS raw_closing_price,
+               {price} AS price_factor
+        FROM {table} o
+        LEFT JOIN {FACTOR_TABLE} f
+          ON f.source_table = '{table}' AND f.ticker = o.ticker
+         AND o.trade_date >= f.start_date AND o.trade_date < f.end_date
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"CREATE OR REPLACE VIEW {view} AS {select}"))
+        else:
+            conn.execute(text(f"DROP VIEW IF EXISTS {view}"))
+            conn.execute(text(f"CREATE VIEW {view} AS {select}"))
+
+
+def read_actions(engine, table):
+    """Every action that adjusts `table` as one frame: ticker, ex_date, kind, num/den or amount, price"""
+    inspector = inspect(engine)
+    frames = []
+    for action_table, kind, date_column, value_columns in ACTION_SOURCES.get(table, []):
+        if not inspector.has_table(action_table):
+            continue
+        stored = {c["name"] for c in inspector.get_columns(action_table)}
+        values = [c if c in stored else f"NULL AS {c}" for c in value_columns]
+        query = f"SELECT ticker, {date_column} AS ex_date, {', '.join(values)} FROM {action_table}"
+        actions = pd.read_sql(text(query), engine)
+        names = ["amount"] if kind == "cash" else ["num", "den", "price"][:len(value_columns)]
+        actions = actions.rename(columns=dict(zip(value_columns, names)))
+        actions["kind"] = kind
+        frames.append(actions)
+    columns = ["ticker", "ex_date", "kind", "amount", "num", "den", "price"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    actions = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+    actions["ticker"] = actions["ticker"].astype("string").str.strip()
+    actions["ex_date"] = pd.to_datetime(actions["ex_date"], errors="coerce").astype("datetime64[ns]")
+    for column in ("amount", "num", "den", "price"):
+        actions[column] = pd.to_numeric(actions[column], errors="coerce")
+    actions = actions.dropna(subset=["ticker", "ex_date"])
+    return actions.drop_duplicates().sort_values(["ticker", "ex_date", "kind"], kind="stable").reset_index(drop=True)
+
+
+def _last_trade_dates(engine, table):
+    last = pd.read_sql(text(f"SELECT ticker, MAX(trade_date) AS last_date FROM {table} GROUP BY ticker"), engine)
+    return pd.Series(pd.to_datetime(last["last_date"]).astype("datetime64[ns]").to_numpy(), index=last["ticker"])
+
+
+def effective_actions(actions, last_dates):
+    """Actions whose ex-date has been traded: the close before it is known and final. The rest wait,
+    and join the fingerprint (so the ticker is recomputed) the night their ex-date is loaded"""
+    last = actions["ticker"].map(last_dates)
+    return actions[last.notna() & (actions["ex_date"] <= last)]
+
+
+def fingerprints(actions):
+    """ticker -> hash of its actions"""
+    rows = pd.util.hash_pandas_object(actions, index=False)
+    return rows.groupby(actions["ticker"]).agg(lambda r: hashlib.sha1(np.sort(r.to_numpy()).tobytes()).hexdigest())
+
+
+def _closes_before(engine, table, actions):
+    """Close of each action's last bar before its ex-date"""
+    tickers = list(actions["ticker"].unique())
+    bars = pd.read_sql(text(f"SELECT ticker, trade_date, closing_price FROM {table} "
+                            f"WHERE ticker IN ({', '.join(f':t{i}' for i in range(len(tickers)))}) "
+                            f"AND closing_price IS NOT NULL"),
+                       engine, params={f"t{i}": t for i, t in enumerate(tickers)})
+    bars["trade_date"] = pd.to_datetime(bars["trade_date"]).astype("datetime64[ns]")
+    bars["ticker"] = bars["ticker"].astype("string")
+    matched = pd.merge_asof(actions.reset_index().sort_values("ex_date"), bars.sort_values("trade_date"),
+                            left_on="ex_date", right_on="trade_date", by="ticker", allow_exact_matches=False)
+    return matched.set_index("index")["closing_price"].reindex(actions.index)
+
+
+def action_factors(actions, prev_close):
+    """Price and volume factor of every action, 1 where it cannot be computed (no close before it, no
+    rights price, a dividend larger than the price)"""
+    num, den, amount, price = actions["num"], actions["den"], actions["amount"], actions["price"]
+    kind = actions["kind"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_factor = np.select(
+            [kind == "cash", kind == "bonus", kind == "split", kind == "rights"],
+            [1 - amount / prev_close,
+             den / (den + num),
+             den / num,
+             # theoretical ex-rights price over the last close
+             (den * prev_close + num * price) / ((den + num) * prev_close)],
+            default=np.nan,
+        )
+        volume_factor = np.select([kind == "bonus", kind == "split"], [(den + num) / den, num / den], default=1.0)
+    price_factor = np.where((price_factor > 0) & (price_factor <= 1e6), price_factor, 1.0)
+    volume_factor = np.where((volume_factor > 0) & np.isfinite(volume_factor), volume_factor, 1.0)
+    return price_factor, volume_factor
+
+
+def factor_segments(actions, price_factor, volume_factor):
+    """Cumulative factors as (ticker, start_date, end_date, price_factor, volume_factor) rows: bars before an
+    ex-date carry the product of that action's factor and every later one"""
+    per_day = pd.DataFrame({"ticker": actions["ticker"].to_numpy(), "end_date": actions["ex_date"].to_numpy(),
+                            "price_factor": price_factor, "volume_factor": volume_factor})
+    per_day = per_day.groupby(["ticker", "end_date"], as_index=False).prod()
+    per_day = per_day[(per_day["price_factor"] != 1) | (per_day["volume_factor"] != 1)]
+    # Products from the latest ex-date backwards
+    reverse = per_day.iloc[::-1]
+    per_day["price_factor"] = reverse.groupby("ticker")["price_factor"].cumprod().iloc[::-1]
+    per_day["volume_factor"] = reverse.groupby("ticker")["volume_factor"].cumprod().iloc[::-1]
+    per_day["start_date"] = per_day.groupby("ticker")["end_date"].shift().fillna(pd.Timestamp(FIRST_DATE))
+    # ISO text binds as a DATE on Postgres and sorts like one in SQLite
+    per_day["start_date"] = per_day["start_date"].dt.strftime("%Y-%m-%d")
+    per_day["end_date"] = per_day["end_date"].dt.strftime("%Y-%m-%d")
+    return per_day[["ticker", "start_date", "end_date", "price_factor", "volume_factor"]]
+
+
+def refresh_table(engine, table, full=False):
+    """Recompute the factors of the tickers of `table` whose actions changed (all with full=True).
+    Returns the number of tickers recomputed"""
+    ensure_tables(engine)
+    actions = effective_actions(read_actions(engine, table), _last_trade_dates(engine, table))
+    current = fingerprints(actions) if not actions.empty else pd.Series(dtype=str)
+    stored = pd.read_sql(text(f"SELECT ticker, fingerprint FROM {FINGERPRINT_TABLE} WHERE source_table = :t"),
+                         engine, params={"t": table}).set_index("ticker")["fingerprint"]
+    if full:
+        changed = set(current.index) | set(stored.index)
+    else:
+        changed = {t for t, h in current.items() if stored.get(t) != h} | (set(stored.index) - set(current.index))
+
+    if changed:
+        affected = actions[actions["ticker"].isin(changed)]
+        segments = pd.DataFrame(columns=["ticker", "start_date", "end_date", "price_factor", "volume_factor"])
+        if not affected.empty:
+            price_factor, volume_factor = action_factors(affected, _closes_before(engine, table, affected))
+            segments = factor_segments(affected, price_factor, volume_factor)
+        with engine.begin() as conn:
+            for ticker in changed:
+                conn.execute(text(f"DELETE FROM {FACTOR_TABLE} WHERE source_table = :s AND ticker = :t"),
+                             {"s": table, "t": ticker})
+                conn.execute(text(f"DELETE FROM {FINGERPRINT_TABLE} WHERE source_table = :s AND ticker = :t"),
+                             {"s": table, "t": ticker})
+            if not segments.empty:
+                conn.execute(text(f"INSERT INTO {FACTOR_TABLE} VALUES (:s, :ticker, :start_date, :end_date, "
+                                  f":price_factor, :volume_factor)"),
+                             [{"s": table, **row} for row in segments.to_dict("records")])
+            fresh = [{"s": table, "t": t, "h": h} for t, h in current.items() if t in changed]
+            if fresh:
+                conn.execute(text(f"INSERT INTO {FINGERPRINT_TABLE} VALUES (:s, :t, :h)"), fresh)
+    create_adjusted_view(engine, table)
+    return len(changed)
+
+
+def refresh(engine=None, tables=None, full=False):
+    """Pipeline stage: bring the factors of every table with corporate actions up to date. Returns {table: tickers}"""
+    from db.connection import get_engine
+
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    recomputed = {}
+    start = time.time()
+    for table in tables or ACTION_SOURCES:
+        if not inspector.has_table(table):
+            continue
+        recomputed[table] = refresh_table(engine, table, full=full)
+        print(f"  🧮 {table}: factors recomputed for {recomputed[table]} ticker(s), view {adjusted_view(table)}")
+    print(f"✅ Adjustment factors up to date ({time.time() - start:.2f}s)")
+    return recomputed
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Split, bonus, rights and dividend adjustment factors from the "
+                                                 "corporate-action tables, and <table>_adjusted views")
+    parser.add_argument("--full", action="store_true", help="recompute every ticker, not only those with new actions")
+    parser.add_argument("--table", action="append", choices=list(ACTION_SOURCES), help="only this table (repeatable)")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    args = parser.parse_args()
+
+    refresh(get_engine(args.url), tables=args.table, full=args.full)
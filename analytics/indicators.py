@@ -0,0 +1,341 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.parquet_store import select_ohlcv
+from db.schema import MANAGED_TABLES, create_table, to_ohlcv_batch
+from db.writer import forget_table, synthetic_ohlcv, upsert_batch
+
+# Rolling windows in trading days (rows of one ticker, not calendar days)
+VOLATILITY_WINDOW = 20
+SMA_WINDOWS = (20, 50, 200)
+ATR_WINDOW = 14
+VOLUME_WINDOW = 20
+TRADING_DAYS = 252
+
+INDICATORS = [
+    "return_1d", "log_return", f"volatility_{VOLATILITY_WINDOW}",
+    *(f"sma_{w}" for w in SMA_WINDOWS), f"atr_{ATR_WINDOW}",
+    f"vwap_{VOLUME_WINDOW}", f"volume_sma_{VOLUME_WINDOW}", "relative_volume",
+    "drawdown", "max_drawdown",
+]
+
+# Rolling state kept per ticker for the incremental refresh: its last KEEP_ROWS bars (enough for the
+# longest window, and the previous close the returns need) plus the running peak and max drawdown,
+# the two indicators that depend on the whole history
+STATE_TABLE = "indicator_state"
+KEEP_ROWS = max(max(SMA_WINDOWS), VOLATILITY_WINDOW + 1, ATR_WINDOW + 1, VOLUME_WINDOW)
+
+# Log prices are kept inside +-LOG_BOUND so that adding code * LOG_SPAN keeps the tickers apart in the
+# grouped running maximum
+LOG_BOUND = 30.0
+LOG_SPAN = 4 * LOG_BOUND
+
+
+def indicator_table(table):
+    """dse_tz_daily_ohlcv -> dse_tz_daily_indicators"""
+    return table.replace("_ohlcv", "") + "_indicators" if table.endswith("_ohlcv") else f"{table}_indicators"
+
+
+def _groups(tickers):
+    """Dense integer code per row and a mask of each ticker's first row, for rows sorted by ticker"""
+    first = np.ones(len(tickers), dtype=bool)
+    first[1:] = tickers[1:] != tickers[:-1]
+    codes = np.cumsum(first) - 1
+    return codes, first
+
+
+def _shift(x, first):
+    """Previous row's value within the ticker, NaN on its first row"""
+    prev = np.empty_like(x)
+    prev[0:1] = np.nan
+    prev[1:] = x[:-1]
+    prev[first] = np.nan
+    return prev
+
+
+def _rolling_sum(x, window, position):
+    """Sum over the last `window` rows of the same ticker, NaN until the window is full or if it holds a NaN.
+
+    Differences of one cumulative sum, so the cost does not depend on the window length.
+    """
+    valid = ~np.isnan(x)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(x) + 1)
+    start = np.maximum(end - window, 0)
+    total = sums[end] - sums[start]
+    full = (position >= window - 1) & (counts[end] - counts[start] == window)
+    return np.where(full, total, np.nan)
+
+
+def _grouped_running_max(values, codes, span):
+    """Running maximum that restarts at every ticker: `values` (well inside +-span/2) are lifted by code * span
+    so no ticker can see an earlier ticker's values, then one np.maximum.accumulate covers every ticker"""
+    offset = codes * span
+    return np.maximum.accumulate(values + offset) - offset
+
+
+def compute_indicators(bars):
+    """Every indicator for bars sorted by (ticker, trade_date).
+
+    `bars` is a dict of NumPy arrays: ticker, high, low, closing_price, volume, and optionally
+    emit / peak / max_drawdown. Rows with emit False are earlier bars that only feed the windows
+    (the incremental refresh's state); their peak and max_drawdown carry the running values forward.
+    Returns a dict of indicator name -> array for the emitted rows, plus peak.
+    """
+    tickers = bars["ticker"]
+    n = len(tickers)
+    high = bars["high"].astype(float)
+    low = bars["low"].astype(float)
+    close = bars["closing_price"].astype(float)
+    volume = bars["volume"].astype(float)
+    emit = bars.get("emit", np.ones(n, dtype=bool))
+    codes, first = _groups(tickers)
+    position = np.arange(n) - np.maximum.accumulate(np.where(first, np.arange(n), 0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prev_close = _shift(close, first)
+        out = {"return_1d": close / prev_close - 1}
+        log_return = np.log(close / prev_close)
+        out["log_return"] = log_return
+
+        w = VOLATILITY_WINDOW
+        s1 = _rolling_sum(log_return, w, position - 1)  # the first row of a ticker has no return
+        s2 = _rolling_sum(log_return ** 2, w, position - 1)
+        variance = np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0)
+        out[f"volatility_{w}"] = np.sqrt(variance * TRADING_DAYS)
+
+        for w in SMA_WINDOWS:
+            out[f"sma_{w}"] = _rolling_sum(close, w, position) / w
+
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        true_range[np.isnan(high) | np.isnan(low)] = np.nan
+        out[f"atr_{ATR_WINDOW}"] = _rolling_sum(true_range, ATR_WINDOW, position) / ATR_WINDOW
+
+        # Typical price weighted by volume; sources without high/low (BRVM) fall back to the close
+        typical = np.where(np.isnan(high) | np.isnan(low), close, (high + low + close) / 3)
+        w = VOLUME_WINDOW
+        volume_sum = _rolling_sum(volume, w, position)
+        out[f"vwap_{w}"] = np.where(volume_sum > 0, _rolling_sum(typical * volume, w, position) / volume_sum, np.nan)
+        out[f"volume_sma_{w}"] = volume_sum / w
+        out["relative_volume"] = np.where(volume_sum > 0, volume / out[f"volume_sma_{w}"], np.nan)
+
+        # Running peak in log space; state rows contribute their stored peak, bars without a close nothing
+        floor = -LOG_BOUND - 1
+        log_close = np.clip(np.log(close), -LOG_BOUND, LOG_BOUND)
+        if "peak" in bars:
+            log_close = np.where(emit, log_close, np.clip(np.log(bars["peak"].astype(float)), -LOG_BOUND, LOG_BOUND))
+        log_peak = _grouped_running_max(np.nan_to_num(log_close, nan=floor), codes, LOG_SPAN)
+        peak = np.where(log_peak > floor, np.exp(log_peak), np.nan)
+        drawdown = np.where(close > 0, np.expm1(np.log(close) - log_peak), np.nan)
+        out["drawdown"] = drawdown
+
+        # Max drawdown is a running minimum of drawdown (in [-1, 0]); negate it to reuse the running max
+        worst = np.where(emit, drawdown, bars["max_drawdown"].astype(float) if "max_drawdown" in bars else np.nan)
+        out["max_drawdown"] = -_grouped_running_max(np.nan_to_num(-worst, nan=0.0), codes, 4.0)
+    out["peak"] = peak
+    return {name: values[emit] for name, values in out.items()}
+
+
+def _sorted_bars(rows):
+    """Arrow OHLCV rows -> dict of NumPy arrays sorted by (ticker, trade_date)"""
+    rows = rows.filter(pc.is_valid(rows["closing_price"])) if rows.num_rows else rows
+    rows = rows.sort_by([("ticker", "ascending"), ("trade_date", "ascending")])
+    bars = {
+        "ticker": rows["ticker"].to_numpy(zero_copy_only=False),
+        "trade_date": rows["trade_date"].to_numpy(zero_copy_only=False),
+    }
+    for name in ("high", "low", "closing_price", "volume"):
+        bars[name] = pc.cast(rows[name], pa.float64()).to_numpy(zero_copy_only=False)
+    return bars
+
+
+def _indicator_batch(bars, values):
+    emit = bars.get("emit", np.ones(len(bars["ticker"]), dtype=bool))
+    columns = {"ticker": pa.array(bars["ticker"][emit], pa.string()),
+               "trade_date": pa.array(bars["trade_date"][emit].astype("datetime64[D]"))}
+    columns.update({name: pa.array(values[name], pa.float64(), from_pandas=True) for name in INDICATORS})
+    return pa.table(columns)
+
+
+def _ensure_state_table(engine):
+    float_type = "DOUBLE PRECISION" if engine.dialect.name == "postgresql" else "REAL"
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                source_table TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                trade_date DATE NOT NULL,
+                high {float_type},
+                low {float_type},
+                closing_price {float_type},
+                volume {float_type},
+                peak {float_type},
+                max_drawdown {float_type},
+                PRIMARY KEY (source_table, ticker, trade_date)
+            )
+        """))
+
+
+def _read_state(engine, table):
+    state = pd.read_sql(text(f"SELECT * FROM {STATE_TABLE} WHERE source_table = :t"), engine, params={"t": table})
+    state["trade_date"] = pd.to_datetime(state["trade_date"])
+    return state.drop(columns="source_table")
+
+
+def _save_state(engine, table, bars, values):
+    """Upsert the last KEEP_ROWS emitted bars of every ticker into the state and drop older ones"""
+    emit = bars.get("emit", np.ones(len(bars["ticker"]), dtype=bool))
+    tickers = bars["ticker"][emit]
+    _, first = _groups(tickers)
+    starts = np.flatnonzero(first)
+    ends = np.append(starts[1:], len(tickers))
+    keep = np.repeat(ends, ends - starts) - np.arange(len(tickers)) <= KEEP_ROWS
+    columns = {"source_table": pa.array(np.full(keep.sum(), table), pa.string()),
+               "ticker": pa.array(tickers[keep], pa.string()),
+               "trade_date": pa.array(bars["trade_date"][emit][keep].astype("datetime64[D]"))}
+    for name in ("high", "low", "closing_price", "volume"):
+        columns[name] = pa.array(bars[name][emit][keep], pa.float64(), from_pandas=True)
+    columns["peak"] = pa.array(values["peak"][keep], pa.float64(), from_pandas=True)
+    columns["max_drawdown"] = pa.array(values["max_drawdown"][keep], pa.float64(), from_pandas=True)
+    upsert_batch(pa.table(columns), STATE_TABLE, engine, key_columns=("source_table", "ticker", "trade_date"))
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            DELETE FROM {STATE_TABLE} WHERE source_table = :t AND (ticker, trade_date) IN (
+                SELECT ticker, trade_date FROM (
+                    SELECT ticker, trade_date,
+                           ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trade_date DESC) AS age
+                    FROM {STATE_TABLE} WHERE source_table = :t
+                ) ranked WHERE age > :keep
+            )
+        """), {"t": table, "keep": KEEP_ROWS})
+
+
+def refresh_table(engine, table, full=False):
+    """Compute and store the indicators of one OHLCV table. Returns the number of rows written.
+
+    Incremental (the default once the table has state): only bars newer than each ticker's last
+    processed day are read, their windows are completed from the stored state, and only they are
+    written, so the nightly cost follows the number of tickers rather than the length of history.
+    Bars a loader adds for days before that (JSE backfill, queue replays) need full=True.
+    """
+    _ensure_state_table(engine)
+    state = pd.DataFrame() if full else _read_state(engine, table)
+    if full or state.empty:
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {STATE_TABLE} WHERE source_table = :t"), {"t": table})
+        bars = _sorted_bars(select_ohlcv(engine, table))
+    else:
+        last = state.groupby("ticker")["trade_date"].max()
+        new = pd.DataFrame(_sorted_bars(select_ohlcv(engine, table, "WHERE trade_date > :since",
+                                                {"since": last.min().date()})))
+        # Each ticker continues after its own last processed day; tickers without state start from scratch
+        seen = new["ticker"].map(last)
+        new = new[seen.isna() | (new["trade_date"] > seen)]
+        if new.empty:
+            return 0
+        window = state[state["ticker"].isin(new["ticker"].unique())]
+        frame = pd.concat([window.assign(emit=False), new.assign(emit=True)], ignore_index=True)
+        frame = frame.sort_values(["ticker", "trade_date"], kind="stable")
+        bars = {name: frame[name].to_numpy() for name in frame.columns}
+    if len(bars["ticker"]) == 0:
+        return 0
+
+    values = compute_indicators(bars)
+    written = upsert_batch(_indicator_batch(bars, values), indicator_table(table), engine)
+    # State last: if the run dies before this, the next one recomputes the same days
+    _save_state(engine, table, bars, values)
+    return written
+
+
+def refresh(engine=None, tables=None, full=False):
+    """Nightly stage: bring the indicators of every OHLCV table (or just `tables`) up to date.
+    Returns {table: rows written}"""
+    from db.connection import get_engine
+
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    written = {}
+    start = time.time()
+    for table in tables or MANAGED_TABLES:
+        if not inspector.has_table(table):
+            continue
+        table_start = time.time()
+        written[table] = refresh_table(engine, table, full=full)
+        print(f"  📈 {indicator_table(table)}: {written[table]:,} rows ({time.time() - table_start:.2f}s)")
+    print(f"✅ Indicators up to date: {sum(written.values()):,} rows written ({time.time() - start:.2f}s)")
+    return written
+
+
+def benchmark_refresh(engine, rows=1_000_000, n_tickers=300):
+    """Time a full recompute against the incremental refresh of one new day, and check they agree"""
+    table = "_bench_indicator_ohlcv"
+    target = indicator_table(table)
+
+    def reset():
+        with engine.begin() as conn:
+            for name in (table, target):
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}" + (" CASCADE" if engine.dialect.name == "postgresql" else "")))
+            if inspect(engine).has_table(STATE_TABLE):
+                conn.execute(text(f"DELETE FROM {STATE_TABLE} WHERE source_table = :t"), {"t": table})
+        forget_table(engine, table)
+        forget_table(engine, target)
+
+    def last_day():
+        stored = pd.read_sql(text(f"SELECT * FROM {target} WHERE trade_date = :d ORDER BY ticker"), engine,
+                             params={"d": final_day})
+        return stored[INDICATORS].to_numpy(dtype=float)
+
+    bars = synthetic_ohlcv(rows, n_tickers)
+    final_day = bars["trade_date"].max()
+    reset()
+    create_table(engine, table)
+    upsert_batch(to_ohlcv_batch(bars[bars["trade_date"] < final_day]), table, engine)
+    refresh_table(engine, table, full=True)
+
+    upsert_batch(to_ohlcv_batch(bars[bars["trade_date"] == final_day]), table, engine)
+    start = time.time()
+    incremental_rows = refresh_table(engine, table)
+    incremental_time = time.time() - start
+    incremental = last_day()
+
+    start = time.time()
+    full_rows = refresh_table(engine, table, full=True)
+    full_time = time.time() - start
+    agree = np.allclose(incremental, last_day(), rtol=1e-9, atol=1e-12, equal_nan=True)
+    reset()
+
+    print(f"\n📊 Indicator refresh on {engine.dialect.name}, {rows:,} rows of history, {n_tickers} tickers")
+    print(f"   full recompute        {full_time:7.2f}s  {full_rows:>10,} rows written")
+    print(f"   incremental (1 day)   {incremental_time:7.2f}s  {incremental_rows:>10,} rows written")
+    print(f"   Speedup: {full_time / incremental_time:.0f}x, last day identical: {'✅' if agree else '❌'}")
+    return full_time, incremental_time, agree
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Returns, volatility, moving averages, ATR, VWAP and drawdowns "
+                                                 "for the OHLCV tables, into <table>_indicators")
+    parser.add_argument("--full", action="store_true",
+                        help="recompute the whole history (after backfills or loads of older days)")
+    parser.add_argument("--table", action="append", choices=MANAGED_TABLES, help="only this table (repeatable)")
+    parser.add_argument("--benchmark", action="store_true", help="time full vs incremental on a synthetic table")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows of history in the benchmark")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    if args.benchmark:
+        benchmark_refresh(engine, rows=args.rows)
+    else:
+        refresh(engine, tables=args.table, full=args.full)
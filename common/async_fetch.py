@@ -0,0 +1,59 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+class HostRateLimiter:
+    """Spaces out request starts so a single host never sees more than `rate` requests per second"""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = defaultdict(float)
+
+    async def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        # Reserve the next free slot for this host before sleeping so concurrent callers queue up
+        slot = max(now, self._next_slot[host])
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+FetchOne = Callable[[aiohttp.ClientSession, str, HostRateLimiter], Awaitable[Dict[str, Any]]]
+
+
+async def _fetch_many(urls: List[str], fetch_one: FetchOne, max_concurrency: int,
+                      per_host_rate: Optional[float], headers: Optional[Dict[str, str]],
+                      timeout: float) -> Dict[str, Dict[str, Any]]:
+    limiter = HostRateLimiter(per_host_rate)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # One pooled session for the whole run so connections are kept alive between URLs
+    connector = aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=client_timeout) as session:
+        async def worker(url):
+            async with semaphore:
+                return await fetch_one(session, url, limiter)
+
+        results = await asyncio.gather(*(worker(url) for url in urls))
+
+    return dict(zip(urls, results))
+
+
+def fetch_many(urls: List[str], fetch_one: FetchOne, max_concurrency: int = 8,
+               per_host_rate: Optional[float] = 4.0, headers: Optional[Dict[str, str]] = None,
+               timeout: float = 30) -> Dict[str, Dict[str, Any]]:
+    """Run `fetch_one` over every URL with at most `max_concurrency` requests in flight.
+
+    Returns a dict of url -> whatever `fetch_one` returned for it, in the order of `urls`.
+    """
+    return asyncio.run(_fetch_many(urls, fetch_one, max_concurrency, per_host_rate, headers, timeout))
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Dict, Mapping, Optional
+
+CACHE_DIR = "data/http_cache"
+MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """On-disk cache of raw response bodies, keyed by (url, day).
+
+    Bodies are stored once under their sha256 in blobs/, so the same 365-day history returned on
+    several nights takes the space of one file. An index (index.sqlite) maps each url and day to
+    its blob plus the ETag / Last-Modified the server sent with it. The calling loader drives it:
+
+        body = cache.get(url)                    # fetched earlier today -> served from disk
+        headers = cache.conditional_headers(url) # If-None-Match / If-Modified-Since from the last copy
+        ... request with headers ...
+        if status == 304: body = cache.not_modified(url)
+        elif the body is usable: cache.put(url, body, response.headers)
+
+    Only bodies the loader accepted are stored, so a bad answer is never replayed. When the blobs
+    grow past max_bytes the least recently used entries are dropped.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES, day: Optional[date] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.day = str(day or date.today())
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'bytes_saved': 0, 'bytes_fetched': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT NOT NULL,
+                day TEXT NOT NULL,
+                blob TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (url, day)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.root, "blobs", blob[:2], blob)
+
+    def _read_blob(self, blob: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _latest(self, url: str):
+        return self._db.execute(
+            "SELECT day, blob, size, etag, last_modified FROM responses WHERE url = ? ORDER BY day DESC LIMIT 1",
+            (url,)).fetchone()
+
+    def get(self, url: str, day: Optional[str] = None) -> Optional[bytes]:
+        """Body stored for url on day (default: the cache's day), without touching the network"""
+        day = day or self.day
+        with self._lock:
+            row = self._db.execute("SELECT blob FROM responses WHERE url = ? AND day = ?", (url, day)).fetchone()
+            body = self._read_blob(row[0]) if row else None
+            if body is None:
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE url = ? AND day = ?", (time.time(), url, day))
+            self._db.commit()
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += len(body)
+        return body
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Validators of the newest stored copy of url, to let the server answer 304 Not Modified"""
+        with self._lock:
+            row = self._latest(url)
+        headers = {}
+        if row is not None:
+            if row[3]:
+                headers['If-None-Match'] = row[3]
+            if row[4]:
+                headers['If-Modified-Since'] = row[4]
+        return headers
+
+    def not_modified(self, url: str) -> Optional[bytes]:
+        """The server answered 304: file the newest stored copy under today and return it"""
+        with self._lock:
+            row = self._latest(url)
+            body = self._read_blob(row[1]) if row else None
+            if body is None:
+                return None
+            _, blob, size, etag, last_modified = row
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (url, self.day, blob, size, etag, last_modified, time.time()))
+            self._db.commit()
+            self.stats['revalidated'] += 1
+            self.stats['bytes_saved'] += len(body)
+        return body
+
+    def put(self, url: str, body: bytes, headers: Optional[Mapping[str, str]] = None):
+        """Store a body the loader accepted, with the validators from its response headers"""
+        headers = headers or {}
+        blob = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(blob)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (url, self.day, blob, len(body), headers.get('ETag'), headers.get('Last-Modified'),
+                              time.time()))
+            self._db.commit()
+            self.stats['misses'] += 1
+            self.stats['bytes_fetched'] += len(body)
+            self._evict()
+
+    def size(self) -> int:
+        """Bytes on disk: every blob counted once however many entries point at it"""
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT blob, size FROM responses)").fetchone()[0]
+
+    def _evict(self):
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        for url, day, blob, size in self._db.execute(
+                "SELECT url, day, blob, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE url = ? AND day = ?", (url, day))
+            self.stats['evicted'] += 1
+            if self._db.execute("SELECT 1 FROM responses WHERE blob = ? LIMIT 1", (blob,)).fetchone() is None:
+                try:
+                    os.remove(self._blob_path(blob))
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._db.commit()
+
+    def print_report(self):
+        s = self.stats
+        lookups = s['hits'] + s['revalidated'] + s['misses']
+        if not lookups:
+            return
+        served = s['hits'] + s['revalidated']
+        print(f"\n📦 Response cache ({self.root})")
+        print(f"   Hit rate: {served}/{lookups} ({served / lookups * 100:.1f}%) - "
+              f"{s['hits']} same day, {s['revalidated']} revalidated (304), {s['misses']} downloaded")
+        print(f"   Bytes saved: {s['bytes_saved'] / 1e6:,.2f} MB, downloaded: {s['bytes_fetched'] / 1e6:,.2f} MB")
+        print(f"   On disk: {self.size() / 1e6:,.2f} MB of {self.max_bytes / 1e6:,.0f} MB"
+              + (f", {s['evicted']} entries evicted" if s['evicted'] else ""))
+
+    def close(self):
+        self._db.close()
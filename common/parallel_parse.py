@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+
+def _safe_parse(parse_file: Callable[[str], pd.DataFrame], path: str):
+    # Runs in the worker: hand errors back as text so one bad page cannot kill the pool
+    try:
+        return path, parse_file(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _collect(results):
+    frames, errors = [], []
+    for path, df, error in results:
+        if error is None:
+            frames.append(df)
+            print(f"  ✓ {os.path.basename(path)}: extracted {len(df)} rows")
+        else:
+            errors.append((path, error))
+            print(f"  ✗ ERROR {os.path.basename(path)}: {error}")
+    return frames, errors
+
+
+def parse_files_parallel(files: List[str], parse_file: Callable[[str], pd.DataFrame],
+                         workers: Optional[int] = None) -> Tuple[List[pd.DataFrame], List[Tuple[str, str]]]:
+    """Parse every file with `parse_file` across a process pool.
+
+    parse_file must be a module-level function (or a functools.partial of one) so it can be pickled,
+    and its module importable by name: workers are fresh interpreters.
+    Returns (frames in file order, [(file, error message)]). workers=None uses every core;
+    workers=1 or a single file parses in this process.
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(files), 1))
+    start = time.time()
+    job = partial(_safe_parse, parse_file)
+
+    if workers <= 1:
+        frames, errors = _collect(map(job, files))
+    else:
+        # Small chunks keep workers busy without paying one round trip per page
+        chunksize = max(1, len(files) // (workers * 4))
+        # Spawned, not forked: the pipeline calls this from a stage thread, and a fork of a threaded
+        # process can inherit locks (logging, stdout, DB drivers) held by the other stages mid-use
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            frames, errors = _collect(pool.map(job, files, chunksize=chunksize))
+
+    elapsed = time.time() - start
+    print(f"⚡ Parsed {len(files)} files in {elapsed:.2f}s "
+          f"({len(files) / elapsed if elapsed else 0:.1f} files/sec, {workers} worker(s))")
+    return frames, errors
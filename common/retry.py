@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+# Statuses where asking again will not change the answer
+NON_RETRYABLE_STATUSES = (400, 401, 403, 404, 405, 410, 422)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds a Retry-After header asks for (delta-seconds or an HTTP date), None when absent or unreadable"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryBudget:
+    """Caps the total number of retries (not first attempts) a whole run may spend"""
+
+    def __init__(self, max_retries: Optional[int]):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.max_retries is not None and self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self):
+        if self.max_retries is None:
+            return None
+        return max(self.max_retries - self.used, 0)
+
+
+class RetryState:
+    """Retry bookkeeping for a single URL, created by RetryPolicy.start()"""
+
+    def __init__(self, policy: "RetryPolicy", url: str):
+        self.policy = policy
+        self.url = url
+        self.attempts = 0
+        self.delay = policy.base_delay
+        self.last_error = None
+        self.identical_errors = 0
+        self.stop_reason = None
+        self.started = time.monotonic()
+
+    def begin_attempt(self):
+        self.attempts += 1
+
+    def retry_after(self, error: str, status_code: Optional[int] = None, content_error: bool = False,
+                    server_delay: Optional[float] = None) -> Optional[float]:
+        """Register a failed attempt. Returns how long to sleep before retrying, or None to give up.
+
+        content_error marks failures where the server answered but the body was unusable
+        (bad JSON, empty payload). Those repeat identically when the endpoint is broken, so
+        they fail fast after max_identical_errors in a row. server_delay is the response's
+        Retry-After (see parse_retry_after): never retry sooner, and give up when it is past max_delay.
+        """
+        policy = self.policy
+
+        if content_error and error == self.last_error:
+            self.identical_errors += 1
+        else:
+            self.identical_errors = 1 if content_error else 0
+        self.last_error = error
+
+        if status_code is not None and status_code in policy.non_retryable_statuses:
+            self.stop_reason = f"non-retryable HTTP {status_code}"
+        elif content_error and self.identical_errors >= policy.max_identical_errors:
+            self.stop_reason = f"same error {self.identical_errors} times in a row"
+        elif server_delay is not None and server_delay > policy.max_delay:
+            self.stop_reason = f"Retry-After {server_delay:.0f}s is past the {policy.max_delay:.0f}s cap"
+        elif self.attempts > policy.max_retries:
+            self.stop_reason = "max retries reached"
+        elif policy.budget is not None and not policy.budget.try_acquire():
+            self.stop_reason = "run retry budget exhausted"
+        if self.stop_reason:
+            return None
+
+        # Decorrelated jitter: next delay is random between base and 3x the previous one, capped
+        self.delay = min(policy.max_delay, policy.rng.uniform(policy.base_delay, self.delay * 3))
+        if server_delay is not None:
+            self.delay = max(self.delay, server_delay)
+        return self.delay
+
+    def finish(self, success: bool):
+        self.policy._record(self, success)
+
+
+class RetryPolicy:
+    """Exponential backoff with decorrelated jitter, a delay cap and an optional run-wide retry budget.
+
+    Also keeps per-URL attempt counts and elapsed time so the run report can show where the time went.
+    """
+
+    def __init__(self, max_retries: int = 8, base_delay: float = 1.0, max_delay: float = 30.0,
+                 budget: Optional[RetryBudget] = None,
+                 non_retryable_statuses: Iterable[int] = NON_RETRYABLE_STATUSES,
+                 max_identical_errors: int = 3, rng: Optional[random.Random] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.non_retryable_statuses = set(non_retryable_statuses)
+        self.max_identical_errors = max_identical_errors
+        # Seed one (random.Random(0)) to get the same delays every run
+        self.rng = rng or random.Random()
+        self.stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def start(self, url: str) -> RetryState:
+        return RetryState(self, url)
+
+    def _record(self, state: RetryState, success: bool):
+        with self._lock:
+            self.stats[state.url] = {
+                'attempts': state.attempts,
+                'seconds': time.monotonic() - state.started,
+                'success': success,
+                'stop_reason': state.stop_reason,
+            }
+
+    def attempt_histogram(self) -> Counter:
+        """attempts -> number of URLs that needed that many attempts"""
+        return Counter(s['attempts'] for s in self.stats.values())
+
+    def print_report(self, top: int = 5):
+        if not self.stats:
+            return
+        print(f"\n📊 Retry report")
+        for attempts, count in sorted(self.attempt_histogram().items()):
+            print(f"   {attempts:>3} attempt(s): {count} URLs {'#' * min(count, 50)}")
+        if self.budget is not None:
+            print(f"   Retry budget used: {self.budget.used}/{self.budget.max_retries}")
+        reasons = Counter(s['stop_reason'] for s in self.stats.values() if s['stop_reason'])
+        for reason, count in reasons.most_common():
+            print(f"   Gave up ({reason}): {count} URLs")
+        slowest = sorted(self.stats.items(), key=lambda kv: kv[1]['seconds'], reverse=True)[:top]
+        print(f"   Slowest URLs:")
+        for url, s in slowest:
+            print(f"   • {s['seconds']:.1f}s over {s['attempts']} attempt(s) {'✅' if s['success'] else '❌'} {url[:80]}")
@@ -0,0 +1,221 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.writer import upsert_dataframe
+
+ACTIONS_DIR = "CORPORATE_ACTIONS"
+CHUNK_ROWS = 50_000
+
+# Dates in the action files come as 05-Mar-2024 (NSE) or ISO; each column is parsed once, trying these in order
+DATE_FORMATS = ("%d-%b-%Y", "%Y-%m-%d", "%d/%m/%Y")
+
+_CASH = [
+    ("ticker", "text", True),
+    ("announcement_date", "date", True),
+    ("record_date", "date", True),
+    ("pay_date", "date", False),
+    ("distribution_type", "text", False),
+    ("amount_per_share", "float", True),
+    ("currency", "text", False),
+]
+
+# <exchange>_<kind>.csv -> (<exchange>_corporate_actions_<table>, [(column, type, required)], key columns).
+# Required columns must be in the file header and filled on every row; optional ones may be missing
+ACTION_FILES = {
+    "dividends": ("dividends", _CASH, ["ticker", "announcement_date", "distribution_type"]),
+    "distributions": ("distributions", _CASH, ["ticker", "announcement_date"]),
+    "bonus_issues": ("bonus", [
+        ("ticker", "text", True),
+        ("announcement_date", "date", True),
+        ("book_closure_date", "date", True),
+        ("credit_date", "date", False),
+        ("bonus_ratio_num", "float", True),
+        ("bonus_ratio_den", "float", True),
+    ], ["ticker", "announcement_date"]),
+    "rights": ("rights", [
+        ("ticker", "text", True),
+        ("announcement_date", "date", True),
+        ("book_closure_date", "date", True),
+        ("credit_date", "date", False),
+        ("rights_ratio_num", "float", True),
+        ("rights_ratio_den", "float", True),
+        ("rights_price", "float", False),
+    ], ["ticker", "announcement_date"]),
+    "splits": ("splits", [
+        ("ticker", "text", True),
+        ("announcement_date", "date", True),
+        ("book_closure_date", "date", True),
+        ("split_ratio_num", "float", True),
+        ("split_ratio_den", "float", True),
+    ], ["ticker", "announcement_date"]),
+}
+
+
+def action_table(exchange, table_kind):
+    return f"{exchange.lower()}_corporate_actions_{table_kind}"
+
+
+def ensure_action_table(engine, table, columns):
+    """Create `table` with the schema's column types, or add optional columns an older table lacks"""
+    types = {"text": "TEXT", "date": "DATE",
+             "float": "DOUBLE PRECISION" if engine.dialect.name == "postgresql" else "REAL"}
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        if not inspector.has_table(table):
+            body = ",\n".join(f"    {name} {types[kind]}" for name, kind, _ in columns)
+            conn.execute(text(f"CREATE TABLE {table} (\n{body}\n)"))
+            return
+        stored = {c["name"] for c in inspector.get_columns(table)}
+        for name, kind, _ in columns:
+            if name not in stored:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {types[kind]}"))
+
+
+def find_action_files(directory=ACTIONS_DIR, exchanges=None):
+    """[(path, exchange, file kind)] for every <exchange>_<kind>.csv in `directory`"""
+    found = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        exchange, _, kind = stem.partition("_")
+        if kind not in ACTION_FILES:
+            print(f"⚠️  {path}: not an <exchange>_<{'|'.join(ACTION_FILES)}>.csv file, skipped")
+            continue
+        if exchanges and exchange not in {e.lower() for e in exchanges}:
+            continue
+        found.append((path, exchange, kind))
+    return found
+
+
+def _parse_dates(values):
+    """Strings -> datetime64, trying DATE_FORMATS in order on whatever the previous ones left unparsed"""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        todo = parsed.isna() & values.notna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(values[todo], format=fmt, errors="coerce")
+    return parsed
+
+
+def conform(frame, columns):
+    """Typed copy of `frame` in schema order, and a mask of rows that break the schema (a required value
+    missing, or a value that is not a date / number)"""
+    typed = pd.DataFrame(index=frame.index)
+    bad = pd.Series(False, index=frame.index)
+    for name, kind, required in columns:
+        raw = frame[name] if name in frame.columns else pd.Series(None, index=frame.index, dtype="object")
+        raw = raw.astype("string").str.strip().replace("", pd.NA)
+        if kind == "date":
+            value = _parse_dates(raw)
+        elif kind == "float":
+            value = pd.to_numeric(raw, errors="coerce").astype("float64")
+        else:
+            value = raw
+        # Present in the file but not readable as the type
+        bad |= raw.notna() & value.isna()
+        if required:
+            bad |= value.isna()
+        typed[name] = value
+    return typed, bad
+
+
+def _row_hashes(typed):
+    return pd.util.hash_pandas_object(typed, index=False).to_numpy()
+
+
+def stored_hashes(engine, table, columns):
+    """Hash index of the rows already in `table`, normalised the same way as incoming rows, sorted for np.isin"""
+    select = ", ".join(name for name, _, _ in columns)
+    rows = pd.read_sql(text(f"SELECT {select} FROM {table}"), engine, dtype=object)
+    if rows.empty:
+        return np.array([], dtype=np.uint64)
+    # Older loads stored the dates as ISO text; conform() reads both
+    typed, _ = conform(rows.astype("string"), columns)
+    return np.unique(_row_hashes(typed))
+
+
+def ingest_file(path, exchange, kind, engine, chunk_rows=CHUNK_ROWS):
+    """Stream one action file into its table. Returns the table and counts of rows read, rejected, repeated
+    (a later line has the same key), unchanged (identical to the stored row) and written"""
+    table_kind, columns, key_columns = ACTION_FILES[kind]
+    table = action_table(exchange, table_kind)
+    header = pd.read_csv(path, nrows=0).columns.str.strip().str.lower()
+    missing = [name for name, _, required in columns if required and name not in header]
+    if missing:
+        raise ValueError(f"{path} is missing required column(s) {missing} for {kind}")
+
+    ensure_action_table(engine, table, columns)
+    seen = stored_hashes(engine, table, columns)
+    counts = {"read": 0, "rejected": 0, "repeated": 0, "unchanged": 0, "written": 0}
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows, skip_blank_lines=True)
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        # Spreadsheet line numbers for the report: header is line 1
+        chunk.index = chunk.index + 2
+        counts["read"] += len(chunk)
+        typed, bad = conform(chunk, columns)
+        if bad.any():
+            counts["rejected"] += int(bad.sum())
+            print(f"   ⚠️  {path}: rejected line(s) {list(typed.index[bad][:5])}"
+                  f"{' ...' if bad.sum() > 5 else ''} (missing or unreadable values)")
+            typed = typed[~bad]
+
+        # Last row of a key wins, as it would in the table
+        repeated = typed.duplicated(subset=key_columns, keep="last")
+        counts["repeated"] += int(repeated.sum())
+        typed = typed[~repeated]
+        # Rows identical to one stored (or met earlier in the file) need no write
+        hashes = _row_hashes(typed)
+        new = ~np.isin(hashes, seen)
+        counts["unchanged"] += int((~new).sum())
+        typed = typed[new]
+        if typed.empty:
+            continue
+        seen = np.union1d(seen, hashes[new])
+
+        for name, kind_, _ in columns:
+            if kind_ == "date":
+                typed[name] = typed[name].dt.date
+        # NULL never matches in ON CONFLICT, so an empty key part is stored as ''
+        typed[key_columns] = typed[key_columns].fillna("")
+        counts["written"] += upsert_dataframe(typed, table, engine, key_columns=key_columns)
+    return table, counts
+
+
+def ingest(directory=ACTIONS_DIR, exchanges=None, engine=None, chunk_rows=CHUNK_ROWS):
+    """Pipeline stage: load every corporate-action file in `directory`. Returns {table: counts}"""
+    from db.connection import get_engine
+
+    engine = engine or get_engine()
+    results = {}
+    start = time.time()
+    for path, exchange, kind in find_action_files(directory, exchanges):
+        file_start = time.time()
+        table, counts = ingest_file(path, exchange, kind, engine, chunk_rows)
+        results[table] = counts
+        print(f"  📄 {path} → {table}: {counts['read']:,} read, {counts['written']:,} written, "
+              f"{counts['unchanged']:,} unchanged, {counts['repeated']:,} repeated, {counts['rejected']:,} rejected ({time.time() - file_start:.2f}s)")
+    print(f"✅ Corporate actions loaded from {len(results)} file(s) ({time.time() - start:.2f}s)")
+    return results
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Load the <exchange>_<kind>.csv corporate-action files "
+                                                 "into <exchange>_corporate_actions_<kind> tables")
+    parser.add_argument("--dir", default=ACTIONS_DIR, help="folder with the action files")
+    parser.add_argument("--exchange", action="append", help="only this exchange's files, e.g. nse (repeatable)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    args = parser.parse_args()
+
+    ingest(args.dir, args.exchange, get_engine(args.url), args.chunk_rows)
@@ -0,0 +1,384 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.schema import OHLCV_ARROW_SCHEMA, OHLCV_TABLES, to_ohlcv_batch
+
+# <root>/exchange=<code>/year=<yyyy>/<file>.parquet, readable by anything that understands Hive partitions
+STORE_DIR = "data/parquet/ohlcv"
+STATE_FILE = "_sync_state.json"  # leading underscore: dataset discovery skips it
+
+SCHEMA = OHLCV_ARROW_SCHEMA
+PARTITIONING = ds.partitioning(pa.schema([("exchange", pa.string()), ("year", pa.int16())]), flavor="hive")
+
+# Rows are sorted by ticker inside a file, so small row groups let a ticker filter skip most of a year
+ROW_GROUP_ROWS = 32_768
+# A partition gets one file per nightly sync; past this many they are merged into one
+COMPACT_AFTER = 32
+
+
+def _read_state(root):
+    path = os.path.join(root, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(root, state):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _write_file(rows, path):
+    """Write an Arrow table sorted by (ticker, trade_date); a crash never leaves a half written .parquet behind"""
+    rows = rows.sort_by([("ticker", "ascending"), ("trade_date", "ascending")])
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    partial = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(rows, partial, row_group_size=ROW_GROUP_ROWS, compression="zstd")
+    os.replace(partial, path)
+
+
+def _write_partitions(rows, root, exchange, name):
+    """Split an Arrow table by year and write one <name>.parquet per exchange/year directory. Returns rows written"""
+    if rows.num_rows == 0:
+        return 0
+    years = pc.year(rows["trade_date"])
+    for year in pc.unique(years).to_pylist():
+        path = os.path.join(root, f"exchange={exchange}", f"year={year}", f"{name}.parquet")
+        _write_file(rows.filter(pc.equal(years, year)), path)
+    return rows.num_rows
+
+
+def _copy_select(engine, query, params):
+    """Postgres: COPY the query out as CSV and parse it straight into Arrow, no per-row Python objects"""
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        buffer = io.BytesIO()
+        cur.copy_expert(f"COPY ({cur.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv)", buffer)
+    finally:
+        raw.close()
+    if buffer.tell() == 0:
+        return SCHEMA.empty_table()
+    buffer.seek(0)
+    return pacsv.read_csv(
+        buffer,
+        read_options=pacsv.ReadOptions(column_names=SCHEMA.names),
+        # Unquoted empty fields are NULL in COPY csv, a quoted "" is an empty string
+        convert_options=pacsv.ConvertOptions(column_types=SCHEMA, quoted_strings_can_be_null=False),
+    )
+
+
+def select_ohlcv(engine, table, where="", params=None):
+    """The table's OHLCV columns as an Arrow table; any the table does not have come back as NULL.
+
+    `where` uses :name placeholders.
+    """
+    params = params or {}
+    stored = {c["name"] for c in inspect(engine).get_columns(table)}
+    columns = ", ".join(c if c in stored else f"NULL AS {c}" for c in SCHEMA.names)
+    query = f"SELECT {columns} FROM {table} {where}"
+    if engine.dialect.name == "postgresql":
+        for name in params:
+            query = query.replace(f":{name}", f"%({name})s")
+        return _copy_select(engine, query, params)
+    return to_ohlcv_batch(pd.read_sql(text(query), engine, params=params))
+
+
+def compact_partition(directory):
+    """Merge every file of one exchange/year directory into one, dropping repeated (ticker, trade_date) rows"""
+    files = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+    if len(files) < 2:
+        return False
+    merged = pa.concat_tables([pq.read_table(os.path.join(directory, f), schema=SCHEMA) for f in files])
+    # Later files win; they hold the more recent copy of a day
+    frame = merged.to_pandas().drop_duplicates(subset=["ticker", "trade_date"], keep="last")
+    _write_file(pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False),
+                os.path.join(directory, f"compacted_{int(time.time())}.parquet"))
+    # The merged file is in place before the old ones go, so a crash in between only leaves duplicates
+    # that the next compaction drops
+    for f in files:
+        os.remove(os.path.join(directory, f))
+    return True
+
+
+def compact(root=STORE_DIR, min_files=2):
+    compacted = 0
+    for directory, _, files in os.walk(root):
+        if sum(f.endswith(".parquet") for f in files) >= min_files:
+            compacted += compact_partition(directory)
+    return compacted
+
+
+def _year(dialect):
+    return "CAST(EXTRACT(YEAR FROM trade_date) AS INTEGER)" if dialect == "postgresql" \
+        else "CAST(strftime('%Y', trade_date) AS INTEGER)"
+
+
+def year_fingerprints(engine, table, bounds):
+    """year -> one fingerprint per date in `bounds`, each over the rows up to that date.
+
+    A fingerprint is the row count, the ticker count and integer sums of the values (prices in
+    1/10000ths), so it is exact on both databases: a row added, removed or corrected in a year
+    changes that year's fingerprint.
+    """
+    stored = {c["name"] for c in inspect(engine).get_columns(table)}
+    values = [c for c in ("volume", "security_id") if c in stored]
+    prices = [c for c in ("opening_price", "high", "low", "closing_price") if c in stored]
+    exprs = []
+    for i in range(len(bounds)):
+        when = f"CASE WHEN trade_date <= :bound{i} THEN"
+        exprs += [f"COUNT({when} 1 END)", f"COUNT(DISTINCT {when} ticker END)"]
+        exprs += [f"SUM({when} {c} END)" for c in values]
+        exprs += [f"SUM({when} CAST(ROUND({c} * 10000) AS BIGINT) END)" for c in prices]
+    width = len(exprs) // len(bounds)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT {_year(engine.dialect.name)} AS year, {', '.join(exprs)} FROM {table} "
+            f"WHERE trade_date <= :until GROUP BY 1"
+        ), {"until": max(bounds), **{f"bound{i}": bound for i, bound in enumerate(bounds)}}).all()
+    return {int(row[0]): [[int(v or 0) for v in row[1 + i * width:1 + (i + 1) * width]] for i in range(len(bounds))]
+            for row in rows}
+
+
+def rewrite_partition(engine, root, exchange, tables, year):
+    """Replace one exchange/year directory with that year's rows from the database.
+    tables maps each of the exchange's tables to the last trade_date to take from it. Returns rows written"""
+    directory = os.path.join(root, f"exchange={exchange}", f"year={year}")
+    old = [f for f in os.listdir(directory) if f.endswith(".parquet")] if os.path.isdir(directory) else []
+    rows = pa.concat_tables([
+        select_ohlcv(engine, table, "WHERE trade_date >= :low AND trade_date < :high AND trade_date <= :until",
+                     {"low": date(year, 1, 1), "high": date(year + 1, 1, 1), "until": until})
+        for table, until in tables.items()
+    ])
+    name = f"synced_{int(time.time())}.parquet"
+    if rows.num_rows:
+        _write_file(rows, os.path.join(directory, name))
+    # Same order as compact_partition: the new file is in place before the old ones go
+    for f in old:
+        if f != name:
+            os.remove(os.path.join(directory, f))
+    return rows.num_rows
+
+
+def sync(root=STORE_DIR, engine=None):
+    """Nightly stage: bring the store up to date with every OHLCV table.
+
+    Days after a table's last synced trade_date are appended. Rows a loader wrote below it (a gap
+    backfill, a queue replay, an overlap reload, a corrected price) change the fingerprint of their
+    year, which is compared against the one saved at the last sync; those exchange/year partitions
+    are rewritten from the database. Costs one aggregate over each table per run.
+    Returns {table: rows appended}.
+    """
+    from db.connection import get_engine
+
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    state = _read_state(root)
+    written = {}
+    start = time.time()
+
+    for exchange, tables in OHLCV_TABLES.items():
+        plans = {}
+        for table in tables:
+            if not inspector.has_table(table):
+                continue
+            entry = state.get(table)
+            if isinstance(entry, str):
+                # A store synced before fingerprints were kept: its synced years are rewritten once
+                entry = {"watermark": entry, "years": None}
+            with engine.connect() as conn:
+                until = conn.execute(text(f"SELECT MAX(trade_date) FROM {table}")).scalar()
+            if until is None:
+                written[table] = 0
+                continue
+            until = pd.Timestamp(until).date()
+            synced = date.fromisoformat(entry["watermark"]) if entry else None
+            prints = year_fingerprints(engine, table, [synced or date.min, until])
+            changed = set()
+            if synced:
+                saved = entry["years"]
+                for year in set(prints) | {int(y) for y in saved or {}}:
+                    now = prints[year][0] if year in prints else None
+                    if saved is None:
+                        if now and now[0]:
+                            changed.add(year)
+                    elif saved.get(str(year), [0] * len(now or [])) != now:
+                        changed.add(year)
+            plans[table] = {"synced": synced, "until": until, "changed": changed,
+                            "years": {str(year): fp[1] for year, fp in prints.items() if fp[1][0]}}
+
+        rewrite = sorted(set().union(*(plan["changed"] for plan in plans.values())))
+        limits = {table: plan["until"] for table, plan in plans.items()}
+        for year in rewrite:
+            rows = rewrite_partition(engine, root, exchange, limits, year)
+            print(f"  ♻️  exchange={exchange}/year={year}: rewritten with {rows:,} rows (changed below the last sync)")
+        for table, plan in plans.items():
+            where, params = "WHERE trade_date <= :until", {"until": plan["until"]}
+            if plan["synced"]:
+                where, params = where + " AND trade_date > :synced", {**params, "synced": plan["synced"]}
+            rows = select_ohlcv(engine, table, where, params)
+            if rewrite and rows.num_rows:
+                rows = rows.filter(pc.invert(pc.is_in(pc.year(rows["trade_date"]), pa.array(rewrite, pa.int64()))))
+            written[table] = 0
+            if rows.num_rows:
+                bounds = pc.min_max(rows["trade_date"])
+                first, last = bounds["min"].as_py(), bounds["max"].as_py()
+                # Named after its date range, so rerunning an interrupted sync rewrites the same file
+                written[table] = _write_partitions(rows, root, exchange, f"{table}_{first:%Y%m%d}_{last:%Y%m%d}")
+                print(f"  📦 {table}: {written[table]:,} rows ({first} → {last})")
+            state[table] = {"watermark": plan["until"].isoformat(), "years": plan["years"]}
+        # Recorded only once the exchange's files are written: an interrupted run checks the same years again
+        _write_state(root, state)
+
+    merged = compact(root, min_files=COMPACT_AFTER)
+    print(f"✅ Parquet store in sync: {sum(written.values()):,} rows appended, {merged} partition(s) compacted "
+          f"({time.time() - start:.2f}s)")
+    return written
+
+
+def rebuild(root=STORE_DIR, engine=None, exchanges=None):
+    """Rewrite the store (or just some exchanges) from the database, one year of one table at a time"""
+    from db.connection import get_engine
+
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    state = _read_state(root)
+    start = time.time()
+    total = 0
+    for exchange, tables in OHLCV_TABLES.items():
+        if exchanges and exchange not in exchanges:
+            continue
+        shutil.rmtree(os.path.join(root, f"exchange={exchange}"), ignore_errors=True)
+        for table in tables:
+            state.pop(table, None)
+            if not inspector.has_table(table):
+                continue
+            with engine.connect() as conn:
+                first, last = conn.execute(text(f"SELECT MIN(trade_date), MAX(trade_date) FROM {table}")).one()
+            if first is None:
+                continue
+            first, last = pd.Timestamp(first), pd.Timestamp(last)
+            for year in range(first.year, last.year + 1):
+                # Year bounds keep memory flat and let Postgres read one partition per query
+                rows = select_ohlcv(engine, table, "WHERE trade_date >= :low AND trade_date < :high",
+                               {"low": date(year, 1, 1), "high": date(year + 1, 1, 1)})
+                total += _write_partitions(rows, root, exchange, f"{table}_full")
+            prints = year_fingerprints(engine, table, [last.date()])
+            state[table] = {"watermark": last.date().isoformat(),
+                            "years": {str(year): fp[0] for year, fp in prints.items()}}
+            print(f"  📦 {table}: exported {first.date()} → {last.date()}")
+    _write_state(root, state)
+    print(f"✅ Rebuilt {root}: {total:,} rows in {time.time() - start:.2f}s")
+    return total
+
+
+def dataset(root=STORE_DIR):
+    """The whole store as one Arrow dataset; files are memory mapped rather than read into buffers"""
+    return ds.dataset(root, format="parquet", schema=SCHEMA.append(pa.field("exchange", pa.string()))
+                      .append(pa.field("year", pa.int16())),
+                      partitioning=PARTITIONING, filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+
+def read_ohlcv(exchanges=None, tickers=None, start=None, end=None, columns=None, root=STORE_DIR,
+               as_arrow=False):
+    """Daily bars from the Parquet store, no database needed.
+
+    Exchange and year filters prune whole directories, ticker and date filters are checked against
+    row group statistics before anything is decoded. Returns a DataFrame, or an Arrow table with
+    as_arrow=True.
+    """
+    conditions = []
+    if exchanges:
+        conditions.append(ds.field("exchange").isin(list(exchanges)))
+    if tickers:
+        conditions.append(ds.field("ticker").isin(list(tickers)))
+    if start is not None:
+        start = pd.Timestamp(start).date()
+        conditions.append(ds.field("year") >= start.year)
+        conditions.append(ds.field("trade_date") >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        end = pd.Timestamp(end).date()
+        conditions.append(ds.field("year") <= end.year)
+        conditions.append(ds.field("trade_date") <= pa.scalar(end, pa.date32()))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    rows = dataset(root).to_table(columns=columns, filter=condition)
+    return rows if as_arrow else rows.to_pandas()
+
+
+def benchmark_reads(engine, root=STORE_DIR, repeat=3):
+    """Full-universe scan and a one-ticker-one-year read, through pandas + the database vs the store"""
+    tables = [t for ts in OHLCV_TABLES.values() for t in ts if inspect(engine).has_table(t)]
+    sample = read_ohlcv(columns=["ticker", "trade_date"], root=root).iloc[0]
+    ticker, year = sample["ticker"], sample["trade_date"].year
+    low, high = date(year, 1, 1), date(year, 12, 31)
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            rows = len(fn())
+            times.append(time.perf_counter() - t)
+        return min(times), rows
+
+    runs = {
+        "full scan, database": lambda: pd.concat([pd.read_sql(f"SELECT * FROM {t}", engine) for t in tables]),
+        "full scan, parquet": lambda: read_ohlcv(root=root),
+        "1 ticker/year, database": lambda: pd.concat([
+            pd.read_sql(text(f"SELECT * FROM {t} WHERE ticker = :ticker AND trade_date BETWEEN :low AND :high"),
+                        engine, params={"ticker": ticker, "low": low, "high": high}) for t in tables]),
+        "1 ticker/year, parquet": lambda: read_ohlcv(tickers=[ticker], start=low, end=high, root=root),
+    }
+    print(f"\n📊 Read benchmark ({engine.dialect.name} vs {root}, best of {repeat})")
+    results = {}
+    for label, fn in runs.items():
+        seconds, rows = best(fn)
+        results[label] = seconds
+        print(f"   {label:<24} {seconds:8.3f}s  {rows:>10,} rows  {rows / seconds:>14,.0f} rows/sec")
+    return results
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Hive partitioned Parquet copy of the OHLCV tables (default: sync)")
+    parser.add_argument("--root", default=STORE_DIR, help="store directory")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    parser.add_argument("--rebuild", action="store_true", help="export everything again instead of appending")
+    parser.add_argument("--exchange", nargs="+", help="with --rebuild, only these exchanges")
+    parser.add_argument("--compact", action="store_true", help="merge every partition into a single file")
+    parser.add_argument("--benchmark", action="store_true", help="compare database and Parquet reads")
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    if args.rebuild:
+        rebuild(args.root, engine, args.exchange)
+    elif not (args.compact or args.benchmark):
+        sync(args.root, engine)
+    if args.compact:
+        print(f"🗜️  Compacted {compact(args.root)} partition(s)")
+    if args.benchmark:
+        benchmark_reads(engine, args.root)
@@ -0,0 +1,383 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# exchange code -> OHLCV tables holding its daily bars
+OHLCV_TABLES = {
+    "DSE": ["dse_tz_daily_ohlcv"],
+    "NSE": ["nse_ke_daily_ohlcv"],
+    "JSE": ["jse_sa_daily_ohlcv", "jse_indices_daily_ohlcv"],
+    "BRVM": ["brvm_daily_ohlcv", "brvm_indices_daily_ohlcv"],
+    "BVC": ["bvc_ma_daily_ohlcv"],
+}
+MANAGED_TABLES = [table for tables in OHLCV_TABLES.values() for table in tables]
+
+PRIMARY_KEY = ("ticker", "trade_date")
+
+# column -> (Postgres type, SQLite type, pandas dtype). Every exchange shares the layout, a source
+# that has no high/low (BRVM) just leaves them NULL
+OHLCV_COLUMNS = {
+    "trade_date": ("DATE", "DATE", "date"),
+    "ticker": ("TEXT", "TEXT", "string"),
+    "security_id": ("INTEGER", "INTEGER", "Int64"),
+    "opening_price": ("DOUBLE PRECISION", "REAL", "float64"),
+    "high": ("DOUBLE PRECISION", "REAL", "float64"),
+    "low": ("DOUBLE PRECISION", "REAL", "float64"),
+    "closing_price": ("DOUBLE PRECISION", "REAL", "float64"),
+    "volume": ("BIGINT", "INTEGER", "Int64"),
+}
+
+# Added by migration.py to tables copied from SQLite, to line verification chunks up with the source
+# rows. It is dropped once the copy verifies; a table that still has it has not been checked yet
+SQLITE_ROWID_COLUMN = "_sqlite_rowid"
+
+# The same columns as the record batch every loader hands to the writer (db/writer.py upsert_batch)
+OHLCV_ARROW_SCHEMA = pa.schema([
+    ("trade_date", pa.date32()),
+    ("ticker", pa.string()),
+    ("security_id", pa.int32()),
+    ("opening_price", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("closing_price", pa.float64()),
+    ("volume", pa.int64()),
+])
+
+# Postgres tables are range partitioned on trade_date, one partition per year from here on,
+# plus a default partition that catches anything outside the years created so far
+FIRST_YEAR = 2000
+YEARS_AHEAD = 1
+
+
+def table_ddl(table, dialect):
+    """CREATE TABLE statement for one managed OHLCV table"""
+    pg = dialect == "postgresql"
+    columns = []
+    for name, (pg_type, sqlite_type, _) in OHLCV_COLUMNS.items():
+        not_null = " NOT NULL" if name in PRIMARY_KEY else ""
+        columns.append(f"    {name} {pg_type if pg else sqlite_type}{not_null}")
+    columns.append(f"    PRIMARY KEY ({', '.join(PRIMARY_KEY)})")
+    partitioning = " PARTITION BY RANGE (trade_date)" if pg else ""
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n" + ",\n".join(columns) + f"\n){partitioning}"
+
+
+def partition_name(table, year):
+    return f"{table}_y{year}"
+
+
+def _partitions(conn, table):
+    """year -> partition name of the partitions attached to `table`"""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+    ), {"table": table}).scalars()
+    prefix = f"{table}_y"
+    return {int(name[len(prefix):]): name for name in rows if name.startswith(prefix) and name[len(prefix):].isdigit()}
+
+
+def ensure_partitions(engine, table, first_year=FIRST_YEAR, last_year=None):
+    """Create the missing yearly partitions of `table` (Postgres only).
+
+    Rows of a year that landed in the default partition before its partition existed are moved
+    into the new partition in the same transaction. Returns the years created.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    last_year = last_year or date.today().year + YEARS_AHEAD
+    created = []
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        existing = _partitions(conn, table)
+        for year in range(first_year, last_year + 1):
+            if year in existing:
+                continue
+            low, high = f"{year}-01-01", f"{year + 1}-01-01"
+            bounds = f"trade_date >= '{low}' AND trade_date < '{high}'"
+            conn.execute(text(f"CREATE TEMP TABLE _moved (LIKE {table}) ON COMMIT DROP"))
+            conn.execute(text(
+                f"WITH moved AS (DELETE FROM {table}_default WHERE {bounds} RETURNING *) "
+                f"INSERT INTO _moved SELECT * FROM moved"
+            ))
+            conn.execute(text(
+                f"CREATE TABLE {partition_name(table, year)} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{low}') TO ('{high}')"
+            ))
+            conn.execute(text(f"INSERT INTO {table} SELECT * FROM _moved"))
+            conn.execute(text("DROP TABLE _moved"))
+            created.append(year)
+    return created
+
+
+def create_table(engine, table, first_year=FIRST_YEAR):
+    """Create a managed OHLCV table (and its partitions on Postgres) if it does not exist"""
+    with engine.begin() as conn:
+        conn.execute(text(table_ddl(table, engine.dialect.name)))
+    ensure_partitions(engine, table, first_year=first_year)
+
+
+def schema_problems(engine, table):
+    """What differs between the stored `table` and the managed definition, [] when it matches"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return [f"{table} does not exist"]
+    problems = []
+    pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+    if sorted(pk) != sorted(PRIMARY_KEY):
+        problems.append(f"primary key is {tuple(pk) or 'missing'}, expected {PRIMARY_KEY}")
+    stored = {c["name"]: str(c["type"]).upper() for c in inspector.get_columns(table)}
+    position = 0 if engine.dialect.name == "postgresql" else 1
+    for name, types in OHLCV_COLUMNS.items():
+        expected = types[position]
+        if name not in stored:
+            problems.append(f"column {name} is missing")
+        elif stored[name] != expected:
+            problems.append(f"column {name} is {stored[name]}, expected {expected}")
+    if SQLITE_ROWID_COLUMN in stored:
+        problems.append("copied from SQLite but not verified yet (python migration.py --verify-only)")
+    extra = sorted(set(stored) - set(OHLCV_COLUMNS) - {SQLITE_ROWID_COLUMN})
+    if extra:
+        problems.append(f"unmanaged columns {extra}")
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            partitioned = conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :t"
+            ), {"t": table}).first()
+        if not partitioned:
+            problems.append("not partitioned by trade_date")
+    return problems
+
+
+def check_schema(engine, table):
+    """Loader startup check: create `table` if it is new, make sure this year's partitions exist,
+    and refuse to load into a table that still has the old implicit to_sql layout"""
+    if not inspect(engine).has_table(table):
+        create_table(engine, table)
+        print(f"🧱 Created {table}")
+        return
+    problems = schema_problems(engine, table)
+    if problems:
+        raise RuntimeError(f"{table} does not match db/schema.py ({'; '.join(problems)}), "
+                           f"run python db/schema.py --migrate first")
+    ensure_partitions(engine, table, first_year=date.today().year)
+
+
+def _arrow_column(values, field):
+    """One frame column (or array) as an Arrow array of the schema type. Float columns without
+    nulls are wrapped without copying; everything else is converted once"""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        array = values
+    elif field.type == pa.date32():
+        values = pd.to_datetime(pd.Series(values), errors="coerce")
+        array = pa.array(values.to_numpy(dtype="datetime64[D]"), mask=values.isna().to_numpy())
+    elif field.type == pa.string():
+        array = pc.utf8_trim_whitespace(pa.array(pd.Series(values).astype("string"), type=pa.string()))
+    else:
+        series = pd.Series(values)
+        if series.dtype.kind not in "fiu" and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            series = pd.to_numeric(series, errors="coerce")
+        array = pa.array(series, from_pandas=True)
+        if pa.types.is_integer(field.type) and pa.types.is_floating(array.type):
+            array = pc.round(array)
+    return array.cast(field.type, safe=False) if array.type != field.type else array
+
+
+def to_ohlcv_batch(columns, num_rows=None):
+    """Build the OHLCV record batch (an Arrow table in OHLCV_ARROW_SCHEMA) from a DataFrame or a dict of
+    columns/arrays. Columns outside the schema (company_name etc.) are not read, missing ones are NULL,
+    and rows without a ticker or a trade date are dropped."""
+    if isinstance(columns, pd.DataFrame):
+        num_rows = len(columns)
+        columns = {name: columns[name] for name in columns.columns}
+    elif num_rows is None:
+        num_rows = len(next(iter(columns.values()))) if columns else 0
+    arrays = [
+        _arrow_column(columns[field.name], field) if field.name in columns else pa.nulls(num_rows, field.type)
+        for field in OHLCV_ARROW_SCHEMA
+    ]
+    batch = pa.Table.from_arrays(arrays, schema=OHLCV_ARROW_SCHEMA)
+    keyed = pc.and_(batch["ticker"].is_valid(), batch["trade_date"].is_valid())
+    # all() of no rows is null, not True
+    if batch.num_rows and not pc.all(keyed).as_py():
+        print(f"⚠️  Dropping {num_rows - pc.sum(keyed).as_py()} row(s) without ticker or trade_date")
+        batch = batch.filter(keyed)
+    return batch
+
+
+def _cast(column, dialect):
+    """SELECT expression turning an old implicitly typed column into its managed type"""
+    pg_type, sqlite_type, _ = OHLCV_COLUMNS[column]
+    if column == "trade_date":
+        return f"CAST(trade_date AS DATE)" if dialect == "postgresql" else "date(trade_date)"
+    if column == "ticker":
+        return "TRIM(CAST(ticker AS TEXT))"
+    if dialect == "postgresql" and pg_type in ("BIGINT", "INTEGER"):
+        return f"CAST(ROUND(CAST({column} AS NUMERIC)) AS {pg_type})"
+    if dialect != "postgresql" and sqlite_type == "INTEGER":
+        return f"CAST(ROUND({column}) AS INTEGER)"
+    return f"CAST({column} AS {pg_type if dialect == 'postgresql' else sqlite_type})"
+
+
+def migrate_table(engine, table):
+    """One-off: rebuild an implicitly created table under the managed definition.
+
+    The old table is renamed to <table>_unmanaged, the managed one is created with partitions covering
+    every stored year and filled with casted rows (the first row wins when the old table held the same
+    ticker and day twice). Dependent <table>_with_security views are recreated. The old table is kept
+    so it can be checked and dropped by hand.
+    """
+    from db.securities import METADATA_COLUMNS, create_security_view
+    from db.writer import forget_table
+
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        print(f"⏭️  {table} does not exist")
+        return
+    if not schema_problems(engine, table):
+        print(f"✅ {table} already matches the schema")
+        ensure_partitions(engine, table)
+        return
+
+    stored = {c["name"] for c in inspector.get_columns(table)}
+    if stored & set(METADATA_COLUMNS):
+        print(f"⏭️  {table} still has metadata columns, run python db/securities.py --migrate first")
+        return
+    if SQLITE_ROWID_COLUMN in stored:
+        # Rebuilding would drop the rowids the verification matches chunks on
+        print(f"⏭️  {table} has not been verified against SQLite yet, run python migration.py --verify-only first")
+        return
+
+    start = time.time()
+    dialect = engine.dialect.name
+    old = f"{table}_unmanaged"
+    if inspector.has_table(old):
+        print(f"⏭️  {old} is still there from an earlier migration, drop it once checked and rerun")
+        return
+    columns = [c for c in OHLCV_COLUMNS if c in stored]
+    had_view = inspector.has_table(f"{table}_with_security") or f"{table}_with_security" in inspector.get_view_names()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP VIEW IF EXISTS {table}_with_security"))
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+        first_year = conn.execute(text(f"SELECT MIN({_cast('trade_date', dialect)}) FROM {old}")).scalar()
+    first_year = pd.Timestamp(first_year).year if first_year is not None else FIRST_YEAR
+    create_table(engine, table, first_year=min(first_year, FIRST_YEAR))
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(_cast(c, dialect) for c in columns)} FROM {old} "
+            f"WHERE ticker IS NOT NULL AND trade_date IS NOT NULL "
+            f"ON CONFLICT ({', '.join(PRIMARY_KEY)}) DO NOTHING"
+        ))
+        copied = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        before = conn.execute(text(f"SELECT COUNT(*) FROM {old}")).scalar()
+        if had_view:
+            create_security_view(conn, table)
+    forget_table(engine, table)
+    print(f"✅ {table}: {copied:,} of {before:,} rows in the managed table "
+          f"({before - copied:,} duplicate or unkeyed), old rows kept in {old} ({time.time() - start:.2f}s)")
+
+
+def _bench(conn, sql, params, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        conn.execute(text(sql), params[i % len(params)]).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark_lookups(engine, rows=500_000, repeat=200):
+    """ms per point lookup (one ticker, one day) and range lookup (one ticker, a year ordered by date)
+    on a to_sql-created table against the managed one, same rows in both"""
+    from db.writer import forget_table, synthetic_ohlcv, upsert_batch
+
+    df = synthetic_ohlcv(rows)
+    implicit, managed = "_bench_implicit_ohlcv", "_bench_managed_ohlcv"
+    with engine.begin() as conn:
+        for table in (implicit, managed):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE" if engine.dialect.name == "postgresql"
+                              else f"DROP TABLE IF EXISTS {table}"))
+    for table in (implicit, managed):
+        forget_table(engine, table)
+
+    df.to_sql(implicit, engine, index=False, chunksize=50_000)
+    create_table(engine, managed, first_year=2010)
+    upsert_batch(to_ohlcv_batch(df), managed, engine)
+    with engine.connect() as conn:
+        for table in (implicit, managed):
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.commit()
+
+    sample = df.sample(repeat, random_state=0)
+    points = [{"ticker": t, "day": str(d)} for t, d in zip(sample["ticker"], sample["trade_date"])]
+    ranges = [{"ticker": t, "start": str(d), "end": str(d + pd.Timedelta(days=365))}
+              for t, d in zip(sample["ticker"], sample["trade_date"])]
+    day = "CAST(:day AS DATE)" if engine.dialect.name == "postgresql" else ":day"
+    start, end = ("CAST(:start AS DATE)", "CAST(:end AS DATE)") if engine.dialect.name == "postgresql" \
+        else (":start", ":end")
+
+    results = {}
+    with engine.connect() as conn:
+        for label, table in (("to_sql", implicit), ("managed", managed)):
+            results[label] = (
+                _bench(conn, f"SELECT * FROM {table} WHERE ticker = :ticker AND trade_date = {day}", points, repeat),
+                _bench(conn, f"SELECT * FROM {table} WHERE ticker = :ticker AND trade_date BETWEEN {start} AND {end} "
+                             f"ORDER BY trade_date", ranges, repeat),
+            )
+    with engine.begin() as conn:
+        for table in (implicit, managed):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE" if engine.dialect.name == "postgresql"
+                              else f"DROP TABLE IF EXISTS {table}"))
+    for table in (implicit, managed):
+        forget_table(engine, table)
+
+    print(f"\n📊 Lookup benchmark on {engine.dialect.name}, {rows:,} rows, {repeat} queries each")
+    print(f"   {'table':<10} {'point (ms)':>12} {'range (ms)':>12}")
+    for label, (point, span) in results.items():
+        print(f"   {label:<10} {point:>12.3f} {span:>12.3f}")
+    old, new = results["to_sql"], results["managed"]
+    print(f"   speedup    {old[0] / new[0]:>11.1f}x {old[1] / new[1]:>11.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Managed OHLCV table definitions")
+    parser.add_argument("--check", action="store_true", help="report how each OHLCV table differs from the schema")
+    parser.add_argument("--create", action="store_true", help="create missing OHLCV tables and partitions")
+    parser.add_argument("--migrate", action="store_true", help="rebuild implicitly created tables under the schema")
+    parser.add_argument("--print-ddl", action="store_true", help="print the CREATE TABLE statements")
+    parser.add_argument("--benchmark", action="store_true", help="time point and range lookups, to_sql vs managed")
+    parser.add_argument("--rows", type=int, default=500_000, help="rows for --benchmark")
+    parser.add_argument("--url", help="database URL (default: db/connection.py)")
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    if args.print_ddl:
+        for table in MANAGED_TABLES:
+            print(table_ddl(table, engine.dialect.name) + ";\n")
+    if args.migrate:
+        for table in MANAGED_TABLES:
+            migrate_table(engine, table)
+    if args.create:
+        for table in MANAGED_TABLES:
+            if not inspect(engine).has_table(table):
+                create_table(engine, table)
+                print(f"🧱 Created {table}")
+            else:
+                ensure_partitions(engine, table)
+    if args.check:
+        for table in MANAGED_TABLES:
+            problems = schema_problems(engine, table)
+            print(f"{'✅' if not problems else '❌'} {table}" + "".join(f"\n     - {p}" for p in problems))
+    if args.benchmark:
+        benchmark_lookups(engine, args.rows)
@@ -0,0 +1,399 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.connection import get_engine
+from db.schema import OHLCV_TABLES, to_ohlcv_batch
+from db.writer import forget_table, upsert_dataframe
+
+SECURITIES_TABLE = "securities"
+
+# exchange code -> fact tables holding its daily bars
+FACT_TABLES = OHLCV_TABLES
+
+# Descriptive columns that used to be copied onto every OHLCV row and now live only in securities
+METADATA_COLUMNS = ["company_name", "sector", "industry", "shares_in_issue", "index_name"]
+
+SECURITIES_DDL = """
+CREATE TABLE IF NOT EXISTS securities (
+    security_id {id_type},
+    exchange TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    company_name TEXT,
+    sector TEXT,
+    industry TEXT,
+    shares_in_issue DOUBLE PRECISION,
+    index_name TEXT,
+    UNIQUE (exchange, ticker)
+)
+"""
+
+JSE_INDEX_NAMES = {
+    "^J200.JO": "jse_sa_top_40_index",
+    "^J201.JO": "jse_sa_midcap_index",
+    "^J202.JO": "jse_sa_smallcap_index",
+    "^J203.JO": "jse_sa_allshare_index",
+    "^J204.JO": "jse_sa_fledging_index",
+    "^J205.JO": "jse_sa_largecap_index",
+}
+
+# Reference files the dimension is seeded from, besides the fact tables themselves
+SEED_FILES = {
+    "JSE": ["JSE/data/jse_list.csv", "JSE/data/jse_indices.csv"],
+    "BVC": ["BVC/data/bvc_datapoints.csv"],
+}
+
+# Latest known industry / shares_in_issue per ticker, kept by the old autofill_dse.sql / autofill_nse.sql.
+# A database that ran them still has these, and they outlive the metadata columns --migrate drops
+REFERENCE_TABLES = {
+    "DSE": "dse_tz_reference",
+    "NSE": "nse_ke_reference",
+}
+
+
+def ensure_securities(engine):
+    id_type = "INTEGER PRIMARY KEY" if engine.dialect.name == "sqlite" else "SERIAL PRIMARY KEY"
+    with engine.begin() as conn:
+        conn.execute(text(SECURITIES_DDL.format(id_type=id_type)))
+
+
+def register_securities(engine, exchange, securities):
+    """Add tickers (with whatever metadata columns the frame has) to the dimension.
+
+    Known tickers keep their security_id; a non-null value in the frame replaces the stored one.
+    """
+    columns = ["ticker"] + [c for c in METADATA_COLUMNS if c in securities.columns]
+    rows = securities[columns].dropna(subset=["ticker"])
+    # Last non-null value per ticker, so a frame with many days per ticker registers once
+    rows = rows.groupby("ticker", sort=False).last().reset_index()
+    rows.insert(0, "exchange", exchange)
+    ensure_securities(engine)
+    return upsert_dataframe(rows, SECURITIES_TABLE, engine, key_columns=["exchange", "ticker"])
+
+
+def security_ids(engine, exchange):
+    """ticker -> security_id for one exchange"""
+    ids = pd.read_sql(text(f"SELECT ticker, security_id FROM {SECURITIES_TABLE} WHERE exchange = :exchange"),
+                      engine, params={"exchange": exchange})
+    return dict(zip(ids["ticker"], ids["security_id"]))
+
+
+def _ensure_security_id_column(engine, table):
+    inspector = inspect(engine)
+    if inspector.has_table(table) and "security_id" not in {c["name"] for c in inspector.get_columns(table)}:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN security_id INTEGER"))
+        forget_table(engine, table)
+
+
+def attach_security_id(df, engine, exchange, table):
+    """Loader hook, called just before a fact table upsert.
+
+    Registers the frame's tickers and metadata in securities, and returns the rows with a
+    security_id column and without the metadata columns, ready for `table`.
+    """
+    if df.empty:
+        return df
+    register_securities(engine, exchange, df)
+    _ensure_security_id_column(engine, table)
+    facts = df.drop(columns=[c for c in METADATA_COLUMNS if c in df.columns])
+    facts["security_id"] = facts["ticker"].map(security_ids(engine, exchange)).astype("Int64")
+    return facts
+
+
+def security_batch(parsed, engine, exchange, table):
+    """Loader handoff: the OHLCV record batch for `table`, with security_id filled in.
+
+    `parsed` is the loader's frame (metadata columns are registered in securities and not carried
+    over) or an OHLCV batch it built itself. Ids are matched with Arrow compute, not per row.
+    """
+    if isinstance(parsed, pd.DataFrame):
+        if parsed.empty:
+            return to_ohlcv_batch(parsed)
+        register_securities(engine, exchange, parsed)
+        batch = to_ohlcv_batch(parsed)
+    else:
+        batch = parsed
+        if batch.num_rows == 0:
+            return batch
+        register_securities(engine, exchange, pd.DataFrame({"ticker": pc.unique(batch["ticker"]).to_pylist()}))
+    _ensure_security_id_column(engine, table)
+    ids = security_ids(engine, exchange)
+    known = pa.array(list(ids), type=pa.string())
+    positions = pc.index_in(batch["ticker"], value_set=known)
+    security_id = pc.take(pa.array(list(ids.values()), type=pa.int32()), positions)
+    return batch.set_column(batch.schema.get_field_index("security_id"), "security_id", security_id)
+
+
+def latest_metadata(engine, table):
+    """ticker + the latest non-null value of each metadata column still stored on `table`"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return pd.DataFrame(columns=["ticker"])
+    present = [c for c in METADATA_COLUMNS if c in {col["name"] for col in inspector.get_columns(table)}]
+    if not present:
+        return pd.read_sql(f"SELECT DISTINCT ticker FROM {table}", engine)
+    ranked = ", ".join(
+        f"ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY {c} IS NULL, trade_date DESC) AS {c}_rank" for c in present
+    )
+    picks = ", ".join(f"MAX(CASE WHEN {c}_rank = 1 THEN {c} END) AS {c}" for c in present)
+    return pd.read_sql(
+        f"SELECT ticker, {picks} FROM (SELECT ticker, {', '.join(present)}, {ranked} FROM {table}) AS ranked "
+        f"GROUP BY ticker",
+        engine,
+    )
+
+
+def _read_seed_file(path):
+    seed = pd.read_csv(path)
+    seed.columns = seed.columns.str.strip().str.lower()
+    seed["ticker"] = seed["ticker"].astype(str).str.strip()
+    return seed
+
+
+def seed_securities(engine):
+    """Fill the dimension from the reference CSVs, the old autofill reference tables and from every
+    ticker already in a fact table (registered last, so metadata still on the facts wins)"""
+    ensure_securities(engine)
+    inspector = inspect(engine)
+    for exchange, paths in SEED_FILES.items():
+        for path in paths:
+            if os.path.exists(path):
+                seed = _read_seed_file(path)
+                if exchange == "JSE":
+                    seed["index_name"] = seed["ticker"].map(JSE_INDEX_NAMES)
+                register_securities(engine, exchange, seed)
+                print(f"🌱 {path}: {len(seed)} {exchange} securities")
+    for exchange, table in REFERENCE_TABLES.items():
+        if inspector.has_table(table):
+            reference = pd.read_sql(f"SELECT * FROM {table}", engine)
+            if not reference.empty:
+                register_securities(engine, exchange, reference)
+                print(f"🌱 {table}: {len(reference)} {exchange} securities")
+    for exchange, tables in FACT_TABLES.items():
+        for table in tables:
+            stored = latest_metadata(engine, table)
+            if not stored.empty:
+                register_securities(engine, exchange, stored)
+                print(f"🌱 {table}: {len(stored)} {exchange} securities")
+    counts = pd.read_sql(f"SELECT exchange, COUNT(*) AS n FROM {SECURITIES_TABLE} GROUP BY exchange", engine)
+    return dict(zip(counts["exchange"], counts["n"]))
+
+
+def _table_bytes(engine, table):
+    """Bytes used by `table` and its indexes, None where the database cannot tell"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            return conn.execute(text("SELECT pg_total_relation_size(:t)"), {"t": table}).scalar()
+        if engine.dialect.name == "sqlite":
+            try:
+                return conn.execute(text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = :t)"
+                ), {"t": table}).scalar()
+            except Exception:
+                # SQLite built without the dbstat table
+                return None
+    return None
+
+
+def create_security_view(conn, table):
+    """<table>_with_security: the fact rows with the metadata columns joined back on"""
+    conn.execute(text(
+        f"CREATE VIEW {table}_with_security AS SELECT f.*, {', '.join('s.' + c for c in METADATA_COLUMNS)} "
+        f"FROM {table} AS f LEFT JOIN {SECURITIES_TABLE} AS s ON s.security_id = f.security_id"
+    ))
+
+
+def migrate_fact_table(engine, exchange, table, vacuum=False):
+    """One-off: give every row of `table` its security_id, move the metadata columns into
+    securities, drop them from the table and leave a <table>_with_security view with the old shape"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        print(f"⏭️  {table} does not exist")
+        return
+    start = time.time()
+    bytes_before = _table_bytes(engine, table)
+
+    register_securities(engine, exchange, latest_metadata(engine, table))
+    _ensure_security_id_column(engine, table)
+    view = f"{table}_with_security"
+    # Read before the transaction: the inspector's own connection would wait on its write lock in SQLite
+    present = [c for c in METADATA_COLUMNS if c in {col["name"] for col in inspect(engine).get_columns(table)}]
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP VIEW IF EXISTS {view}"))
+        conn.execute(text(
+            f"UPDATE {table} SET security_id = s.security_id FROM {SECURITIES_TABLE} AS s "
+            f"WHERE s.exchange = :exchange AND s.ticker = {table}.ticker AND {table}.security_id IS NULL"
+        ), {"exchange": exchange})
+        for column in present:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        create_security_view(conn, table)
+    forget_table(engine, table)
+
+    if vacuum and engine.dialect.name == "postgresql":
+        # DROP COLUMN only hides the data, a rewrite gives the space back
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"VACUUM FULL {table}"))
+    bytes_after = _table_bytes(engine, table)
+
+    size = ""
+    if bytes_before is not None:
+        size = f", {bytes_before / 1e6:.1f} MB → {bytes_after / 1e6:.1f} MB"
+    print(f"✅ {table}: dropped {present or 'nothing'}, view {view}{size} ({time.time() - start:.2f}s)")
+
+
+# The per-row autofill the securities dimension replaced, kept to benchmark against: every NULL
+# metadata cell is filled from the ticker's latest non-null value by a correlated subquery
+OLD_AUTOFILL = """
+UPDATE {table} AS target SET {assignments}
+WHERE {any_null}
+"""
+
+BENCH_TABLE = "bench_securities_ohlcv"
+BENCH_EXCHANGE = "BENCH"
+
+
+# index_name only ever applied to the JSE index table, the equity autofills never touched it
+BENCH_FILLED = ["company_name", "sector", "industry", "shares_in_issue"]
+
+
+def old_autofill_sql(table, columns=BENCH_FILLED):
+    assignments = ",\n    ".join(
+        f"{c} = COALESCE(target.{c}, (SELECT {c} FROM {table} WHERE ticker = target.ticker AND {c} IS NOT NULL "
+        f"ORDER BY trade_date DESC LIMIT 1))"
+        for c in columns
+    )
+    any_null = " OR ".join(f"target.{c} IS NULL" for c in columns)
+    return OLD_AUTOFILL.format(table=table, assignments=assignments, any_null=any_null)
+
+
+def synthetic_history(tickers, days, hole_rate=0.02, seed=0):
+    """Daily bars carrying the old per-row metadata, constant per ticker, with a scattering of holes
+    left for the autofill. The last day is the nightly load: no metadata at all"""
+    from db.writer import synthetic_ohlcv
+
+    rng = np.random.default_rng(seed)
+    df = synthetic_ohlcv(tickers * days, tickers)
+    number = df["ticker"].str[1:].astype(int)
+    df["company_name"] = df["ticker"] + " Holdings Limited"
+    df["sector"] = "Sector " + (number % 7).astype(str)
+    df["industry"] = "Industry group " + (number % 23).astype(str)
+    df["shares_in_issue"] = (number + 1) * 1e6
+    df["index_name"] = None
+    holes = (rng.random(len(df)) < hole_rate) | (df["trade_date"] == df["trade_date"].max())
+    df.loc[holes, ["company_name", "sector", "industry"]] = None
+    df.loc[holes, "shares_in_issue"] = np.nan
+    return df
+
+
+def _drop_bench(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP VIEW IF EXISTS {BENCH_TABLE}_with_security"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        if inspect(conn).has_table(SECURITIES_TABLE):
+            conn.execute(text(f"DELETE FROM {SECURITIES_TABLE} WHERE exchange = :e"), {"e": BENCH_EXCHANGE})
+    forget_table(engine, BENCH_TABLE)
+
+
+def _compact(engine, table):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM FULL {table}" if engine.dialect.name == "postgresql" else "VACUUM"))
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.time()
+    fn(*args, **kwargs)
+    return time.time() - start
+
+
+def _snapshot(engine, source):
+    columns = ", ".join(["ticker", "trade_date"] + METADATA_COLUMNS)
+    return pd.read_sql(f"SELECT {columns} FROM {source} ORDER BY ticker, trade_date", engine)
+
+
+def benchmark_securities(engine, tickers=100, days=1000):
+    """Old layout (metadata on every row + correlated-subquery autofill) vs the securities dimension:
+    fill time, nightly load, reading the old shape back through the view, and table size"""
+    history = synthetic_history(tickers, days + 1)
+    last_day = history["trade_date"].max()
+    base, new_day = history[history["trade_date"] < last_day], history[history["trade_date"] == last_day]
+    old_fill = old_autofill_sql(BENCH_TABLE)
+    results = {}
+
+    def run_sql(sql):
+        with engine.begin() as conn:
+            conn.execute(text(sql))
+
+    # Old: the loader writes whatever metadata it has, then the autofill patches the holes
+    _drop_bench(engine)
+    upsert_dataframe(base, BENCH_TABLE, engine)
+    results["old first fill"] = _timed(run_sql, old_fill)
+    results["old nightly load + fill"] = (_timed(upsert_dataframe, new_day, BENCH_TABLE, engine)
+                                          + _timed(run_sql, old_fill))
+    results["old full read"] = _timed(_snapshot, engine, BENCH_TABLE)
+    old_rows = _snapshot(engine, BENCH_TABLE)
+    _compact(engine, BENCH_TABLE)
+    old_bytes = _table_bytes(engine, BENCH_TABLE)
+
+    # New: --migrate once, then loaders register tickers and only store the security_id
+    _drop_bench(engine)
+    upsert_dataframe(base, BENCH_TABLE, engine)
+    results["new migrate"] = _timed(migrate_fact_table, engine, BENCH_EXCHANGE, BENCH_TABLE, vacuum=True)
+    results["new nightly load"] = _timed(
+        lambda: upsert_dataframe(attach_security_id(new_day, engine, BENCH_EXCHANGE, BENCH_TABLE), BENCH_TABLE, engine)
+    )
+    view = f"{BENCH_TABLE}_with_security"
+    results["new full read (view)"] = _timed(_snapshot, engine, view)
+    new_rows = _snapshot(engine, view)
+    _compact(engine, BENCH_TABLE)
+    new_bytes = _table_bytes(engine, BENCH_TABLE)
+    dimension_bytes = _table_bytes(engine, SECURITIES_TABLE)
+    _drop_bench(engine)
+
+    same = old_rows.astype(str).equals(new_rows.astype(str))
+    print(f"\n📊 Securities benchmark on {engine.dialect.name}: {len(history):,} rows "
+          f"({tickers} tickers x {days + 1} days)")
+    for name, seconds in results.items():
+        print(f"   {name:<24} {seconds:7.3f}s")
+    print(f"   Nightly: {results['old nightly load + fill'] / results['new nightly load']:.1f}x faster, "
+          f"identical rows through the view: {same}")
+    if old_bytes is not None:
+        print(f"   Size: {old_bytes / 1e6:.1f} MB with metadata on every row → {new_bytes / 1e6:.1f} MB with security_id "
+              f"(+ {dimension_bytes / 1e6:.2f} MB securities), {1 - (new_bytes + dimension_bytes) / old_bytes:.0%} smaller")
+    results.update(old_bytes=old_bytes, new_bytes=new_bytes, securities_bytes=dimension_bytes, identical=same)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-exchange securities dimension")
+    parser.add_argument("--seed", action="store_true", help="(re)seed securities from the CSVs and fact tables")
+    parser.add_argument("--migrate", action="store_true",
+                        help="add security_id to the fact tables and move their metadata columns into securities")
+    parser.add_argument("--vacuum", action="store_true", help="rewrite migrated tables to reclaim space (Postgres)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="old per-row metadata + autofill vs securities on a synthetic table (only bench_ rows are written)")
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--url", help="database to use, default: AFRICANFINANCE_DB_URL / the pipeline database")
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    if args.benchmark:
+        benchmark_securities(engine, args.tickers, args.days)
+    if args.seed or args.migrate:
+        print(f"📋 Securities per exchange: {seed_securities(engine)}")
+    if args.migrate:
+        for exchange, tables in FACT_TABLES.items():
+            for table in tables:
+                migrate_fact_table(engine, exchange, table, vacuum=args.vacuum)
+        if engine.dialect.name == "sqlite" and args.vacuum:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("VACUUM"))
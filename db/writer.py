@@ -0,0 +1,336 @@
+import argparse
+import io
+import os
+import sys
+import time
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.schema import MANAGED_TABLES, create_table, to_ohlcv_batch
+
+OHLCV_KEY = ("ticker", "trade_date")
+
+# (engine url, table, key) -> (whether the table has a unique index on the key columns,
+#                              whether it is a managed table from db/schema.py)
+_unique_key_cache: Dict[tuple, Tuple[bool, bool]] = {}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _ensure_table(df: pd.DataFrame, table: str, engine, key_columns: Sequence[str]) -> Tuple[bool, bool]:
+    """Create the table if needed and try to put a unique index on the key.
+
+    OHLCV tables are created from db/schema.py, whose primary key already is the index. Returns
+    (has_unique, managed): has_unique is False when the index cannot be built (the table already
+    holds duplicate keys), in which case the writer falls back to an insert-if-missing merge.
+    """
+    cache_key = (str(engine.url), table, tuple(key_columns))
+    if cache_key in _unique_key_cache:
+        return _unique_key_cache[cache_key]
+
+    if not inspect(engine).has_table(table):
+        if table in MANAGED_TABLES:
+            create_table(engine, table)
+        else:
+            # Column types are inferred from the whole frame (an empty frame would turn dates into TEXT)
+            with engine.begin() as conn:
+                conn.execute(text(pd.io.sql.get_schema(df, table, con=conn)))
+
+    primary_key = inspect(engine).get_pk_constraint(table).get("constrained_columns") or []
+    if sorted(primary_key) == sorted(key_columns):
+        managed = table in MANAGED_TABLES
+        _unique_key_cache[cache_key] = (True, managed)
+        return True, managed
+
+    index_name = f"uq_{table}_{'_'.join(key_columns)}"
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(index_name)} "
+                f"ON {_quote(table)} ({', '.join(_quote(c) for c in key_columns)})"
+            ))
+        has_unique = True
+    except Exception as e:
+        print(f"⚠️  {table} has duplicate {tuple(key_columns)} rows, merging without ON CONFLICT ({str(e)[:80]})")
+        has_unique = False
+
+    _unique_key_cache[cache_key] = (has_unique, False)
+    return has_unique, False
+
+
+def forget_table(engine, table: str):
+    """Drop what the writer cached about `table`, after it was dropped or recreated elsewhere"""
+    for cache_key in [k for k in _unique_key_cache if k[:2] == (str(engine.url), table)]:
+        del _unique_key_cache[cache_key]
+
+
+def _merge_sql(table: str, stage: str, columns: Sequence[str], key_columns: Sequence[str],
+               has_unique: bool, update: bool) -> str:
+    cols = ", ".join(_quote(c) for c in columns)
+    # "WHERE true" keeps SQLite's parser from reading ON CONFLICT as part of a join
+    select = f"SELECT {cols} FROM {stage} WHERE true"
+    if not has_unique:
+        match = " AND ".join(f"t.{_quote(k)} = s.{_quote(k)}" for k in key_columns)
+        return (f"INSERT INTO {_quote(table)} ({cols}) SELECT {', '.join('s.' + _quote(c) for c in columns)} "
+                f"FROM {stage} s WHERE NOT EXISTS (SELECT 1 FROM {_quote(table)} t WHERE {match})")
+
+    conflict = ", ".join(_quote(k) for k in key_columns)
+    value_columns = [c for c in columns if c not in key_columns]
+    if not update or not value_columns:
+        return f"INSERT INTO {_quote(table)} ({cols}) {select} ON CONFLICT ({conflict}) DO NOTHING"
+    # Never overwrite a stored value with NULL, so columns filled in later (industry etc.) survive reruns
+    assignments = ", ".join(
+        f"{_quote(c)} = COALESCE(excluded.{_quote(c)}, {_quote(table)}.{_quote(c)})" for c in value_columns
+    )
+    return f"INSERT INTO {_quote(table)} ({cols}) {select} ON CONFLICT ({conflict}) DO UPDATE SET {assignments}"
+
+
+def _upsert_postgres(df, table, engine, key_columns, has_unique, update) -> int:
+    columns = list(df.columns)
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep="\\N")
+    buffer.seek(0)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(f"CREATE TEMP TABLE _stage ON COMMIT DROP AS SELECT {', '.join(_quote(c) for c in columns)} "
+                    f"FROM {_quote(table)} WITH NO DATA")
+        cur.copy_expert(
+            f"COPY _stage ({', '.join(_quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+        cur.execute(_merge_sql(table, "_stage", columns, key_columns, has_unique, update))
+        written = cur.rowcount
+        raw.commit()
+        return written
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def _sqlite_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _upsert_sqlite(df, table, engine, key_columns, has_unique, update) -> int:
+    columns = list(df.columns)
+    rows = [tuple(_sqlite_value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp._stage")
+        cur.execute(f"CREATE TEMP TABLE _stage AS SELECT {', '.join(_quote(c) for c in columns)} "
+                    f"FROM {_quote(table)} WHERE 0")
+        cur.executemany(f"INSERT INTO _stage VALUES ({', '.join('?' * len(columns))})", rows)
+        cur.execute(_merge_sql(table, "_stage", columns, key_columns, has_unique, update))
+        written = cur.rowcount
+        cur.execute("DROP TABLE temp._stage")
+        raw.commit()
+        return written
+    except Exception:
+        raw.rollback()
+        # sqlite3 runs the CREATE outside the transaction, so the rollback leaves the stage behind
+        raw.cursor().execute("DROP TABLE IF EXISTS temp._stage")
+        raise
+    finally:
+        raw.close()
+
+
+def upsert_dataframe(df: pd.DataFrame, table: str, engine, key_columns: Iterable[str] = OHLCV_KEY,
+                     update: bool = True) -> int:
+    """Idempotent bulk write of `df` into `table`, keyed on `key_columns`.
+
+    Frames for managed OHLCV tables (db/schema.py) are converted to the OHLCV batch and go through
+    upsert_batch.
+    PostgreSQL: COPY into a temp staging table, then INSERT ... ON CONFLICT (key) DO UPDATE.
+    SQLite: executemany into a temp staging table, then the same merge.
+    Rerunning a load therefore updates rows in place instead of duplicating the day.
+    With update=False existing rows are left untouched. Returns the number of rows written.
+    """
+    key_columns = list(key_columns)
+    if df.empty:
+        return 0
+    missing = [k for k in key_columns if k not in df.columns]
+    if missing:
+        raise ValueError(f"upsert into {table} needs key columns {missing}")
+
+    has_unique, managed = _ensure_table(df, table, engine, key_columns)
+    if managed:
+        return upsert_batch(to_ohlcv_batch(df), table, engine, key_columns, update)
+    # Last occurrence wins inside a batch, like a later row would in the table
+    df = df.drop_duplicates(subset=key_columns, keep="last")
+
+    if engine.dialect.name == "postgresql":
+        return _upsert_postgres(df, table, engine, key_columns, has_unique, update)
+    if engine.dialect.name == "sqlite":
+        return _upsert_sqlite(df, table, engine, key_columns, has_unique, update)
+    raise NotImplementedError(f"upsert_dataframe does not support {engine.dialect.name}")
+
+
+def _last_per_key(batch: pa.Table, key_columns: Sequence[str]) -> pa.Table:
+    """Keep the last row of every key, without leaving Arrow. No copy when the keys are already unique"""
+    rows = batch.append_column("_row", pa.array(np.arange(batch.num_rows)))
+    last = rows.group_by(list(key_columns), use_threads=False).aggregate([("_row", "max")])
+    if last.num_rows == batch.num_rows:
+        return batch
+    return batch.take(np.sort(last["_row_max"].to_numpy()))
+
+
+def _copy_batch_postgres(batch, table, engine, key_columns, has_unique, update) -> int:
+    columns = batch.column_names
+    buffer = pa.BufferOutputStream()
+    # Written by Arrow's C++ CSV writer straight from the column buffers; unquoted empty fields are NULL to COPY
+    pacsv.write_csv(batch, buffer, write_options=pacsv.WriteOptions(include_header=False))
+    reader = pa.BufferReader(buffer.getvalue())
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(f"CREATE TEMP TABLE _stage ON COMMIT DROP AS SELECT {', '.join(_quote(c) for c in columns)} "
+                    f"FROM {_quote(table)} WITH NO DATA")
+        cur.copy_expert(f"COPY _stage ({', '.join(_quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)", reader)
+        cur.execute(_merge_sql(table, "_stage", columns, key_columns, has_unique, update))
+        written = cur.rowcount
+        raw.commit()
+        return written
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def _insert_batch_sqlite(batch, table, engine, key_columns, has_unique, update) -> int:
+    # sqlite3 only binds Python values, so this is the one place rows become tuples; dates go in as ISO text
+    columns = [pc.cast(c, pa.string()) if pa.types.is_date(c.type) else c for c in batch.columns]
+    rows = zip(*(c.to_pylist() for c in columns))
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp._stage")
+        cur.execute(f"CREATE TEMP TABLE _stage AS SELECT {', '.join(_quote(c) for c in batch.column_names)} "
+                    f"FROM {_quote(table)} WHERE 0")
+        cur.executemany(f"INSERT INTO _stage VALUES ({', '.join('?' * batch.num_columns)})", rows)
+        cur.execute(_merge_sql(table, "_stage", batch.column_names, key_columns, has_unique, update))
+        written = cur.rowcount
+        cur.execute("DROP TABLE temp._stage")
+        raw.commit()
+        return written
+    except Exception:
+        raw.rollback()
+        # sqlite3 runs the CREATE outside the transaction, so the rollback leaves the stage behind
+        raw.cursor().execute("DROP TABLE IF EXISTS temp._stage")
+        raise
+    finally:
+        raw.close()
+
+
+def upsert_batch(batch: pa.Table, table: str, engine, key_columns: Iterable[str] = OHLCV_KEY,
+                 update: bool = True) -> int:
+    """upsert_dataframe for an OHLCV record batch (db/schema.py to_ohlcv_batch), the format loaders hand over.
+
+    On PostgreSQL the batch goes from its Arrow buffers to CSV to COPY without becoming Python objects.
+    Same merge semantics as upsert_dataframe. Returns the number of rows written.
+    """
+    key_columns = list(key_columns)
+    if batch.num_rows == 0:
+        return 0
+    missing = [k for k in key_columns if k not in batch.column_names]
+    if missing:
+        raise ValueError(f"upsert into {table} needs key columns {missing}")
+
+    # Only used to infer column types when an unmanaged table has to be created
+    has_unique, _ = _ensure_table(batch.slice(0, 1000).to_pandas(), table, engine, key_columns)
+    batch = _last_per_key(batch, key_columns)
+
+    if engine.dialect.name == "postgresql":
+        return _copy_batch_postgres(batch, table, engine, key_columns, has_unique, update)
+    if engine.dialect.name == "sqlite":
+        return _insert_batch_sqlite(batch, table, engine, key_columns, has_unique, update)
+    raise NotImplementedError(f"upsert_batch does not support {engine.dialect.name}")
+
+
+def synthetic_ohlcv(rows: int, n_tickers: int = 300) -> pd.DataFrame:
+    """Deterministic fake daily bars (n_tickers tickers, business days from 2010) for the benchmarks"""
+    rng = np.random.default_rng(0)
+    days = rows // n_tickers + 1
+    dates = pd.bdate_range("2010-01-01", periods=days).date
+    df = pd.DataFrame({
+        "trade_date": np.repeat(dates, n_tickers)[:rows],
+        "ticker": np.tile([f"T{i:03d}" for i in range(n_tickers)], days)[:rows],
+    })
+    close = rng.uniform(1, 500, rows)
+    df["opening_price"] = close * rng.uniform(0.98, 1.02, rows)
+    df["high"] = close * 1.03
+    df["low"] = close * 0.97
+    df["closing_price"] = close
+    df["volume"] = rng.integers(0, 1_000_000, rows)
+    return df
+
+
+def benchmark_writers(engine, rows: int = 100_000):
+    """rows/sec of the old to_sql append path vs upsert_dataframe, plus a rerun to show idempotency"""
+    df = synthetic_ohlcv(rows)
+    results = {}
+    for table in ("_bench_to_sql", "_bench_upsert"):
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    _unique_key_cache.clear()
+
+    start = time.time()
+    df.to_sql("_bench_to_sql", engine, if_exists="append", index=False)
+    results["to_sql append"] = time.time() - start
+
+    start = time.time()
+    upsert_dataframe(df, "_bench_upsert", engine)
+    results["upsert (fresh)"] = time.time() - start
+
+    start = time.time()
+    upsert_dataframe(df, "_bench_upsert", engine)
+    results["upsert (rerun)"] = time.time() - start
+
+    with engine.connect() as conn:
+        stored = conn.execute(text("SELECT COUNT(*) FROM _bench_upsert")).scalar()
+        for table in ("_bench_to_sql", "_bench_upsert"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.commit()
+
+    print(f"\n📊 Writer benchmark on {engine.dialect.name}, {rows:,} rows")
+    for name, seconds in results.items():
+        print(f"   {name:<16} {seconds:7.2f}s  {rows / seconds:>12,.0f} rows/sec")
+    print(f"   Rows after two upserts: {stored:,} (expected {rows:,})")
+    return results
+
+
+if __name__ == "__main__":
+    from db.connection import get_engine
+
+    parser = argparse.ArgumentParser(description="Benchmark to_sql against the upsert writer")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--url", default="sqlite:///:memory:", help="database to benchmark against")
+    args = parser.parse_args()
+    benchmark_writers(get_engine(args.url), args.rows)
@@ -1 +1,329 @@
-import pdfplumber
\ No newline at end of file
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+import pdfplumber
+# pdfplumber's own page renderer; its C text layer is fast enough to scan every page for the statements
+import pypdfium2 as pdfium
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.parallel_parse import parse_files_parallel
+
+REPORTS_DIR = "fundamental_extraction_scripts/reports"
+OUTPUT_CSV = "fundamental_extraction_scripts/banking_fundamentals.csv"
+CACHE_DIR = "data/fundamentals_cache"
+# Bump when the extraction rules change so every cached report is parsed again
+EXTRACTOR_VERSION = 1
+
+# Reports are named <COUNTRY>_<TICKER>_<period end>.pdf, e.g. KE_KCB_2024-12-31.pdf
+REPORT_NAME = re.compile(r"^(?P<country>[A-Za-z]{2})_(?P<ticker>[A-Za-z0-9.]+)_(?P<report_date>\d{4}-\d{2}-\d{2})$")
+
+KEY_COLUMNS = ["report_date", "ticker", "country", "currency"]
+
+# column -> label the statement line starts with; the first match in page order wins, so the group
+# figures (printed before the company's) are the ones kept
+METRICS = {
+    "total_assets": r"total assets\b",
+    "loans_and_advances": r"(net )?loans and advances to customers\b",
+    "customer_deposits": r"(customer deposits|deposits from customers)\b",
+    "total_liabilities": r"total liabilities\b(?! and)",
+    "total_equity": r"total (shareholders'? )?equity\b(?! and)",
+    "net_interest_income": r"net interest income\b",
+    "non_interest_income": r"(total )?non[- ]interest income\b",
+    "operating_income": r"total operating income\b",
+    "loan_loss_provision": r"(credit impairment|expected credit loss(es)?|loan (loss|impairment))"
+                           r"( (charges?|provisions?|losses))?",
+    "profit_before_tax": r"profit before (income )?tax",
+    "profit_after_tax": r"profit (after tax|for the (year|period))\b",
+    "eps": r"(basic )?earnings per share\b",
+}
+# Per-share figures are printed in units, everything else in the statement's scale
+UNSCALED = {"eps"}
+COLUMNS = KEY_COLUMNS + list(METRICS) + ["source_file"]
+
+# A page is parsed only if it carries one of these titles and one of the anchors: that is the two primary
+# statements, not the table of contents or the notes that repeat the titles
+STATEMENT_TITLES = re.compile(r"statement of financial position|balance sheet|statement of profit or loss|"
+                              r"income statement|statement of comprehensive income", re.I)
+STATEMENT_ANCHORS = re.compile(r"total assets|interest income", re.I)
+
+SCALES = [
+    (re.compile(r"billions?\b|\bbn\b", re.I), 1e9),
+    (re.compile(r"millions?\b|\bmn\b|['’]m\b", re.I), 1e6),
+    (re.compile(r"['’]000|000s\b|000['’]s|thousands?\b", re.I), 1e3),
+]
+CURRENCIES = [
+    (re.compile(r"\bK\s?Shs?\b|\bKES\b", re.I), "KES"),
+    (re.compile(r"\bT\s?Shs?\b|\bTZS\b", re.I), "TZS"),
+    (re.compile(r"\bU\s?Shs?\b|\bUGX\b", re.I), "UGX"),
+    (re.compile(r"\bZAR\b|\bRand\b", re.I), "ZAR"),
+    (re.compile(r"\bF\s?CFA\b|\bXOF\b", re.I), "XOF"),
+    (re.compile(r"\bMAD\b|\bdirhams?\b", re.I), "MAD"),
+    (re.compile(r"\bNGN\b|\bnaira\b", re.I), "NGN"),
+    (re.compile(r"\bUSD\b|US\$", re.I), "USD"),
+]
+# When the statements do not say
+COUNTRY_CURRENCY = {"KE": "KES", "TZ": "TZS", "UG": "UGX", "RW": "RWF", "ZA": "ZAR", "CI": "XOF", "SN": "XOF",
+                    "BF": "XOF", "ML": "XOF", "BJ": "XOF", "TG": "XOF", "NE": "XOF", "MA": "MAD", "NG": "NGN",
+                    "GH": "GHS", "EG": "EGP"}
+
+NUMBER = re.compile(r"(?<![\w.])\(?-?\d[\d,]*(?:\.\d+)?\)?(?![\w.])")
+
+
+def report_metadata(path):
+    """country, ticker, report_date from the file name, or None if it does not follow the naming"""
+    match = REPORT_NAME.match(os.path.splitext(os.path.basename(path))[0])
+    if match is None:
+        return None
+    return {"country": match["country"].upper(), "ticker": match["ticker"].upper(),
+            "report_date": match["report_date"]}
+
+
+def find_reports(directory=REPORTS_DIR):
+    reports = []
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.pdf"), recursive=True)):
+        if report_metadata(path) is None:
+            print(f"⚠️  {path}: not a <COUNTRY>_<TICKER>_<YYYY-MM-DD>.pdf report, skipped")
+            continue
+        reports.append(path)
+    return reports
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def statement_pages(path):
+    """(page count, 1-based numbers of the pages holding the primary statements)"""
+    pdf = pdfium.PdfDocument(path)
+    try:
+        pages = []
+        for number in range(len(pdf)):
+            page = pdf[number]
+            textpage = page.get_textpage()
+            text = textpage.get_text_bounded()
+            textpage.close()
+            page.close()
+            if STATEMENT_TITLES.search(text) and STATEMENT_ANCHORS.search(text):
+                pages.append(number + 1)
+        return len(pdf), pages
+    finally:
+        pdf.close()
+
+
+def parse_number(token):
+    negative = token.startswith("(") or token.startswith("-")
+    value = float(token.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+
+def line_values(line, label):
+    """Current-period figure of a statement line starting with `label`, or None.
+
+    The first column of figures is the current period; a leading note reference (a small integer
+    without separators, e.g. "Loans and advances  18  412,090  398,112") is skipped, and a line of bare
+    years ("Total assets 2024 2023") is a column header, not a figure. Words between
+    the label and the figures ("Total assets overview .... 3" in a contents page) mean it is not a
+    statement line; a unit in brackets ("Earnings per share (KShs) 9.85") is allowed.
+    """
+    match = re.match(label, line, re.I)
+    if match is None:
+        return None
+    rest = line[match.end():]
+    tokens = NUMBER.findall(rest)
+    gap = re.sub(r"\([^)]*\)", "", rest[:rest.find(tokens[0])]) if tokens else ""
+    if not tokens or re.search(r"[^\W\d_]", gap):
+        return None
+    if len(tokens) >= 3 and re.fullmatch(r"\d{1,2}", tokens[0]):
+        tokens = tokens[1:]
+    # "Total assets 2024 2023" is the column header, not a figure: a bare year on a line whose numbers
+    # carry no separators at all
+    if re.fullmatch(r"(19|20)\d\d", tokens[0]) and not any(re.search(r"[,.]", t) for t in tokens):
+        return None
+    return parse_number(tokens[0])
+
+
+def page_scale(text):
+    for pattern, scale in SCALES:
+        if pattern.search(text):
+            return scale
+    return 1.0
+
+
+def page_currency(text):
+    for pattern, currency in CURRENCIES:
+        if pattern.search(text):
+            return currency
+    return None
+
+
+def extract_report(path):
+    """One row of banking fundamentals from a report PDF, parsing only its statement pages.
+
+    Runs in a worker of the process pool; the row also carries pages / pages_parsed for the benchmark.
+    """
+    meta = report_metadata(path)
+    page_count, targets = statement_pages(path)
+    row = {**meta, "currency": None, **{name: None for name in METRICS}, "source_file": os.path.basename(path)}
+
+    if targets:
+        with pdfplumber.open(path, pages=targets) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text() or ""
+                scale = page_scale(text)
+                row["currency"] = row["currency"] or page_currency(text)
+                for line in text.splitlines():
+                    line = line.strip()
+                    for name, label in METRICS.items():
+                        if row[name] is not None:
+                            continue
+                        value = line_values(line, label)
+                        if value is not None:
+                            row[name] = value if name in UNSCALED else value * scale
+
+    row["currency"] = row["currency"] or COUNTRY_CURRENCY.get(meta["country"])
+    row["pages"] = page_count
+    row["pages_parsed"] = len(targets)
+    # Reports with the same name can sit in different folders: the path ties the row back to its file hash
+    row["path"] = path
+    return pd.DataFrame([row])
+
+
+class ExtractionCache:
+    """Extracted rows keyed by the sha256 of the PDF, so an unchanged report is never parsed twice
+    (renamed or copied reports included). One JSON file per report under `root`."""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, f"{digest}.json")
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest)) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry.get("version") != EXTRACTOR_VERSION:
+            return None
+        return entry["row"]
+
+    def put(self, digest, row):
+        tmp_path = f"{self._path(digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": EXTRACTOR_VERSION, "row": row}, f)
+        os.replace(tmp_path, self._path(digest))
+
+
+def extract_reports(paths, workers=None, cache=None):
+    """Rows for `paths`: cached ones from `cache`, the rest parsed one document per worker.
+
+    Returns (frame with COLUMNS + pages / pages_parsed, [(file, error)], number served from the cache).
+    pages_parsed is 0 on the rows served from the cache
+    """
+    rows, to_parse, digests = [], [], {}
+    for path in paths:
+        digest = file_hash(path)
+        cached = cache.get(digest) if cache else None
+        if cached is not None:
+            # The same bytes may sit under another name: the name decides ticker and date
+            # Nothing of it is parsed this run, so it adds no statement pages to the run's count
+            rows.append({**cached, **report_metadata(path), "source_file": os.path.basename(path),
+                         "pages_parsed": 0})
+        else:
+            to_parse.append(path)
+            digests[path] = digest
+
+    frames, errors = parse_files_parallel(to_parse, extract_report, workers) if to_parse else ([], [])
+    for frame in frames:
+        row = frame.iloc[0].to_dict()
+        # Plain Python values, for the JSON cache
+        row = {k: (None if pd.isna(v) else v.item() if hasattr(v, "item") else v) for k, v in row.items()}
+        digest = digests[row.pop("path")]
+        if cache:
+            cache.put(digest, row)
+        rows.append(row)
+
+    found = pd.DataFrame(rows, columns=COLUMNS + ["pages", "pages_parsed"])
+    return found, errors, len(paths) - len(to_parse)
+
+
+def write_fundamentals(found, output=OUTPUT_CSV):
+    """Merge rows into the output CSV, a re-extracted report replacing its previous row"""
+    found = found[COLUMNS]
+    if os.path.exists(output):
+        stored = pd.read_csv(output, dtype={"report_date": str})
+        found = pd.concat([stored.reindex(columns=COLUMNS), found], ignore_index=True)
+    found = found.drop_duplicates(subset=["report_date", "ticker"], keep="last")
+    found = found.sort_values(["ticker", "report_date"])
+    found.to_csv(output, index=False)
+    return found
+
+
+def run(directory=REPORTS_DIR, output=OUTPUT_CSV, workers=None, use_cache=True, cache_dir=CACHE_DIR):
+    start = time.time()
+    paths = find_reports(directory)
+    if not paths:
+        print(f"No reports found in {directory}")
+        return pd.DataFrame(columns=COLUMNS)
+
+    cache = ExtractionCache(cache_dir) if use_cache else None
+    found, errors, cached = extract_reports(paths, workers, cache)
+    if not found.empty:
+        write_fundamentals(found, output)
+
+    parsed = found["pages_parsed"].sum()
+    print(f"✅ {len(found)} report(s) → {output} ({cached} from cache, {len(errors)} failed, "
+          f"{int(parsed):,} statement page(s) parsed, {time.time() - start:.2f}s)")
+    return found
+
+
+def benchmark(directory=REPORTS_DIR, workers=None):
+    """Extract every report in `directory` without the cache, one worker then the pool, and print pages/sec.
+
+    Pages/sec counts every page of the documents, parsed or skipped by the statement scan.
+    """
+    paths = find_reports(directory)
+    if not paths:
+        print(f"No reports found in {directory}")
+        return {}
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    for count in sorted({1, workers}):
+        start = time.time()
+        found, errors, _ = extract_reports(paths, count, cache=None)
+        elapsed = time.time() - start
+        pages, parsed = int(found["pages"].sum()), int(found["pages_parsed"].sum())
+        results[count] = pages / elapsed if elapsed else 0
+        print(f"⏱️  {count} worker(s): {len(paths)} report(s), {pages:,} pages ({parsed:,} parsed) in "
+              f"{elapsed:.2f}s → {results[count]:,.1f} pages/sec")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract banking fundamentals from annual and quarterly report "
+                                                 "PDFs into banking_fundamentals.csv")
+    parser.add_argument("--dir", default=REPORTS_DIR, help="folder of <COUNTRY>_<TICKER>_<YYYY-MM-DD>.pdf reports")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    parser.add_argument("--no-cache", action="store_true", help="parse every report even if it is unchanged")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--benchmark", action="store_true", help="report pages/sec over --dir instead of extracting")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.dir, args.workers)
+    else:
+        run(args.dir, args.output, args.workers, not args.no_cache, args.cache_dir)
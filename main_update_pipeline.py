@@ -1,37 +1,322 @@
-import subprocess
-import sqlite3
-import time
-import os
-
-def run_script(script_name):
-    print(f"\n=== Running {script_name} ===")
-    start = time.time()
-    subprocess.run(["python", script_name], check=True)
-    print(f"Finished {script_name} in {time.time() - start:.2f} seconds\n")
-
-
-def run_sql_file(db_path, sql_file):
-    print(f"\n=== Running SQL from {sql_file} ===")
-    with open(sql_file, "r") as f:
-        sql = f.read()
-    conn = sqlite3.connect(db_path)
-    try:
-        conn.executescript(sql)
-        conn.commit()
-        print(f"Finished SQL script {sql_file}")
-    except Exception as e:
-        print("SQL execution failed:", e)
-    finally:
-        conn.close()
-
-if __name__=="__main__":
-    DB_PATH="db/market_data.db"
-    run_script("DSE/scripts/dse_equities_updates.py")
-    #run_sql_file(DB_PATH,"DSE/scripts/autofill_dse.sql")
-    run_script("NSE/nse_equities_updates.py")
-    #run_sql_file(DB_PATH,"NSE/autofill_nse.sql")
-    run_script("JSE/jse_scripts/jse_equities_updates.py")
-    run_script("JSE/jse_scripts/jse_indices_updates.py")
-    #run_sql_file(DB_PATH,"JSE/jse_scripts/autofill_jse.sql")
-    run_script("BRVM/scripts/brvm_page.py")
-    run_script("BRVM/scripts/brvm_equities_updates.py")
\ No newline at end of file
+import argparse
+import importlib
+import subprocess
+import sys
+import threading
+import time
+import os
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from db.connection import get_engine
+
+LOG_DIR = "logs"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_script(script_name, log_path=None):
+    print(f"\n=== Running {script_name} ===")
+    start = time.time()
+    if log_path is None:
+        subprocess.run([sys.executable, script_name], check=True, stdin=subprocess.DEVNULL)
+    else:
+        # Stages run side by side, so each one writes to its own log instead of the shared terminal
+        with open(log_path, "w") as log:
+            subprocess.run([sys.executable, script_name], check=True, stdin=subprocess.DEVNULL,
+                           stdout=log, stderr=subprocess.STDOUT)
+    print(f"Finished {script_name} in {time.time() - start:.2f} seconds\n")
+
+
+class Stage:
+    """One pipeline step: a name, a callable taking the stage's log path, and the stages it waits for.
+
+    deps have to succeed for the stage to run; stages in after only have to be finished, whatever
+    their outcome. script is set for loader stages, so the same stage can also be run as a subprocess.
+    """
+
+    def __init__(self, name, run, deps=(), script=None, after=()):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.script = script
+        self.after = tuple(after)
+
+
+def script_stage(name, script, deps=(), after=()):
+    return Stage(name, lambda log_path: run_script(script, log_path), deps, script, after)
+
+
+class _ThreadOutput:
+    """Stands in for sys.stdout/sys.stderr so each in-process stage's prints go to that stage's log"""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "log", None) or self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+
+def module_name(script):
+    """Package path of a loader script: NSE/nse_equities_updates.py -> NSE.nse_equities_updates"""
+    relative = os.path.relpath(os.path.abspath(script), ROOT)
+    return os.path.splitext(relative)[0].replace(os.sep, ".")
+
+
+def load_module(script):
+    """Import a loader script by its package path from the repository root. It is then the same module
+    whoever imports it (db/parquet_store.py is db.parquet_store, not a second parquet_store), no script
+    folder shadows top-level names, and process pool workers can import its functions back by name."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return importlib.import_module(module_name(script))
+
+
+@contextmanager
+def stage_log(log_path):
+    """Send this thread's prints, and the traceback if the stage fails, to the stage's log file"""
+    outputs = [out for out in (sys.stdout, sys.stderr) if isinstance(out, _ThreadOutput)]
+    with open(log_path, "w", buffering=1) as log:
+        for out in outputs:
+            out.local.log = log
+        try:
+            yield log
+        except Exception:
+            traceback.print_exc(file=log)
+            raise
+        finally:
+            for out in outputs:
+                out.local.log = None
+
+
+def loader_stage(name, script, entry, deps=(), after=(), **kwargs):
+    """Stage that imports `script` into this process and calls its entry point.
+
+    Stages share pandas/SQLAlchemy imports and the pooled engine from db.connection.get_engine().
+    An entry point signals failure by raising or by returning False.
+    """
+
+    def run(log_path):
+        with stage_log(log_path):
+            print(f"\n=== Running {script}:{entry} in-process ===")
+            start = time.time()
+            module = load_module(script)
+            print(f"Imported {script} in {time.time() - start:.2f} seconds")
+            if getattr(module, entry)(**kwargs) is False:
+                raise RuntimeError(f"{script}:{entry} reported a failed load")
+            print(f"Finished {script} in {time.time() - start:.2f} seconds\n")
+
+    return Stage(name, run, deps, script, after)
+
+
+def as_subprocess(stage):
+    """The same stage, but run as `python <script>` the way the pipeline used to"""
+    return script_stage(stage.name, stage.script, stage.deps, stage.after) if stage.script else stage
+
+
+PIPELINE = [
+    loader_stage("dse", "DSE/scripts/dse_equities_updates.py", "run"),
+    loader_stage("nse", "NSE/nse_equities_updates.py", "main"),
+    loader_stage("jse_equities", "JSE/jse_scripts/jse_equities_updates.py", "main"),
+    loader_stage("jse_indices", "JSE/jse_scripts/jse_indices_updates.py", "main"),
+    loader_stage("brvm_page", "BRVM/scripts/brvm_page.py", "run"),
+    loader_stage("brvm_equities", "BRVM/scripts/brvm_equities_updates.py", "main", deps=["brvm_page"]),
+    loader_stage("bvc", "BVC/scripts/bvc_equities_updates.py", "run"),
+    # Appends whatever each loader stored tonight; an exchange that failed is caught up on the next run
+    loader_stage("parquet_sync", "db/parquet_store.py", "sync",
+                 after=["dse", "nse", "jse_equities", "jse_indices", "brvm_equities", "bvc"]),
+    # Only the days loaded since the last run are computed, from the rolling state each ticker keeps
+    loader_stage("indicators", "analytics/indicators.py", "refresh",
+                 after=["dse", "nse", "jse_equities", "jse_indices", "brvm_equities", "bvc"]),
+    # Only rows that are new or changed in the CORPORATE_ACTIONS files are written
+    loader_stage("corporate_actions", "db/corporate_actions.py", "ingest"),
+    # Recomputes the adjustment factors of the tickers whose corporate actions changed or went ex
+    loader_stage("adjustments", "analytics/adjustments.py", "refresh", after=["nse", "corporate_actions"]),
+]
+
+
+def check_dag(stages):
+    """Reject unknown dependencies and cycles before anything runs"""
+    names = {s.name for s in stages}
+    for stage in stages:
+        unknown = (set(stage.deps) | set(stage.after)) - names
+        if unknown:
+            raise ValueError(f"stage {stage.name} depends on unknown stage(s) {sorted(unknown)}")
+    deps = {s.name: set(s.deps) | set(s.after) for s in stages}
+    done = set()
+    while deps:
+        ready = [name for name, d in deps.items() if d <= done]
+        if not ready:
+            raise ValueError(f"dependency cycle between {sorted(deps)}")
+        for name in ready:
+            done.add(name)
+            del deps[name]
+
+
+def _timed(stage, log_path):
+    start = time.time()
+    stage.run(log_path)
+    return time.time() - start
+
+
+def run_pipeline(stages, max_workers=4, log_dir=LOG_DIR):
+    """Run stages as soon as their dependencies succeed, up to max_workers at a time.
+
+    A failed stage only skips the stages downstream of it; the other exchanges carry on.
+    Returns {stage name: {"status": ok/failed/skipped, "seconds": ..., "error": ...}}.
+    """
+    check_dag(stages)
+    run_log_dir = os.path.join(log_dir, datetime.now().strftime("%Y-%m-%d_%H%M%S"))
+    os.makedirs(run_log_dir, exist_ok=True)
+
+    pending = {s.name: s for s in stages}
+    results = {}
+    pipeline_start = time.time()
+    saved_outputs = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _ThreadOutput(sys.stdout), _ThreadOutput(sys.stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_results = [results.get(d) for d in stage.deps]
+                    if any(r is not None and r["status"] != "ok" for r in dep_results):
+                        results[name] = {"status": "skipped", "seconds": 0.0,
+                                         "error": "upstream failed: " + ", ".join(
+                                             d for d in stage.deps if results.get(d, {}).get("status") != "ok")}
+                        print(f"⏭️  {name} skipped ({results[name]['error']})")
+                        del pending[name]
+                    elif all(r is not None for r in dep_results) and all(a in results for a in stage.after):
+                        log_path = os.path.join(run_log_dir, f"{name}.log")
+                        print(f"▶️  {name} started (log: {log_path})")
+                        running[pool.submit(_timed, stage, log_path)] = (name, time.time())
+                        del pending[name]
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    try:
+                        results[name] = {"status": "ok", "seconds": future.result(), "error": None}
+                        print(f"✅ {name} finished in {results[name]['seconds']:.2f}s")
+                    except Exception as e:
+                        results[name] = {"status": "failed", "seconds": time.time() - started, "error": str(e)[:200]}
+                        print(f"❌ {name} failed after {results[name]['seconds']:.2f}s: {results[name]['error']}")
+    finally:
+        sys.stdout, sys.stderr = saved_outputs
+
+    print_report(results, time.time() - pipeline_start, run_log_dir)
+    return results
+
+
+def print_report(results, wall_time, run_log_dir):
+    icons = {"ok": "✅", "failed": "❌", "skipped": "⏭️ "}
+    print(f"\n{'=' * 60}")
+    print("📈 PIPELINE REPORT")
+    for name, r in results.items():
+        line = f"   {icons[r['status']]} {name:<15} {r['status']:<8} {r['seconds']:8.2f}s"
+        if r["error"]:
+            line += f"  {r['error']}"
+        print(line)
+    serial_time = sum(r["seconds"] for r in results.values())
+    print(f"   Wall time: {wall_time:.2f}s (stages add up to {serial_time:.2f}s run one after another)")
+    print(f"   Logs: {run_log_dir}")
+
+
+# Run in a fresh interpreter: what a loader pays before its first line of real work as a subprocess
+STARTUP_PROBE = """
+import sys, time
+start = time.time()
+sys.path.insert(0, {root!r})
+import {module}
+imported = time.time()
+from db.connection import get_engine
+try:
+    get_engine().connect().close()
+    print(imported - start, time.time() - imported)
+except Exception:
+    print(imported - start, -1)
+"""
+
+
+def compare_startup(stages):
+    """Startup and connection setup per loader stage: subprocess model vs one shared process.
+
+    No data is fetched; each loader is only imported and a database connection opened.
+    """
+    loaders = [s for s in stages if s.script]
+    rows = []
+    for stage in loaders:
+        start = time.time()
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE.format(root=ROOT, module=module_name(stage.script))],
+                             capture_output=True, text=True, check=True, stdin=subprocess.DEVNULL)
+        total = time.time() - start
+        _, connect = (float(x) for x in out.stdout.split()[-2:])
+        rows.append({"stage": stage.name, "subprocess": total, "subprocess_connect": connect})
+
+    engine = get_engine()
+    for row, stage in zip(rows, loaders):
+        start = time.time()
+        load_module(stage.script)
+        row["in_process_import"] = time.time() - start
+        start = time.time()
+        try:
+            engine.connect().close()
+            row["in_process_connect"] = time.time() - start
+        except Exception:
+            row["in_process_connect"] = -1
+
+    print(f"\n{'=' * 60}")
+    print("⏱️  STARTUP COST PER LOADER (seconds, -1 = database unreachable)")
+    print(f"   {'stage':<15} {'subprocess':>10} {'(connect)':>10} {'in-process':>11} {'(connect)':>10}")
+    for row in rows:
+        in_process = row["in_process_import"] + max(row["in_process_connect"], 0)
+        print(f"   {row['stage']:<15} {row['subprocess']:>10.2f} {row['subprocess_connect']:>10.3f} "
+              f"{in_process:>11.2f} {row['in_process_connect']:>10.3f}")
+    subprocess_total = sum(r["subprocess"] for r in rows)
+    in_process_total = sum(r["in_process_import"] + max(r["in_process_connect"], 0) for r in rows)
+    print(f"   Total: {subprocess_total:.2f}s as subprocesses vs {in_process_total:.2f}s in one process "
+          f"({subprocess_total - in_process_total:.2f}s saved per run)")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nightly update of every exchange")
+    parser.add_argument("--max-workers", type=int, default=4, help="stages allowed to run at once")
+    parser.add_argument("--only", nargs="+", help="run just these stages (their dependencies are not added)")
+    parser.add_argument("--skip", nargs="+", default=[], help="leave these stages (and what depends on them) out")
+    parser.add_argument("--subprocess", action="store_true", help="run each loader in its own interpreter, as before")
+    parser.add_argument("--compare-startup", action="store_true",
+                        help="only measure loader startup and connection setup, subprocess vs in-process")
+    args = parser.parse_args()
+
+    skipped = set(args.skip)
+    for stage in PIPELINE:
+        # Anything downstream of a skipped stage would only be skipped at run time
+        if skipped & set(stage.deps):
+            skipped.add(stage.name)
+    stages = [s for s in PIPELINE if (not args.only or s.name in args.only) and s.name not in skipped]
+    names = {s.name for s in stages}
+    # With --only, dependencies outside the selection are assumed to be already done
+    stages = [Stage(s.name, s.run, [d for d in s.deps if d in names], s.script, [a for a in s.after if a in names])
+              for s in stages]
+    if args.compare_startup:
+        compare_startup(stages)
+        sys.exit(0)
+    if args.subprocess:
+        stages = [as_subprocess(s) for s in stages]
+    results = run_pipeline(stages, max_workers=args.max_workers)
+    sys.exit(0 if all(r["status"] == "ok" for r in results.values()) else 1)
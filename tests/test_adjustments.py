@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analytics.adjustments import adjusted_view, refresh_table
+from db.schema import create_table, to_ohlcv_batch
+from db.writer import upsert_batch
+
+TABLE = "nse_ke_daily_ohlcv"
+DAYS = [date(2024, 3, 1) + timedelta(days=i) for i in range(6)]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'adjustments.db'}")
+    create_table(engine, TABLE)
+    bars = pd.DataFrame({"ticker": "SCOM", "trade_date": DAYS, "opening_price": 10.0, "high": 10.0, "low": 10.0,
+                         "closing_price": 10.0, "volume": 1000})
+    upsert_batch(to_ohlcv_batch(bars), TABLE, engine)
+    return engine
+
+
+def add_action(engine, table, columns, values):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})"))
+        conn.execute(text(f"INSERT INTO {table} VALUES ({', '.join(f':{c}' for c in columns)})"),
+                     dict(zip(columns, values)))
+
+
+def adjusted(engine):
+    rows = pd.read_sql(f"SELECT trade_date, closing_price, high, volume, raw_closing_price, price_factor "
+                       f"FROM {adjusted_view(TABLE)} ORDER BY trade_date", engine)
+    return rows.set_index(pd.to_datetime(rows["trade_date"]).dt.date)
+
+
+def test_dividend_scales_prices_before_the_record_date(engine):
+    add_action(engine, "nse_corporate_actions_dividends", ["ticker", "record_date", "amount_per_share"],
+               ["SCOM", "2024-03-04", 1.0])
+    assert refresh_table(engine, TABLE) == 1
+    rows = adjusted(engine)
+    before, after = rows.loc[DAYS[:3]], rows.loc[DAYS[3:]]
+    assert before["price_factor"].tolist() == pytest.approx([0.9] * 3)
+    assert before["closing_price"].tolist() == pytest.approx([9.0] * 3)
+    assert before["high"].tolist() == pytest.approx([9.0] * 3)
+    assert (before["volume"] == 1000).all()
+    assert (after["price_factor"] == 1).all() and (after["closing_price"] == 10.0).all()
+    assert (rows["raw_closing_price"] == 10.0).all()
+
+
+def test_one_for_one_bonus_halves_prices_and_doubles_volume(engine):
+    add_action(engine, "nse_corporate_actions_bonus", ["ticker", "book_closure_date", "bonus_ratio_num",
+                                                       "bonus_ratio_den"], ["SCOM", "2024-03-04", 1, 1])
+    refresh_table(engine, TABLE)
+    rows = adjusted(engine)
+    assert rows.loc[DAYS[:3], "closing_price"].tolist() == pytest.approx([5.0] * 3)
+    assert rows.loc[DAYS[:3], "volume"].tolist() == [2000] * 3
+    assert rows.loc[DAYS[3:], "closing_price"].tolist() == [10.0] * 3
+    assert rows.loc[DAYS[3:], "volume"].tolist() == [1000] * 3
+
+
+def test_factors_compound_and_wait_for_the_ex_date(engine):
+    add_action(engine, "nse_corporate_actions_dividends", ["ticker", "record_date", "amount_per_share"],
+               ["SCOM", "2024-03-03", 1.0])
+    add_action(engine, "nse_corporate_actions_bonus", ["ticker", "book_closure_date", "bonus_ratio_num",
+                                                       "bonus_ratio_den"], ["SCOM", "2024-03-05", 1, 1])
+    # Announced, not traded yet
+    add_action(engine, "nse_corporate_actions_dividends", ["ticker", "record_date", "amount_per_share"],
+               ["SCOM", "2024-03-20", 2.0])
+    refresh_table(engine, TABLE)
+    assert adjusted(engine)["price_factor"].tolist() == pytest.approx([0.45, 0.45, 0.5, 0.5, 1.0, 1.0])
+    # Nothing changed, nothing recomputed
+    assert refresh_table(engine, TABLE) == 0
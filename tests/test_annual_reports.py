@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from fundamental_extraction_scripts import annual_reports
+from fundamental_extraction_scripts.annual_reports import METRICS, line_values
+
+
+@pytest.mark.parametrize("line, metric, expected", [
+    ("Total assets 412,090,118 398,112,004", "total_assets", 412090118.0),
+    ("Loans and advances to customers 18 212,090 198,112", "loans_and_advances", 212090.0),
+    ("Profit before tax (1,204.5) 980.0", "profit_before_tax", -1204.5),
+    ("Earnings per share (KShs) 9.85 8.10", "eps", 9.85),
+    ("Total assets 2024 2023", "total_assets", None),
+    ("Total assets 18 2024 2023", "total_assets", None),
+    ("Total assets 2024 2023 1,204", "total_assets", 2024.0),
+    ("Total assets overview .... 3", "total_assets", None),
+])
+def test_line_values(line, metric, expected):
+    assert line_values(line, METRICS[metric]) == expected
+
+
+def fake_extract(path):
+    row = {**annual_reports.report_metadata(path), "currency": "KES", "total_assets": 1.0,
+           "source_file": os.path.basename(path), "pages": 120, "pages_parsed": 3, "path": path}
+    return pd.DataFrame([row])
+
+
+def test_cached_reports_add_no_parsed_pages(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(annual_reports, "extract_report", fake_extract)
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    (reports / "KE_KCB_2023-12-31.pdf").write_bytes(b"first")
+    kwargs = dict(output=str(tmp_path / "out.csv"), workers=1, cache_dir=str(tmp_path / "cache"))
+
+    annual_reports.run(str(reports), **kwargs)
+    (reports / "KE_EQTY_2023-12-31.pdf").write_bytes(b"second")
+    found = annual_reports.run(str(reports), **kwargs)
+
+    assert found.set_index("ticker")["pages_parsed"].to_dict() == {"KCB": 0, "EQTY": 3}
+    assert "(1 from cache, 0 failed, 3 statement page(s) parsed" in capsys.readouterr().out
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from BRVM.scripts import brvm_index_updates
+from BRVM.scripts.brvm_index_updates import INDICES_TABLE
+
+ROWS = [("BRVMC", "BRVM COMPOSITE", "1 250", "0", "230,15", "231,40"),
+        ("BRVM30", "BRVM 30", "980", "0", "115,02", "115,90")]
+
+
+def index_page(day="Tuesday, 05 March, 2024", rows=ROWS):
+    cells = "".join(
+        "<tr>" + "".join(f"<td>{v}</td>" for v in (ticker, name, volume, value, opening, closing, "0,5%")) + "</tr>"
+        for ticker, name, volume, value, opening, closing in rows
+    )
+    return (f"<html><body><p class='header-seance'>{day} - Séance</p>"
+            f"<section id='block-system-main'><table><tr><th>Code</th></tr>{cells}</table></section></body></html>")
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'brvm.db'}")
+    monkeypatch.setattr(brvm_index_updates, "get_engine", lambda: engine)
+    monkeypatch.chdir(tmp_path)
+    return engine
+
+
+def test_index_pages_are_written_and_only_they_are_deleted(engine, tmp_path):
+    (tmp_path / "brvm_indices_20240305.html").write_text(index_page(), encoding="utf-8")
+    (tmp_path / "brvm_stocks_20240305.html").write_text("stocks page", encoding="utf-8")
+
+    df = brvm_index_updates.main()
+    assert len(df) == 2
+    stored = pd.read_sql(f"SELECT ticker, trade_date, opening_price, closing_price, volume "
+                         f"FROM {INDICES_TABLE} ORDER BY ticker", engine)
+    assert stored["ticker"].tolist() == ["BRVM30", "BRVMC"]
+    assert stored["closing_price"].tolist() == [115.90, 231.40]
+    assert stored["volume"].tolist() == [980, 1250]
+    assert sorted(os.listdir(tmp_path)) == ["brvm.db", "brvm_stocks_20240305.html"]
+
+
+def test_rerun_is_idempotent(engine, tmp_path):
+    for _ in range(2):
+        (tmp_path / "brvm_indices_20240305.html").write_text(index_page(), encoding="utf-8")
+        brvm_index_updates.main()
+    assert len(pd.read_sql(f"SELECT * FROM {INDICES_TABLE}", engine)) == 2
+
+
+def test_nothing_written_reports_failure(engine, tmp_path):
+    assert brvm_index_updates.main() is False
+    (tmp_path / "brvm_indices_20240305.html").write_text(index_page(rows=[]), encoding="utf-8")
+    assert brvm_index_updates.main() is False
+    # An unparsed page is kept for a rerun
+    assert os.path.exists(tmp_path / "brvm_indices_20240305.html")
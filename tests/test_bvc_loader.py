@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from BVC.scripts import bvc_equities_updates
+from BVC.scripts.bvc_equities_updates import FIXTURES_DIR, OHLCV_TABLE, run
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # bvc_datapoints.csv and the fixtures are read relative to the repo root
+    monkeypatch.chdir(ROOT)
+    return create_engine(f"sqlite:///{tmp_path / 'bvc.db'}")
+
+
+def stored(engine):
+    return pd.read_sql(f"SELECT ticker, trade_date, closing_price, volume FROM {OHLCV_TABLE} "
+                       f"ORDER BY ticker, trade_date", engine)
+
+
+def test_fixture_run_stores_every_row_once(engine):
+    assert run(fixtures=FIXTURES_DIR, engine=engine) is True
+    first = stored(engine)
+    assert len(first) == 12
+    assert not first.duplicated(["ticker", "trade_date"]).any()
+
+    # The second night starts from the watermarks and finds nothing new
+    assert run(fixtures=FIXTURES_DIR, engine=engine) is True
+    pd.testing.assert_frame_equal(stored(engine), first)
+
+
+def test_failed_tickers_are_logged_under_logs(engine, tmp_path, monkeypatch):
+    failed_path = tmp_path / "logs" / "bvc_failed_links.csv"
+    monkeypatch.setattr(bvc_equities_updates, "FAILED_LINKS_PATH", str(failed_path))
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    (fixtures / "ATW.json").write_text("not json", encoding="utf-8")
+    monkeypatch.setattr(bvc_equities_updates, "make_run_policy",
+                        lambda n: bvc_equities_updates.RetryPolicy(max_retries=0))
+
+    assert run(fixtures=str(fixtures), engine=engine) is False
+    assert pd.read_csv(failed_path)["ticker"].tolist() == ["ATW"]
+    assert not os.path.exists(os.path.join(ROOT, "bvc_failed_links.csv"))
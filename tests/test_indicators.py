@@ -0,0 +1,101 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analytics.indicators import (ATR_WINDOW, INDICATORS, SMA_WINDOWS, TRADING_DAYS, VOLATILITY_WINDOW,
+                                  VOLUME_WINDOW, compute_indicators, indicator_table, refresh_table)
+from db.schema import create_table, to_ohlcv_batch
+from db.writer import synthetic_ohlcv, upsert_batch
+
+TABLE = "nse_ke_daily_ohlcv"
+N_TICKERS = 4
+# Longer than the 200 day SMA, so every window is checked once it is full
+HISTORY = synthetic_ohlcv(260 * N_TICKERS, N_TICKERS)
+
+
+def pandas_reference(bars):
+    """The same indicators with pandas rolling windows, one ticker at a time"""
+    out = []
+    for _, g in bars.sort_values(["ticker", "trade_date"]).groupby("ticker", sort=True):
+        close, high, low, volume = g["closing_price"], g["high"], g["low"], g["volume"].astype(float)
+        prev_close = close.shift()
+        ref = pd.DataFrame(index=g.index)
+        ref["return_1d"] = close.pct_change()
+        ref["log_return"] = np.log(close / prev_close)
+        ref[f"volatility_{VOLATILITY_WINDOW}"] = ref["log_return"].rolling(VOLATILITY_WINDOW).std() * np.sqrt(TRADING_DAYS)
+        for w in SMA_WINDOWS:
+            ref[f"sma_{w}"] = close.rolling(w).mean()
+        true_range = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+        ref[f"atr_{ATR_WINDOW}"] = true_range.rolling(ATR_WINDOW).mean()
+        typical = (high + low + close) / 3
+        volume_sum = volume.rolling(VOLUME_WINDOW).sum()
+        ref[f"vwap_{VOLUME_WINDOW}"] = (typical * volume).rolling(VOLUME_WINDOW).sum() / volume_sum
+        ref[f"volume_sma_{VOLUME_WINDOW}"] = volume.rolling(VOLUME_WINDOW).mean()
+        ref["relative_volume"] = volume / ref[f"volume_sma_{VOLUME_WINDOW}"]
+        ref["drawdown"] = close / close.cummax() - 1
+        ref["max_drawdown"] = ref["drawdown"].cummin()
+        out.append(ref)
+    return pd.concat(out)
+
+
+def as_bars(df):
+    df = df.sort_values(["ticker", "trade_date"])
+    return {name: df[name].to_numpy() for name in ("ticker", "trade_date", "high", "low", "closing_price", "volume")}
+
+
+def test_matches_pandas_rolling():
+    values = compute_indicators(as_bars(HISTORY))
+    reference = pandas_reference(HISTORY)
+    for name in INDICATORS:
+        np.testing.assert_allclose(values[name], reference[name].to_numpy(dtype=float), rtol=1e-9, atol=1e-9,
+                                   err_msg=name)
+
+
+def test_brvm_style_bars_without_high_low_use_the_close():
+    bars = as_bars(HISTORY.assign(high=np.nan, low=np.nan))
+    values = compute_indicators(bars)
+    assert np.isnan(values[f"atr_{ATR_WINDOW}"]).all()
+    reference = pandas_reference(HISTORY.assign(high=HISTORY["closing_price"], low=HISTORY["closing_price"]))
+    np.testing.assert_allclose(values[f"vwap_{VOLUME_WINDOW}"], reference[f"vwap_{VOLUME_WINDOW}"], rtol=1e-9)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indicators.db'}")
+    create_table(engine, TABLE)
+    return engine
+
+
+def stored(engine):
+    rows = pd.read_sql(f"SELECT * FROM {indicator_table(TABLE)} ORDER BY ticker, trade_date", engine)
+    return rows[["ticker", "trade_date"] + INDICATORS]
+
+
+def test_incremental_refresh_equals_a_full_recompute(engine):
+    days = sorted(HISTORY["trade_date"].unique())
+    upsert_batch(to_ohlcv_batch(HISTORY[HISTORY["trade_date"] < days[-5]]), TABLE, engine)
+    refresh_table(engine, TABLE)
+    # Nightly loads: one day, then a ticker that skips a day, then two days at once
+    for loaded in (days[-5:-4], days[-4:-3], days[-3:]):
+        new = HISTORY[HISTORY["trade_date"].isin(loaded)]
+        if loaded == days[-4:-3]:
+            new = new[new["ticker"] != "T001"]
+        upsert_batch(to_ohlcv_batch(new), TABLE, engine)
+        assert refresh_table(engine, TABLE) == len(new)
+    incremental = stored(engine)
+
+    refresh_table(engine, TABLE, full=True)
+    full = stored(engine)
+    assert len(incremental) == len(full) == len(HISTORY) - 1
+    pd.testing.assert_frame_equal(incremental, full, rtol=1e-9, atol=1e-12)
+
+
+def test_refresh_without_new_bars_writes_nothing(engine):
+    upsert_batch(to_ohlcv_batch(HISTORY), TABLE, engine)
+    assert refresh_table(engine, TABLE) == len(HISTORY)
+    assert refresh_table(engine, TABLE) == 0
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from JSE.jse_scripts import jse_indices_updates
+from JSE.jse_scripts.jse_equities_updates import FixtureSource
+from JSE.jse_scripts.jse_missing_queue import INDICES_TABLE, OHLCV_TABLE, QUEUE_TABLE, enqueue, queue_depth, replay
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def wide_download(tickers, days):
+    """A recorded-download shaped frame: (ticker, field) columns, one row per day"""
+    index = pd.DatetimeIndex(pd.to_datetime(days))
+    columns = pd.MultiIndex.from_product([tickers, ["Open", "High", "Low", "Close", "Adj Close", "Volume"]])
+    values = np.tile(np.arange(1, len(columns) + 1, dtype="float64"), (len(index), 1))
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def fixture(tmp_path, wide, name="download.pkl"):
+    path = tmp_path / name
+    wide.to_pickle(path)
+    return FixtureSource(path)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jse.db'}")
+    # The loaders read their ticker lists relative to the repo root
+    monkeypatch.chdir(ROOT)
+    return engine
+
+
+def test_index_misses_are_queued(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(jse_indices_updates, "get_engine", lambda: engine)
+    indices = pd.read_csv(os.path.join(ROOT, "JSE/data/jse_indices.csv"))["ticker"].tolist()
+    source = fixture(tmp_path, wide_download(indices[:4], ["2024-03-05"]))
+
+    stored = jse_indices_updates.main("2024-03-05", source=source)
+    assert sorted(stored["ticker"]) == sorted(indices[:4])
+    queued = pd.read_sql(f"SELECT ticker, status FROM {QUEUE_TABLE} ORDER BY ticker", engine)
+    assert queued["ticker"].tolist() == sorted(indices[4:])
+    assert set(queued["status"]) == {"pending"}
+
+
+def test_a_day_with_no_index_at_all_is_queued(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(jse_indices_updates, "get_engine", lambda: engine)
+    source = fixture(tmp_path, wide_download(["^J200.JO"], ["2024-03-04"]))
+    assert jse_indices_updates.main("2024-03-05", source=source).empty
+    assert queue_depth(engine) == {"pending": 6}
+
+
+def test_replay_fills_equities_and_indices_into_their_tables(engine, tmp_path):
+    enqueue(engine, [{"ticker": "NPN.JO", "missing_date": "2024-03-05"},
+                     {"ticker": "^J200.JO", "missing_date": "2024-03-05"},
+                     {"ticker": "SOL.JO", "missing_date": "2024-03-05"}])
+    source = fixture(tmp_path, wide_download(["NPN.JO", "^J200.JO"], ["2024-03-05", "2024-03-06"]))
+
+    report = replay(engine, source=source)
+    assert report == {"due": 3, "filled": 2, "absent": 0, "retry": 1}
+    assert pd.read_sql(f"SELECT ticker FROM {OHLCV_TABLE}", engine)["ticker"].tolist() == ["NPN.JO"]
+    assert pd.read_sql(f"SELECT ticker FROM {INDICES_TABLE}", engine)["ticker"].tolist() == ["^J200.JO"]
+    assert queue_depth(engine) == {"filled": 2, "pending": 1}
+    # SOL.JO is backed off, so a second replay has nothing due yet
+    assert replay(engine, source=source)["due"] == 0
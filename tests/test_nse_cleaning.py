@@ -0,0 +1,120 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from NSE import nse_cleaning
+from NSE.nse_cleaning import PRICE_LIST_COLUMNS, clean_price_list
+
+AD_CODE = "Discover more (adsbygoogle=window.adsbygoogle || []).push({})"
+
+
+def price_row(code, name="Safaricom Plc", price="17.50", volume="1,204,300", low="17.10", high="17.80",
+              trade_date="2024-03-05"):
+    values = {column: "-" for column in PRICE_LIST_COLUMNS}
+    values.update(code=code, name=name, price=price, volume=volume, low_day=low, high_day=high)
+    return [values[column] for column in PRICE_LIST_COLUMNS] + [trade_date]
+
+
+def raw_frame(rows):
+    # Header text varies between pages, the transform only goes by position
+    return pd.DataFrame(rows, columns=[f"col{i}" for i in range(len(PRICE_LIST_COLUMNS) + 1)])
+
+
+@pytest.fixture
+def raw():
+    return raw_frame([
+        price_row("Banking", name="", price=""),
+        price_row("KCB", name="KCB Group Plc", price="38.00", volume="502,100", low="37.50", high="38.40"),
+        price_row(AD_CODE, name="", price=""),
+        price_row("TELECOMMUNICATION", name="", price=""),
+        price_row("SCOM"),
+        price_row("EQTY", name="Equity Group", price="45.25", volume="-", low="N/A", high=" "),
+        price_row("Exchange Traded Funds", name="", price=""),
+        price_row("UMME", name="Umeme Ltd", price="-"),
+    ])
+
+
+def test_sector_headers_and_ads_are_dropped(raw):
+    clean = clean_price_list(raw)
+    assert clean["ticker"].tolist() == ["EQTY", "KCB", "SCOM"]
+
+
+def test_non_security_pattern_is_compiled_once_and_run_per_distinct_code(raw, monkeypatch):
+    assert isinstance(nse_cleaning.NON_SECURITY_RE, re.Pattern)
+    assert nse_cleaning.NON_SECURITY_RE.search("banking")
+    assert nse_cleaning.NON_SECURITY_RE.search(AD_CODE)
+    assert nse_cleaning.NON_SECURITY_RE.search("SCOM") is None
+
+    compiled = nse_cleaning.NON_SECURITY_RE
+    searched = []
+
+    class CountingPattern:
+        def search(self, text):
+            searched.append(text)
+            return compiled.search(text)
+
+    monkeypatch.setattr(nse_cleaning, "NON_SECURITY_RE", CountingPattern())
+    repeated = raw_frame([price_row("SCOM")] * 50 + [price_row("Banking", name="", price="")] * 50)
+    clean = clean_price_list(repeated)
+    assert sorted(searched) == ["Banking", "SCOM"]
+    assert len(clean) == 50
+
+
+def test_null_tokens_become_nan(raw):
+    clean = clean_price_list(raw).set_index("ticker")
+    assert np.isnan(clean.loc["EQTY", "volume"])
+    assert np.isnan(clean.loc["EQTY", "low"])
+    assert np.isnan(clean.loc["EQTY", "high"])
+    assert clean.loc["EQTY", "closing_price"] == 45.25
+    # Thousands separators are noise, not nulls
+    assert clean.loc["SCOM", "volume"] == 1_204_300.0
+    # A row whose price is a null token is not a trade
+    assert "UMME" not in clean.index
+
+
+def test_output_columns_and_dtypes(raw):
+    clean = clean_price_list(raw)
+    assert list(clean.columns) == ["ticker", "company_name", "low", "high", "closing_price", "volume", "trade_date"]
+    assert clean["ticker"].dtype == "string"
+    assert clean["company_name"].dtype == "string"
+    for column in ("low", "high", "closing_price", "volume"):
+        assert clean[column].dtype == np.float64, column
+    assert clean["trade_date"].dtype.kind == "M"
+
+
+def test_numeric_input_is_cast_straight_to_float(raw):
+    numeric = raw.copy()
+    numeric[numeric.columns[PRICE_LIST_COLUMNS.index("volume")]] = np.full(len(raw), 1000, dtype="int64")
+    clean = clean_price_list(numeric)
+    assert clean["volume"].dtype == np.float64
+    assert (clean["volume"] == 1000.0).all()
+
+
+def test_input_frame_is_left_unchanged(raw):
+    before = raw.copy(deep=True)
+    clean = clean_price_list(raw)
+    pd.testing.assert_frame_equal(raw, before)
+
+    # The output owns its data: editing it does not reach back into the input
+    clean.loc[:, "closing_price"] = -1.0
+    clean.loc[:, "ticker"] = "X"
+    pd.testing.assert_frame_equal(raw, before)
+
+
+def test_wrong_column_count_is_rejected(raw):
+    with pytest.raises(ValueError, match="expected 14 columns"):
+        clean_price_list(raw.iloc[:, :-1])
+
+
+def test_input_frame_is_not_copied(raw, monkeypatch):
+    # Only the six stored columns are read, by position; the 14-column input is never duplicated
+    def no_copy(self, *args, **kwargs):
+        raise AssertionError("clean_price_list copied a whole frame")
+
+    monkeypatch.setattr(pd.DataFrame, "copy", no_copy)
+    assert len(clean_price_list(raw)) == 3
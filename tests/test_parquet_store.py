@@ -0,0 +1,54 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.parquet_store import read_ohlcv, sync
+from db.schema import to_ohlcv_batch
+from db.writer import upsert_batch
+
+TABLE = "nse_ke_daily_ohlcv"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'store.db'}")
+
+
+def load(engine, rows):
+    frame = pd.DataFrame(rows, columns=["ticker", "trade_date", "closing_price"]).assign(volume=100)
+    upsert_batch(to_ohlcv_batch(frame), TABLE, engine)
+
+
+def test_sync_picks_up_back_dated_rows_and_corrections(engine, tmp_path):
+    root = str(tmp_path / "ohlcv")
+    load(engine, [("SCOM", date(2023, 12, 28), 13.9), ("SCOM", date(2024, 3, 4), 17.5),
+                  ("SCOM", date(2024, 3, 5), 17.6), ("KCB", date(2024, 3, 5), 38.0)])
+    assert sync(root, engine)[TABLE] == 4
+
+    # A gap backfill below the watermark, a corrected close and one new day
+    load(engine, [("KCB", date(2024, 3, 4), 37.5), ("SCOM", date(2024, 3, 4), 17.45),
+                  ("SCOM", date(2024, 3, 6), 17.8)])
+    sync(root, engine)
+
+    stored = read_ohlcv(root=root)
+    assert len(stored) == 6
+    assert not stored.duplicated(["ticker", "trade_date"]).any()
+    scom = read_ohlcv(tickers=["SCOM"], start="2024-03-04", end="2024-03-04", root=root)
+    assert scom["closing_price"].tolist() == [17.45]
+    kcb = read_ohlcv(exchanges=["NSE"], tickers=["KCB"], start="2024-01-01", root=root).sort_values("trade_date")
+    assert kcb["closing_price"].tolist() == [37.5, 38.0]
+    # The untouched year is still there once
+    assert read_ohlcv(end="2023-12-31", root=root)["closing_price"].tolist() == [13.9]
+
+
+def test_sync_without_changes_writes_nothing(engine, tmp_path):
+    root = str(tmp_path / "ohlcv")
+    load(engine, [("SCOM", date(2024, 3, 5), 17.6)])
+    sync(root, engine)
+    assert sync(root, engine)[TABLE] == 0
+    assert len(read_ohlcv(root=root)) == 1
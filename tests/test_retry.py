@@ -0,0 +1,142 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.retry import NON_RETRYABLE_STATUSES, RetryBudget, RetryPolicy, parse_retry_after
+
+
+def fail_until_stop(state, **kwargs):
+    """Fail attempts until the policy gives up; returns the delays it asked for"""
+    delays = []
+    while True:
+        state.begin_attempt()
+        delay = state.retry_after("HTTP 503", 503, **kwargs)
+        if delay is None:
+            return delays
+        delays.append(delay)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_jitter_stays_between_base_and_cap(seed):
+    policy = RetryPolicy(max_retries=30, base_delay=0.5, max_delay=8.0, rng=random.Random(seed))
+    delays = fail_until_stop(policy.start("http://dse/x"))
+    assert len(delays) == 30
+    assert all(policy.base_delay <= d <= policy.max_delay for d in delays)
+    # Decorrelated: each delay is at most three times the previous one
+    previous = policy.base_delay
+    for d in delays:
+        assert d <= previous * 3 + 1e-9
+        previous = d
+
+
+def test_seeded_policies_give_the_same_delays():
+    first = fail_until_stop(RetryPolicy(max_retries=10, rng=random.Random(7)).start("u"))
+    second = fail_until_stop(RetryPolicy(max_retries=10, rng=random.Random(7)).start("u"))
+    assert first == second
+
+
+def test_delays_reach_the_cap():
+    policy = RetryPolicy(max_retries=40, base_delay=1.0, max_delay=5.0, rng=random.Random(0))
+    assert max(fail_until_stop(policy.start("u"))) == 5.0
+
+
+def test_max_retries_bounds_attempts():
+    policy = RetryPolicy(max_retries=3, rng=random.Random(0))
+    state = policy.start("u")
+    assert len(fail_until_stop(state)) == 3
+    assert state.attempts == 4
+    assert state.stop_reason == "max retries reached"
+
+
+def test_budget_is_shared_and_exhausts():
+    budget = RetryBudget(5)
+    policy = RetryPolicy(max_retries=4, budget=budget, rng=random.Random(0))
+    first = policy.start("a")
+    assert len(fail_until_stop(first)) == 4
+    second = policy.start("b")
+    assert len(fail_until_stop(second)) == 1
+    assert second.stop_reason == "run retry budget exhausted"
+    assert budget.used == 5 and budget.remaining == 0
+    third = policy.start("c")
+    assert fail_until_stop(third) == []
+
+
+def test_unlimited_budget():
+    budget = RetryBudget(None)
+    assert all(budget.try_acquire() for _ in range(1000))
+    assert budget.remaining is None
+
+
+@pytest.mark.parametrize("status", NON_RETRYABLE_STATUSES)
+def test_non_retryable_4xx_stop_at_once(status):
+    budget = RetryBudget(10)
+    state = RetryPolicy(budget=budget, rng=random.Random(0)).start("u")
+    state.begin_attempt()
+    assert state.retry_after(f"HTTP {status}", status) is None
+    assert state.stop_reason == f"non-retryable HTTP {status}"
+    # Giving up does not spend the budget
+    assert budget.used == 0
+
+
+@pytest.mark.parametrize("status", [408, 429, 500, 502, 503])
+def test_transient_statuses_are_retried(status):
+    state = RetryPolicy(rng=random.Random(0)).start("u")
+    state.begin_attempt()
+    assert state.retry_after(f"HTTP {status}", status) is not None
+
+
+def test_identical_content_errors_fail_fast():
+    state = RetryPolicy(max_retries=50, max_identical_errors=3, rng=random.Random(0)).start("u")
+    results = []
+    for _ in range(3):
+        state.begin_attempt()
+        results.append(state.retry_after("JSON decode error: x", 200, content_error=True))
+    assert results[0] is not None and results[1] is not None and results[2] is None
+    assert state.stop_reason == "same error 3 times in a row"
+
+
+def test_different_content_errors_do_not_count_as_identical():
+    state = RetryPolicy(max_retries=50, max_identical_errors=2, rng=random.Random(0)).start("u")
+    for error in ("bad json a", "bad json b", "bad json a"):
+        state.begin_attempt()
+        assert state.retry_after(error, 200, content_error=True) is not None
+
+
+def test_retry_after_is_a_floor():
+    state = RetryPolicy(base_delay=0.1, max_delay=30.0, rng=random.Random(0)).start("u")
+    state.begin_attempt()
+    assert state.retry_after("HTTP 429", 429, server_delay=12.0) == 12.0
+
+
+def test_retry_after_past_the_cap_gives_up():
+    state = RetryPolicy(max_delay=30.0, rng=random.Random(0)).start("u")
+    state.begin_attempt()
+    assert state.retry_after("HTTP 503", 503, server_delay=120.0) is None
+    assert state.stop_reason.startswith("Retry-After 120s")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(" 0 ") == 0.0
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+    assert 80 <= parse_retry_after(later) <= 90
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_report_records_attempts():
+    policy = RetryPolicy(max_retries=2, rng=random.Random(0))
+    state = policy.start("u")
+    fail_until_stop(state)
+    state.finish(False)
+    ok = policy.start("v")
+    ok.begin_attempt()
+    ok.finish(True)
+    assert policy.attempt_histogram() == {3: 1, 1: 1}
+    assert policy.stats["u"]["stop_reason"] == "max retries reached"
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.securities import SECURITIES_TABLE, seed_securities
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # No reference CSVs in the working directory, only what the database holds
+    monkeypatch.chdir(tmp_path)
+    return create_engine(f"sqlite:///{tmp_path / 'securities.db'}")
+
+
+def securities(engine, exchange):
+    return pd.read_sql(text(f"SELECT ticker, industry, shares_in_issue FROM {SECURITIES_TABLE} "
+                            f"WHERE exchange = :exchange ORDER BY ticker"), engine, params={"exchange": exchange})
+
+
+def test_seeds_from_the_autofill_reference_tables(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dse_tz_reference (ticker TEXT PRIMARY KEY, industry TEXT, "
+                          "shares_in_issue DOUBLE PRECISION, as_of DATE)"))
+        conn.execute(text("INSERT INTO dse_tz_reference VALUES ('CRDB', 'Banking', 2.6e9, '2024-03-05'), "
+                          "('TBL', 'Manufacturing', NULL, '2024-03-05')"))
+        conn.execute(text("CREATE TABLE nse_ke_reference (ticker TEXT PRIMARY KEY, industry TEXT, as_of DATE)"))
+        conn.execute(text("INSERT INTO nse_ke_reference VALUES ('SCOM', 'Telecommunication', '2024-03-05')"))
+
+    assert seed_securities(engine) == {"DSE": 2, "NSE": 1}
+    dse = securities(engine, "DSE").set_index("ticker")
+    assert dse.loc["CRDB", "industry"] == "Banking" and dse.loc["CRDB", "shares_in_issue"] == 2.6e9
+    assert pd.isna(dse.loc["TBL", "shares_in_issue"])
+    assert securities(engine, "NSE")["industry"].tolist() == ["Telecommunication"]
+
+
+def test_metadata_still_on_the_facts_wins_over_the_reference(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE nse_ke_reference (ticker TEXT PRIMARY KEY, industry TEXT, as_of DATE)"))
+        conn.execute(text("INSERT INTO nse_ke_reference VALUES ('SCOM', 'Telecom', '2024-01-02'), "
+                          "('KCB', 'Banking', '2024-01-02')"))
+        conn.execute(text("CREATE TABLE nse_ke_daily_ohlcv (ticker TEXT, trade_date DATE, industry TEXT)"))
+        conn.execute(text("INSERT INTO nse_ke_daily_ohlcv VALUES ('SCOM', '2024-03-05', 'Telecommunication'), "
+                          "('KCB', '2024-03-05', NULL)"))
+
+    seed_securities(engine)
+    assert securities(engine, "NSE")["industry"].tolist() == ["Banking", "Telecommunication"]
@@ -0,0 +1,144 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db.schema import to_ohlcv_batch
+from db.writer import upsert_batch, upsert_dataframe
+
+OHLCV_TABLE = "nse_ke_daily_ohlcv"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+
+
+def bars(closes, day=date(2024, 3, 5), volume=1000):
+    return pd.DataFrame({
+        "ticker": list(closes),
+        "trade_date": [day] * len(closes),
+        "closing_price": list(closes.values()),
+        "volume": [volume] * len(closes),
+    })
+
+
+def stored(engine, table, columns="ticker, trade_date, closing_price, volume"):
+    return pd.read_sql(f"SELECT {columns} FROM {table} ORDER BY ticker, trade_date", engine)
+
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def stage_tables(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT name FROM sqlite_temp_master")).scalars().all()
+
+
+@pytest.mark.parametrize("write", ["dataframe", "batch"])
+def test_same_batch_twice_keeps_the_row_count(engine, write):
+    rows = bars({"SCOM": 17.5, "KCB": 38.0, "EQTY": 45.25})
+    for _ in range(2):
+        if write == "dataframe":
+            upsert_dataframe(rows, OHLCV_TABLE, engine)
+        else:
+            upsert_batch(to_ohlcv_batch(rows), OHLCV_TABLE, engine)
+    assert count(engine, OHLCV_TABLE) == 3
+
+
+@pytest.mark.parametrize("write", ["dataframe", "batch"])
+def test_corrected_row_replaces_the_old_one(engine, write):
+    upsert_dataframe(bars({"SCOM": 17.5, "KCB": 38.0}), OHLCV_TABLE, engine)
+    correction = bars({"SCOM": 17.65}, volume=2500)
+    if write == "dataframe":
+        upsert_dataframe(correction, OHLCV_TABLE, engine)
+    else:
+        upsert_batch(to_ohlcv_batch(correction), OHLCV_TABLE, engine)
+    rows = stored(engine, OHLCV_TABLE).set_index("ticker")
+    assert len(rows) == 2
+    assert rows.loc["SCOM", "closing_price"] == 17.65
+    assert rows.loc["SCOM", "volume"] == 2500
+    assert rows.loc["KCB", "closing_price"] == 38.0
+
+
+def test_null_never_overwrites_a_stored_value(engine):
+    upsert_dataframe(bars({"SCOM": 17.5}), OHLCV_TABLE, engine)
+    upsert_dataframe(bars({"SCOM": 17.6}).assign(volume=None), OHLCV_TABLE, engine)
+    rows = stored(engine, OHLCV_TABLE)
+    assert rows["closing_price"].tolist() == [17.6]
+    assert rows["volume"].tolist() == [1000]
+
+
+def test_update_false_leaves_existing_rows(engine):
+    upsert_dataframe(bars({"SCOM": 17.5}), OHLCV_TABLE, engine)
+    upsert_dataframe(pd.concat([bars({"SCOM": 99.0}), bars({"KCB": 38.0})]), OHLCV_TABLE, engine, update=False)
+    rows = stored(engine, OHLCV_TABLE).set_index("ticker")
+    assert rows.loc["SCOM", "closing_price"] == 17.5
+    assert rows.loc["KCB", "closing_price"] == 38.0
+
+
+@pytest.mark.parametrize("write", ["dataframe", "batch"])
+def test_last_row_of_a_key_wins_inside_a_batch(engine, write):
+    rows = pd.concat([bars({"SCOM": 17.5}), bars({"SCOM": 17.9})], ignore_index=True)
+    if write == "dataframe":
+        upsert_dataframe(rows, OHLCV_TABLE, engine)
+    else:
+        upsert_batch(to_ohlcv_batch(rows), OHLCV_TABLE, engine)
+    assert stored(engine, OHLCV_TABLE)["closing_price"].tolist() == [17.9]
+
+
+def test_unmanaged_table_gets_a_unique_key(engine):
+    rows = pd.DataFrame({"ticker": ["A", "B"], "trade_date": ["2024-01-02"] * 2, "value": [1.0, 2.0]})
+    upsert_dataframe(rows, "extra_stats", engine)
+    upsert_dataframe(rows.assign(value=[1.5, 2.0]), "extra_stats", engine)
+    assert stored(engine, "extra_stats", "ticker, value")["value"].tolist() == [1.5, 2.0]
+
+
+def test_table_with_duplicate_keys_falls_back_to_insert_if_missing(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE legacy (ticker TEXT, trade_date TEXT, value REAL)"))
+        conn.execute(text("INSERT INTO legacy VALUES ('A', '2024-01-02', 1.0), ('A', '2024-01-02', 1.0)"))
+    rows = pd.DataFrame({"ticker": ["A", "B"], "trade_date": ["2024-01-02"] * 2, "value": [5.0, 2.0]})
+    upsert_dataframe(rows, "legacy", engine)
+    upsert_dataframe(rows, "legacy", engine)
+    assert stored(engine, "legacy", "ticker, value").values.tolist() == [["A", 1.0], ["A", 1.0], ["B", 2.0]]
+
+
+def test_missing_key_column_is_rejected(engine):
+    with pytest.raises(ValueError, match="trade_date"):
+        upsert_dataframe(pd.DataFrame({"ticker": ["A"], "closing_price": [1.0]}), OHLCV_TABLE, engine)
+
+
+def test_empty_frames_write_nothing(engine):
+    assert upsert_dataframe(bars({}), OHLCV_TABLE, engine) == 0
+    assert upsert_batch(to_ohlcv_batch(bars({})), OHLCV_TABLE, engine) == 0
+
+
+@pytest.mark.parametrize("write", ["dataframe", "batch"])
+def test_failed_merge_rolls_back_and_drops_the_stage(engine, write):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE checked (ticker TEXT, trade_date TEXT, closing_price REAL CHECK (closing_price >= 0), "
+            "volume INTEGER, UNIQUE (ticker, trade_date))"
+        ))
+    upsert_dataframe(bars({"A": 1.0}).astype({"trade_date": str}), "checked", engine)
+
+    bad = bars({"A": 2.0, "B": -1.0})
+    with pytest.raises(Exception, match="CHECK constraint"):
+        if write == "dataframe":
+            upsert_dataframe(bad.astype({"trade_date": str}), "checked", engine)
+        else:
+            upsert_batch(to_ohlcv_batch(bad).drop_columns(["security_id", "opening_price", "high", "low"]),
+                         "checked", engine)
+    # Nothing of the failed batch landed, and no staging table is left on the pooled connection
+    assert stored(engine, "checked")["closing_price"].tolist() == [1.0]
+    assert stage_tables(engine) == []
+    # The next write on the same connection still works
+    upsert_dataframe(bars({"A": 3.0}).astype({"trade_date": str}), "checked", engine)
+    assert stored(engine, "checked")["closing_price"].tolist() == [3.0]